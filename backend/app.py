@@ -3,34 +3,156 @@ import json
 import uuid
 import re
 import datetime
-from flask import Flask, request, jsonify, send_from_directory
+import time
+import io
+import zlib
+import zipfile
+import multiprocessing
+from flask import Flask, request, jsonify, send_from_directory, Response, g
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from pypdf import PdfReader
-from PIL import Image
-import io
-import google.generativeai as genai
+import threading
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from storage import open_store
+from tenants import TenantStores, RateLimiter, QuotaLedger, DEFAULT_TENANT, valid_tenant_id
+from jobs import JobRunner, public_job, new_job, DONE, FAILED, FINISHED_STATUSES
+from cache import DiskCache, sha256_text, make_key
+from uploads import spool_upload, spool_stream, write_temp_copy, sweep_orphan_uploads, BlobStore
+from transfer import EXPORT_FORMATS, EXPORTERS, IMPORTERS, iter_sets
+from pdf_extraction import PdfExtractor, FailedPage, FAILED_PAGE, EXTRACTION_VERSION
+from ocr import OcrEngine, IMAGE_EXTENSIONS, OCR_VERSION
+from scheduler import review_card, MAX_GRADE
+from chunking import TextStream, plan_streamed_chunks, split_text_into_chunks, select_chunks, cards_per_chunk, merge_chunk_results
+from gemini_health import GeminiHealthMonitor
+from gemini_client import GeminiClient, import_sdk
+from card_parser import CARD_RESPONSE_SCHEMA, parse_flashcards
+from difficulty import score_cards, load_model
+from search_index import NearDuplicateFilter, content_words, jaccard
+from telemetry import REGISTRY, SlowRequestProfiler, configure_tracing, span, start_request_span, end_request_span
 
 # Charger les variables d'environnement
 load_dotenv()
 
 # Configurer l'API Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
+# Point d'accès alternatif (par exemple le faux serveur de fake_gemini.py pour les tests hors ligne)
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+if not GEMINI_API_KEY:
     print("⚠️ Attention: GEMINI_API_KEY n'est pas définie dans les variables d'environnement")
 
+_genai = None
+_genai_lock = threading.Lock()
+
+def gemini_sdk():
+    """SDK Gemini importé et configuré au premier appel à l'API, pas au démarrage"""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            genai = import_sdk()
+            if GEMINI_API_ENDPOINT:
+                genai.configure(api_key=GEMINI_API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+            else:
+                genai.configure(api_key=GEMINI_API_KEY)
+            _genai = genai
+        return _genai
+
+GEMINI_MODEL_NAME = 'gemini-2.0-flash'
+# À incrémenter à chaque modification du prompt pour invalider le cache des cartes
+PROMPT_VERSION = 1
+
+def check_gemini_model():
+    """Vérification légère (métadonnées du modèle, sans génération ni quota de tokens)"""
+    if not GEMINI_API_KEY:
+        raise RuntimeError("Pas de clé API configurée")
+    model_info = gemini_sdk().get_model(f'models/{GEMINI_MODEL_NAME}')
+    return f"Test API Gemini réussi: {model_info.display_name}"
+
+# Client Gemini partagé: appels simultanés et débit limités, nouveaux essais
+# sur les erreurs 429/5xx, prompts identiques en cours fusionnés
+GEMINI_CLIENT = GeminiClient(
+    GEMINI_MODEL_NAME,
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", 4)),
+    rate_per_minute=float(os.getenv("GEMINI_RATE_PER_MINUTE", 60)),
+    max_retries=int(os.getenv("GEMINI_MAX_RETRIES", 4)),
+    use_async_transport=not GEMINI_API_ENDPOINT,
+    response_schema=CARD_RESPONSE_SCHEMA,
+    sdk=gemini_sdk
+)
+
+# Statut de l'API Gemini vérifié en arrière-plan et mis en cache
+GEMINI_HEALTH = GeminiHealthMonitor(
+    check_gemini_model,
+    ttl=int(os.getenv("GEMINI_HEALTH_TTL", 300)),
+    failure_threshold=int(os.getenv("GEMINI_CIRCUIT_THRESHOLD", 3)),
+    cooldown=int(os.getenv("GEMINI_CIRCUIT_COOLDOWN", 60)),
+    trial_timeout=int(os.getenv("GEMINI_CIRCUIT_TRIAL_TIMEOUT", 120))
+)
+
 app = Flask(__name__)
 # Configurer CORS pour accepter les requêtes de n'importe quelle origine
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True, expose_headers=["ETag", "X-Next-Cursor"])
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
-DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DATA_FOLDER = os.getenv("FLASHCARDS_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
 FLASHCARDS_FILE = os.path.join(DATA_FOLDER, 'flashcards.json')
-ALLOWED_EXTENSIONS = {'pdf'}#, 'png', 'jpg', 'jpeg', 'txt'}
+# Moteur de stockage des flashcards: "sqlite" (incrémental, par défaut) ou "json" (fichier unique)
+STORAGE_BACKEND = os.getenv("FLASHCARDS_STORAGE", "sqlite")
+# Projection mémoire de la base SQLite (Mo, 0 = désactivée): les pages sont lues à la demande
+SQLITE_MMAP_SIZE = int(os.getenv("FLASHCARDS_SQLITE_MMAP_MB", 256)) * 1024 * 1024
+# Les images (png, jpg, jpeg) sont aussi acceptées quand l'OCR est disponible
+ALLOWED_EXTENSIONS = {'pdf'}
+# Génération par morceaux: taille d'un morceau, nombre maximal de morceaux,
+# appels Gemini simultanés et délai par morceau (secondes)
+GENERATION_CHUNK_SIZE = int(os.getenv("GENERATION_CHUNK_SIZE", 4000))
+GENERATION_MAX_CHUNKS = int(os.getenv("GENERATION_MAX_CHUNKS", 16))
+GENERATION_MAX_WORKERS = int(os.getenv("GENERATION_MAX_WORKERS", 4))
+GENERATION_CHUNK_TIMEOUT = float(os.getenv("GENERATION_CHUNK_TIMEOUT", 60))
+# Fichiers reçus: taille gardée en mémoire avant bascule sur disque, et conservation
+# optionnelle des originaux dans un répertoire adressé par contenu (data/blobs)
+UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MB", 4)) * 1024 * 1024
+KEEP_UPLOADS = os.getenv("KEEP_UPLOADS", "false").lower() in ('1', 'true', 'yes')
+# Extraction PDF: processus du pool (0 = nombre de CPU) et budget par page (secondes)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", 0))
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", 10))
+# OCR (Tesseract) des images et des pages PDF sans texte: processus du pool (0 = moitié
+# des CPU), langues, délai par image (secondes), seuil de page vide et résolution du rendu
+OCR_ENABLED = os.getenv("OCR_ENABLED", "true").lower() in ('1', 'true', 'yes')
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 0))
+OCR_LANG = os.getenv("OCR_LANG", "fra+eng")
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", 60))
+OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", 20))
+OCR_DPI = int(os.getenv("OCR_DPI", 300))
+# Détection des questions quasi identiques à la génération: seuil de similarité
+# de Jaccard, et comparaison optionnelle avec les cartes déjà enregistrées
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.7))
+DEDUP_AGAINST_LIBRARY = os.getenv("DEDUP_AGAINST_LIBRARY", "false").lower() in ('1', 'true', 'yes')
+# Modèle lexical de difficulté (python difficulty.py fit), sinon heuristique par défaut
+DIFFICULTY_MODEL = load_model(os.getenv("DIFFICULTY_MODEL"))
+# Génération par lots (plusieurs fichiers ou archives zip): nombre de fichiers,
+# taille de la requête et taille décompressée maximales (Mo)
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 50))
+BATCH_MAX_UPLOAD_BYTES = int(os.getenv("BATCH_MAX_UPLOAD_MB", 200)) * 1024 * 1024
+BATCH_MAX_UNCOMPRESSED_BYTES = int(os.getenv("BATCH_MAX_UNCOMPRESSED_MB", 500)) * 1024 * 1024
+# Import de jeux (NDJSON, CSV, Anki): taille maximale de la requête (Mo), lue en flux
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_MB", 4096)) * 1024 * 1024
+# Locataires: en-tête d'identification (sans en-tête: locataire "default", sauf si
+# TENANT_REQUIRED), magasins gardés ouverts, limite de débit des routes de génération
+# (requêtes par minute et rafale, par processus) et générations par jour (0 = illimité)
+TENANT_HEADER = os.getenv("TENANT_HEADER", "X-Tenant-ID")
+TENANT_REQUIRED = os.getenv("TENANT_REQUIRED", "false").lower() in ('1', 'true', 'yes')
+TENANT_MAX_OPEN_STORES = int(os.getenv("TENANT_MAX_OPEN_STORES", 64))
+TENANT_RATE_LIMIT_PER_MINUTE = float(os.getenv("TENANT_RATE_LIMIT_PER_MINUTE", 30))
+TENANT_RATE_LIMIT_BURST = int(os.getenv("TENANT_RATE_LIMIT_BURST", 10))
+TENANT_DAILY_GENERATIONS = int(os.getenv("TENANT_DAILY_GENERATIONS", 500))
+# Intervalle de rafraîchissement du flux SSE des tâches (secondes)
+JOB_EVENTS_POLL_INTERVAL = float(os.getenv("JOB_EVENTS_POLL_INTERVAL", 0.5))
+# Observabilité: export OpenTelemetry vers un collecteur (vide = désactivé) et
+# profil des requêtes plus lentes que PROFILE_SLOW_REQUEST_MS (0 = désactivé)
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", 0))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5))
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
@@ -38,44 +160,226 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(DATA_FOLDER, exist_ok=True)
 
-# Simulation de base de données (à remplacer par une vraie BDD en production)
+# Initialiser la base de données (l'ancien flashcards.json est migré automatiquement vers SQLite)
+STORE = open_store(STORAGE_BACKEND, DATA_FOLDER, mmap_size=SQLITE_MMAP_SIZE)
+# Une partition par locataire (data/tenants/<id>); STORE est celle du locataire par défaut et garde les tâches
+TENANTS = TenantStores(
+    STORAGE_BACKEND, DATA_FOLDER, STORE, max_open=TENANT_MAX_OPEN_STORES, mmap_size=SQLITE_MMAP_SIZE
+)
+RATE_LIMITER = RateLimiter(TENANT_RATE_LIMIT_PER_MINUTE, burst=TENANT_RATE_LIMIT_BURST)
+QUOTAS = QuotaLedger(os.path.join(DATA_FOLDER, 'quotas.db'))
+
+# Caches adressés par contenu: texte extrait (par SHA-256 du fichier) et cartes générées
+CACHE_FILE = os.path.join(DATA_FOLDER, 'cache.db')
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", 256)) * 1024 * 1024
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE_DAYS", 30)) * 24 * 3600
+TEXT_CACHE = DiskCache(CACHE_FILE, "text_cache", max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE)
+CARDS_CACHE = DiskCache(CACHE_FILE, "flashcards_cache", max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE)
+
 def load_flashcards_db():
-    if os.path.exists(FLASHCARDS_FILE):
-        with open(FLASHCARDS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+    """Retourne toute la base sous forme de dictionnaire {set_id: jeu}"""
+    return STORE.export_all()
 
 def save_flashcards_db(db):
-    with open(FLASHCARDS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(db, f, ensure_ascii=False, indent=2)
+    """Remplace toute la base. Les routes utilisent les écritures par jeu/carte de STORE"""
+    STORE.replace_all(db)
 
-# Initialiser la base de données
-FLASHCARDS_DB = load_flashcards_db()
+# Métriques Prometheus (GET /metrics); les durées des étapes sont dans telemetry.STAGE_SECONDS
+HTTP_REQUESTS = REGISTRY.counter(
+    "brainboost_http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status")
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "brainboost_http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "route")
+)
+FALLBACK_GENERATIONS = REGISTRY.counter(
+    "brainboost_fallback_generations_total", "Générations confiées au générateur par défaut", ("reason",)
+)
+TENANT_LIMITED = REGISTRY.counter(
+    "brainboost_tenant_limited_total", "Requêtes de génération refusées (limite de débit ou quota journalier)", ("reason",)
+)
+SLOW_REQUEST_PROFILES = REGISTRY.counter(
+    "brainboost_slow_request_profiles_total", "Profils enregistrés pour des requêtes lentes", ("route",)
+)
+
+def collect_runtime_metrics():
+    """Compteurs déjà tenus par les caches, le client Gemini et le disjoncteur, lus à l'export"""
+    client = GEMINI_CLIENT.stats()
+    health = GEMINI_HEALTH.snapshot()
+    caches = {"text": TEXT_CACHE, "flashcards": CARDS_CACHE}
+    return [
+        ("brainboost_cache_hits_total", "counter", "Succès des caches",
+         [({"cache": name}, cache.hits) for name, cache in caches.items()]),
+        ("brainboost_cache_misses_total", "counter", "Échecs des caches",
+         [({"cache": name}, cache.misses) for name, cache in caches.items()]),
+        ("brainboost_gemini_calls_total", "counter", "Appels à l'API Gemini (tentatives comprises)",
+         [({}, client["calls"])]),
+        ("brainboost_gemini_retries_total", "counter", "Nouveaux essais après une erreur 429/5xx",
+         [({}, client["retries"])]),
+        ("brainboost_gemini_coalesced_total", "counter", "Prompts identiques fusionnés avec un appel en cours",
+         [({}, client["coalesced"])]),
+        ("brainboost_gemini_circuit_open", "gauge", "Disjoncteur de l'API Gemini ouvert (1) ou non (0)",
+         [({}, 1 if health["circuit"] == "open" else 0)]),
+        ("brainboost_tenant_stores_open", "gauge", "Partitions de locataires ouvertes dans le processus",
+         [({}, TENANTS.open_count())])
+    ]
+
+REGISTRY.add_collector(collect_runtime_metrics)
+if OTEL_EXPORTER_OTLP_ENDPOINT:
+    configure_tracing(endpoint=OTEL_EXPORTER_OTLP_ENDPOINT)
+PROFILER = SlowRequestProfiler(
+    PROFILE_SLOW_REQUEST_MS / 1000,
+    os.path.join(DATA_FOLDER, 'profiles'),
+    interval=PROFILE_SAMPLE_INTERVAL_MS / 1000
+) if PROFILE_SLOW_REQUEST_MS > 0 else None
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.request_span = start_request_span(f"{request.method} {request.path}", **{"http.method": request.method})
+    if PROFILER is not None:
+        PROFILER.start()
+
+@app.before_request
+def resolve_tenant():
+    """Locataire de la requête, lu dans l'en-tête TENANT_HEADER"""
+    tenant_id = request.headers.get(TENANT_HEADER, "").strip()
+    if not tenant_id:
+        if TENANT_REQUIRED and request.path.startswith('/api/'):
+            return jsonify({"error": f"En-tête {TENANT_HEADER} manquant"}), 400
+        tenant_id = DEFAULT_TENANT
+    if not valid_tenant_id(tenant_id):
+        return jsonify({"error": f"En-tête {TENANT_HEADER} invalide (lettres, chiffres, - et _, 64 caractères au plus)"}), 400
+    g.tenant = tenant_id
+
+def tenant_store():
+    """Magasin de flashcards du locataire de la requête"""
+    return TENANTS.get(g.tenant)
+
+def job_tenant(job):
+    """Locataire pour lequel une tâche a été créée"""
+    return job["params"].get("tenant", DEFAULT_TENANT)
+
+def job_store(job):
+    """Magasin du locataire pour lequel une tâche a été créée"""
+    return TENANTS.get(job_tenant(job))
+
+def owns_job(job):
+    """Une tâche n'est visible que par son locataire"""
+    return job is not None and job_tenant(job) == g.tenant
+
+def limit_generations(count=1):
+    """
+    Limite de débit puis quota journalier du locataire pour `count`
+    générations. Retourne None si elles sont acceptées, sinon la réponse 429.
+    """
+    return limit_rate() or consume_generation_quota(count)
+
+def limit_rate():
+    """Limite de débit des routes de génération: None, ou la réponse 429"""
+    retry_after = RATE_LIMITER.acquire(g.tenant)
+    if not retry_after:
+        return None
+    TENANT_LIMITED.inc(reason="rate_limit")
+    response = jsonify({"error": "Trop de requêtes de génération, réessayez plus tard"})
+    response.headers["Retry-After"] = str(int(retry_after) + 1)
+    return response, 429
+
+def consume_generation_quota(count=1):
+    """Quota journalier de générations du locataire: None, ou la réponse 429"""
+    accepted, used = QUOTAS.consume(g.tenant, "generations", TENANT_DAILY_GENERATIONS, count)
+    if accepted:
+        return None
+    TENANT_LIMITED.inc(reason="quota")
+    tomorrow = datetime.datetime.now(datetime.timezone.utc).date() + datetime.timedelta(days=1)
+    midnight = datetime.datetime.combine(tomorrow, datetime.time(), datetime.timezone.utc)
+    response = jsonify({
+        "error": "Quota journalier de générations atteint",
+        "used": used,
+        "limit": TENANT_DAILY_GENERATIONS
+    })
+    response.headers["Retry-After"] = str(int((midnight - datetime.datetime.now(datetime.timezone.utc)).total_seconds()) + 1)
+    return response, 429
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule is not None else "non_trouvée"
+    HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+    HTTP_SECONDS.observe(elapsed, method=request.method, route=route)
+    end_request_span(g.pop('request_span', None), response.status_code)
+    if PROFILER is not None:
+        profile = PROFILER.finish(f"{request.method} {route}", elapsed)
+        if profile is not None:
+            SLOW_REQUEST_PROFILES.inc(route=route)
+            print(f"Requête lente ({elapsed * 1000:.0f} ms): profil enregistré dans {profile}")
+    return response
+
+PDF_EXTRACTOR = PdfExtractor(workers=PDF_WORKERS or None, page_timeout=PDF_PAGE_TIMEOUT, temp_dir=UPLOAD_FOLDER)
+BLOBS = BlobStore(os.path.join(DATA_FOLDER, 'blobs')) if KEEP_UPLOADS else None
+# Pages OCR mises en cache (par hash d'image) dans la même base que les autres caches
+OCR = OcrEngine(
+    workers=OCR_WORKERS or None,
+    lang=OCR_LANG,
+    timeout=OCR_TIMEOUT,
+    cache_path=CACHE_FILE,
+    min_text_chars=OCR_MIN_TEXT_CHARS,
+    dpi=OCR_DPI,
+    temp_dir=UPLOAD_FOLDER
+) if OCR_ENABLED else None
+
+def ocr_available():
+    """OCR activé et Tesseract installé (vérifié à la première utilisation)"""
+    return OCR is not None and OCR.available()
 
 def allowed_file(filename):
     """Vérifie si le fichier a une extension autorisée"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    if '.' not in filename:
+        return False
+    extension = filename.rsplit('.', 1)[1].lower()
+    return extension in ALLOWED_EXTENSIONS or (extension in IMAGE_EXTENSIONS and ocr_available())
+
+def iter_pdf_pages(source):
+    """
+    Extrait le texte d'un PDF (chemin ou flux binaire) page par page, en
+    parallèle pour les gros documents, et retourne un TextStream consommable
+    au fil de l'extraction
+    """
+    def pages():
+        try:
+            extracted = PDF_EXTRACTOR.iter_pages(source, page_count)
+            # Pages sans couche texte (PDF numérisé): OCR dans le pool, au fil de l'extraction
+            if ocr_available():
+                extracted = OCR.iter_pdf_pages(extracted, source)
+            yield from extracted
+        except Exception as e:
+            print(f"Erreur lors de l'extraction de texte du PDF: {e}")
+            yield FAILED_PAGE
 
-def extract_text_from_pdf(file_path):
-    """Extrait le texte d'un fichier PDF"""
     try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        return text
+        with span("pdf_open"):
+            page_count = PDF_EXTRACTOR.count_pages(source)
     except Exception as e:
         print(f"Erreur lors de l'extraction de texte du PDF: {e}")
-        return ""
+        return TextStream([])
+    return TextStream(pages(), page_count)
+
+def extract_text_from_pdf(file_path):
+    """Extrait le texte d'un fichier PDF"""
+    return iter_pdf_pages(file_path).text()
+
+def iter_image_pages(source):
+    """Texte d'une image (chemin ou flux binaire) reconnu par OCR, sous forme de TextStream"""
+    if not ocr_available():
+        print("OCR indisponible: aucun texte extrait de l'image")
+        return TextStream([])
+    return TextStream(OCR.iter_image(source), 1)
 
 def extract_text_from_image(file_path):
-    """
-    Pour une implémentation complète, vous pourriez utiliser une bibliothèque OCR comme pytesseract.
-    Pour l'instant, nous retournons un message placeholder.
-    """
-    return "Le texte extrait de l'image serait affiché ici. Installez pytesseract pour l'OCR."
+    """Extrait le texte d'une image par OCR (chaîne vide si l'OCR est indisponible)"""
+    return iter_image_pages(file_path).text()
 
 def estimate_card_difficulty(question, answer):
     """
@@ -89,68 +393,18 @@ def estimate_card_difficulty(question, answer):
     4 - Difficile
     5 - Très difficile
     """
-    # Initialisation du score de difficulté
-    difficulty_score = 0
-    
-    # Facteurs qui influencent la difficulté
-    
-    # 1. Longueur de la réponse (les réponses plus longues sont généralement plus difficiles)
-    answer_length = len(answer.split())
-    if answer_length < 5:
-        difficulty_score += 1  # Très court, probablement facile
-    elif answer_length < 15:
-        difficulty_score += 2  # Longueur moyenne
-    else:
-        difficulty_score += 3  # Réponse longue, plus difficile à mémoriser
-    
-    # 2. Complexité linguistique (présence de termes techniques, nombres, etc.)
-    # Recherche de termes techniques ou complexes, nombres, dates
-    technical_indicators = [
-        r'\d+[.,]?\d*',  # Nombres avec décimales potentielles
-        r'\b[A-Z]{2,}\b',  # Acronymes en majuscules
-        r'\b[A-Z][a-z]+(?:[A-Z][a-z]+)+\b',  # CamelCase (probablement des termes techniques)
-    ]
-    
-    complexity_score = 0
-    for indicator in technical_indicators:
-        if re.search(indicator, question) or re.search(indicator, answer):
-            complexity_score += 1
-    
-    # Limiter le score de complexité à un maximum de 2
-    complexity_score = min(complexity_score, 2)
-    difficulty_score += complexity_score
-    
-    # Normaliser le score final sur l'échelle 1-5
-    difficulty_score = max(1, min(difficulty_score, 5))
-    
-    return difficulty_score
+    return estimate_cards_difficulty([(question, answer)])[0]
 
-def generate_flashcards_from_text(text, num_cards=5):
-    """Génère des flashcards à partir du texte en utilisant Gemini"""
-    try:
-        if not GEMINI_API_KEY:
-            print("Pas de clé API Gemini configurée")
-            return generate_default_flashcards(text, num_cards)
-        
-        # Limitation à 4000 caractères pour éviter des demandes trop grandes
-        text_to_process = text[:4000] if len(text) > 4000 else text
-        
-        # Créer le modèle Gemini
-        model = genai.GenerativeModel(model_name='gemini-2.0-flash')
-        
-        # Tester la connexion API avant de continuer
-        try:
-            test_response = model.generate_content("Test API")
-            print("Connexion à l'API Gemini établie")
-        except Exception as e:
-            print(f"Erreur de connexion à l'API Gemini: {e}")
-            return generate_default_flashcards(text, num_cards)
-        
-        # Construire le prompt pour Gemini
-        prompt = f"""À partir du texte suivant, crée {num_cards} cartes d'apprentissage (flashcards) au format question-réponse.
+def estimate_cards_difficulty(pairs):
+    """Difficulté d'une liste de couples (question, réponse), en une seule passe"""
+    return score_cards(pairs, DIFFICULTY_MODEL)
+
+def build_flashcards_prompt(text, num_cards):
+    """Construit le prompt envoyé à Gemini pour un morceau de texte"""
+    return f"""À partir du texte suivant, crée {num_cards} cartes d'apprentissage (flashcards) au format question-réponse.
 
 TEXTE À ANALYSER:
-{text_to_process}
+{text}
 
 INSTRUCTIONS:
 1. Identifie les concepts clés et les informations importantes dans le texte.
@@ -180,69 +434,174 @@ INSTRUCTIONS:
 
 Réponds UNIQUEMENT avec le JSON, sans texte explicatif avant ou après."""
 
-        # Faire la requête à l'API Gemini
-        response = model.generate_content(prompt)
+def parse_flashcards_response(ai_response):
+    """
+    Extrait les cartes valides de la réponse de Gemini, ou None si elle ne
+    contient aucun tableau JSON. Les cartes invalides sont ignorées une à une.
+    """
+    flashcards = parse_flashcards(ai_response)
+    if flashcards is None:
+        print(f"Aucun tableau JSON dans la réponse de Gemini ({len(ai_response)} caractères)")
+    return flashcards
+
+def generate_cards_for_chunk(chunk, num_cards):
+    """
+    Génère les cartes d'un seul morceau de texte. Lève une exception en cas
+    d'échec (après les nouveaux essais du client): le morceau est alors
+    ignoré par l'appelant.
+    """
+    started = time.monotonic()
+    try:
+        ai_response = GEMINI_CLIENT.generate(
+            build_flashcards_prompt(chunk, num_cards),
+            timeout=GENERATION_CHUNK_TIMEOUT
+        )
+    except Exception as e:
+        GEMINI_HEALTH.record_failure(time.monotonic() - started, f"Erreur lors de l'appel à l'API Gemini: {e}")
+        raise
+    GEMINI_HEALTH.record_success(time.monotonic() - started)
+
+    with span("parse_response"):
+        flashcards = parse_flashcards_response(ai_response)
+    if flashcards is None:
+        raise ValueError("Réponse de Gemini sans tableau JSON exploitable")
+    return flashcards
+
+def finalize_cards(cards):
+    """Ajoute l'identifiant, la difficulté et les champs de révision aux cartes générées"""
+    # Cartes sans difficulté valide proposée par Gemini: estimation groupée
+    to_estimate = [
+        card for card in cards
+        if not isinstance(card.get("difficulty"), int) or not 1 <= card["difficulty"] <= 5
+    ]
+    with span("difficulty"):
+        difficulties = estimate_cards_difficulty([(card["question"], card["answer"]) for card in to_estimate])
+    for card, difficulty in zip(to_estimate, difficulties):
+        card["difficulty"] = difficulty
+
+    for card in cards:
+        card["id"] = str(uuid.uuid4())
+        # Ajouter des champs supplémentaires pour l'interface utilisateur
+        card["lastReviewed"] = None
+        card["nextReview"] = None
+        card["reviewCount"] = 0
+    return cards
+
+def is_library_duplicate(question, library):
+    """
+    Question quasi identique à une carte déjà enregistrée (si
+    DEDUP_AGAINST_LIBRARY est activé): les candidats viennent de l'index de
+    recherche, la similarité est vérifiée sur les mots significatifs.
+    """
+    if not DEDUP_AGAINST_LIBRARY or library is None:
+        return False
+    words = content_words(question)
+    for match in library.search_cards(question, limit=5, match_all=False):
+        if jaccard(words, content_words(match["card"].get("question", ""))) >= DEDUP_THRESHOLD:
+            return True
+    return False
+
+def generate_flashcards_from_text(text, num_cards=5, on_progress=None, library=None):
+    """Génère des flashcards à partir du texte, voir generate_flashcards_with_status"""
+    return generate_flashcards_with_status(text, num_cards, on_progress, library)[0]
+
+def generate_flashcards_with_status(text, num_cards=5, on_progress=None, library=None):
+    """
+    Génère des flashcards à partir du texte en utilisant Gemini. Retourne
+    (cartes, complet): `complet` est vrai seulement si chaque morceau a
+    abouti dans les délais, sans générateur par défaut; seul un résultat
+    complet peut être mis en cache.
+
+    Le texte est découpé en morceaux (pages puis paragraphes) traités en
+    parallèle; les cartes obtenues sont dédupliquées puis classées pour en
+    garder `num_cards`. Un morceau en échec est simplement ignoré: le
+    générateur par défaut n'est utilisé que si aucun morceau n'a abouti.
+
+    `on_progress(done, total, new_cards)` est appelé à la fin de chaque
+    morceau avec ses cartes (déjà dédupliquées et identifiées).
+
+    `text` peut aussi être un TextStream: les morceaux sont alors envoyés à
+    Gemini au fil de l'extraction des pages. `library` est le magasin du
+    locataire, utilisé pour écarter les questions qu'il possède déjà.
+    """
+    def fallback(reason):
+        FALLBACK_GENERATIONS.inc(reason=reason)
+        full_text = text if isinstance(text, str) else text.text()
+        with span("default_generation"):
+            return generate_default_flashcards(full_text, num_cards), False
+
+    try:
+        if not GEMINI_API_KEY:
+            print("Pas de clé API Gemini configurée")
+            return fallback("no_api_key")
         
-        # Extraire la réponse
-        ai_response = response.text
+        # Statut en cache: pas d'appel de test avant la vraie requête
+        if not GEMINI_HEALTH.is_available():
+            print("API Gemini indisponible (disjoncteur ouvert), utilisation du générateur par défaut")
+            return fallback("circuit_open")
         
-        # Debug: imprimer la réponse brute pour voir son format réel
-        print(f"Réponse brute de Gemini (premiers 200 caractères): {ai_response[:200]}")
+        # Découpage du document en morceaux de taille raisonnable pour le modèle
+        if isinstance(text, TextStream):
+            planned = plan_streamed_chunks(text, num_cards, GENERATION_CHUNK_SIZE, GENERATION_MAX_CHUNKS)
+        else:
+            chunks = select_chunks(split_text_into_chunks(text, GENERATION_CHUNK_SIZE), GENERATION_MAX_CHUNKS)
+            planned = zip(chunks, cards_per_chunk(chunks, num_cards) if len(chunks) > 1 else [num_cards])
         
-        # Traiter la réponse pour extraire le JSON
+        # Map: un appel par morceau, avec un nombre borné d'appels simultanés
+        executor = ThreadPoolExecutor(max_workers=GENERATION_MAX_WORKERS)
         try:
-            # Essayer d'abord le parsing direct (si Gemini a bien retourné juste du JSON)
-            try:
-                flashcards = json.loads(ai_response)
-                print("Parsing direct JSON réussi")
-            except json.JSONDecodeError:
-                # Nettoyer la réponse avec différents patterns
-                clean_response = None
-                patterns = [
-                    r'```json\s*(\[.*?\])\s*```',  # Format code JSON
-                    r'```\s*(\[.*?\])\s*```',       # Format code générique
-                    r'(\[\s*\{.*?\}\s*\])'          # Format tableau JSON brut
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, ai_response, re.DOTALL)
-                    if match:
-                        try:
-                            clean_response = match.group(1)
-                            flashcards = json.loads(clean_response)
-                            print(f"Parsing JSON réussi avec le pattern: {pattern}")
-                            break
-                        except json.JSONDecodeError:
-                            continue
-                
-                if clean_response is None:
-                    print(f"Aucun pattern JSON n'a fonctionné. Réponse brute: {ai_response[:200]}")
-                    return generate_default_flashcards(text, num_cards)
-            
-            # Ajouter des IDs uniques à chaque flashcard
-            for card in flashcards:
-                card["id"] = str(uuid.uuid4())
-
-                # Vérifier si la difficulté est déjà définie par Gemini
-                if "difficulty" not in card or not isinstance(card["difficulty"], int) or card["difficulty"] < 1 or card["difficulty"] > 5:
-                    # Si pas de difficulté valide, estimer avec notre algorithme
-                    card["difficulty"] = estimate_card_difficulty(card["question"], card["answer"])
-
-                # Ajouter des champs supplémentaires pour l'interface utilisateur
-                card["lastReviewed"] = None
-                card["nextReview"] = None
-                card["reviewCount"] = 0
+            # Chaque morceau est soumis dès qu'il est prêt
+            futures = {}
+            for i, (chunk, n) in enumerate(planned):
+                futures[executor.submit(generate_cards_for_chunk, chunk, n)] = i
+            if not futures:
+                return fallback("empty_text")
             
-            return flashcards
+            results = [None] * len(futures)
+            failed = 0
+            # Questions quasi identiques entre morceaux (MinHash/LSH)
+            seen_questions = NearDuplicateFilter(DEDUP_THRESHOLD)
+            done = 0
+            # Délai global: chaque vague de GENERATION_MAX_WORKERS morceaux dispose de GENERATION_CHUNK_TIMEOUT
+            deadline = GENERATION_CHUNK_TIMEOUT * (-(-len(futures) // GENERATION_MAX_WORKERS)) + 5
+            try:
+                for future in as_completed(futures, timeout=deadline):
+                    i = futures[future]
+                    done += 1
+                    try:
+                        unique = []
+                        for card in future.result():
+                            if is_library_duplicate(card["question"], library):
+                                continue
+                            if seen_questions.add(card["question"]):
+                                unique.append(card)
+                        results[i] = finalize_cards(unique)
+                    except Exception as e:
+                        failed += 1
+                        print(f"Morceau {i + 1}/{len(futures)} ignoré: {e}")
+                    if on_progress:
+                        # Morceau en échec: progression publiée sans cartes
+                        on_progress(done, len(futures), results[i] or [])
+            except FuturesTimeoutError:
+                print("Délai dépassé: les morceaux restants sont ignorés")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
         
-        except Exception as e:
-            print(f"Erreur lors du traitement de la réponse JSON: {e}")
-            print(f"Réponse brute complète de Gemini: {ai_response}")
-            return generate_default_flashcards(text, num_cards)
+        # Reduce: déduplication et classement des cartes de tous les morceaux
+        flashcards = merge_chunk_results(results, num_cards)
+        if not flashcards:
+            print("Aucun morceau n'a produit de cartes, utilisation du générateur par défaut")
+            return fallback("no_cards")
+        
+        # Morceau en échec ou abandonné après le délai: résultat partiel
+        return flashcards, failed == 0 and done == len(futures)
         
     except Exception as e:
         print(f"Erreur générale lors de la génération des cartes avec Gemini: {e}")
-        return generate_default_flashcards(text, num_cards)
+        return fallback("error")
+    finally:
+        # Essai du disjoncteur rendu si aucun appel à Gemini n'a eu lieu (texte vide...)
+        GEMINI_HEALTH.release_trial()
 
 def generate_default_flashcards(text, num_cards=5):
     """Génère des flashcards par défaut en cas d'échec de l'API"""
@@ -262,19 +621,19 @@ def generate_default_flashcards(text, num_cards=5):
                 question = " ".join(question_words) + "...?"
                 answer = sentence
                 
-                # Estimer la difficulté
-                difficulty = estimate_card_difficulty(question, answer)
-                
                 flashcards.append({
                     "id": str(uuid.uuid4()),
                     "question": question,
                     "answer": answer,
-                    "difficulty": difficulty,
                     "lastReviewed": None,
                     "nextReview": None,
                     "reviewCount": 0
                 })
     
+    # Estimer la difficulté de toutes les cartes en une fois
+    for card, difficulty in zip(flashcards, estimate_cards_difficulty([(c["question"], c["answer"]) for c in flashcards])):
+        card["difficulty"] = difficulty
+    
     # Si pas assez de sentences, ajouter des cartes génériques
     while len(flashcards) < num_cards:
         difficulty = 1  # Les cartes par défaut sont généralement faciles
@@ -291,25 +650,24 @@ def generate_default_flashcards(text, num_cards=5):
     return flashcards
 
 
-def test_gemini_api():
-    """Teste la connexion à l'API Gemini et retourne des informations détaillées"""
+def test_gemini_api(force=False):
+    """
+    Retourne le statut en cache de l'API Gemini (succès, état du disjoncteur,
+    dernière latence). Une vérification bloquante n'est faite que si `force`
+    est vrai: avant la première vérification en arrière-plan, le statut est
+    "pending" (inconnu).
+    """
     if not GEMINI_API_KEY:
         return {"success": False, "message": "Pas de clé API configurée"}
 
-    try:
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = model.generate_content("Dis bonjour en français")
-        return {
-            "success": True,
-            "message": f"Test API Gemini réussi: {response.text}",
-            "raw_response": response.text
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "message": f"Erreur lors du test de l'API Gemini: {str(e)}",
-            "error": str(e)
-        }
+    if force:
+        return GEMINI_HEALTH.check_now()
+    GEMINI_HEALTH.start()
+    return GEMINI_HEALTH.snapshot()
+
+def gemini_known_unavailable(status):
+    """Échec constaté de l'API Gemini (un statut encore inconnu n'empêche pas la génération)"""
+    return not status.get("success", False) and not status.get("pending", False)
 
 @app.route('/')
 def index():
@@ -323,12 +681,247 @@ def index():
 @app.route('/api/test-gemini')
 def test_gemini():
     """Route pour tester la connexion à l'API Gemini avec des détails d'erreur"""
-    result = test_gemini_api()
+    result = dict(test_gemini_api(force='refresh' in request.args), client=GEMINI_CLIENT.stats())
+    if result.get("pending"):
+        return jsonify(result), 503
     return jsonify(result), 200 if result.get("success", False) else 500
 
+def iter_file_pages(source, filename):
+    """
+    Extraction du texte selon le type de fichier, sous forme de TextStream.
+    `source` est un chemin ou un flux binaire déjà ouvert.
+    """
+    file_ext = filename.rsplit('.', 1)[1].lower()
+    
+    if file_ext == 'pdf':
+        return iter_pdf_pages(source)
+    elif file_ext in IMAGE_EXTENSIONS:
+        return iter_image_pages(source)
+    elif file_ext == 'txt':
+        if isinstance(source, str):
+            with open(source, 'r', encoding='utf-8') as f:
+                return TextStream([f.read()], 1)
+        return TextStream([source.read().decode('utf-8')], 1)
+    return TextStream([])
+
+def extract_text_from_file(source, filename):
+    """Extraction du texte selon le type de fichier"""
+    return iter_file_pages(source, filename).text()
+
+def is_default_flashcards(flashcards):
+    """Vérifie si les flashcards viennent du générateur par défaut plutôt que de Gemini"""
+    return any("générée automatiquement" in card.get("question", "") for card in flashcards)
+
+def clone_flashcards(flashcards):
+    """Copie des cartes (issues du cache) avec de nouveaux identifiants et un historique de révision vierge"""
+    clones = []
+    for card in flashcards:
+        clone = dict(card)
+        clone["id"] = str(uuid.uuid4())
+        clone["lastReviewed"] = None
+        clone["nextReview"] = None
+        clone["reviewCount"] = 0
+        clones.append(clone)
+    return clones
+
+def text_cache_key(file_hash):
+    """
+    Clé du cache de texte: (hash du fichier, version de l'extraction, OCR).
+    Le texte extrait sans OCR n'est pas resservi une fois l'OCR activé.
+    """
+    ocr = f"ocr-{OCR_VERSION}-{OCR_LANG}" if ocr_available() else "sans-ocr"
+    return make_key(file_hash, EXTRACTION_VERSION, ocr)
+
+def is_complete_extraction(stream, text):
+    """Seul un texte non vide, extrait sans page en échec ni hors délai, est mis en cache"""
+    return bool(text.strip()) and not any(isinstance(page, FailedPage) for page in stream.pages)
+
+def flashcards_cache_key(text, num_cards, tenant):
+    """
+    Clé du cache de cartes: (hash du texte, nombre de cartes, modèle, version
+    du prompt). Avec DEDUP_AGAINST_LIBRARY, les cartes sont filtrées selon la
+    bibliothèque du locataire: la clé lui est alors propre.
+    """
+    library = tenant if DEDUP_AGAINST_LIBRARY else ""
+    return make_key(sha256_text(text), num_cards, GEMINI_MODEL_NAME, PROMPT_VERSION, library)
+
+def get_cached_flashcards(text, num_cards, tenant):
+    """Retourne une copie des cartes déjà générées pour ce texte, ou None"""
+    cached = CARDS_CACHE.get(flashcards_cache_key(text, num_cards, tenant))
+    return clone_flashcards(cached) if cached is not None else None
+
+def generate_flashcards_cached(text, num_cards, tenant, on_progress=None, library=None):
+    """
+    Génère les cartes en passant par le cache. Seul un résultat complet de
+    Gemini (tous les morceaux aboutis) est mis en cache
+    """
+    flashcards = get_cached_flashcards(text, num_cards, tenant)
+    if flashcards is not None:
+        return flashcards
+    flashcards, complete = generate_flashcards_with_status(text, num_cards, on_progress=on_progress, library=library)
+    if complete:
+        CARDS_CACHE.set(flashcards_cache_key(text, num_cards, tenant), flashcards)
+    return flashcards
+
+def save_upload_result(store, filename, text, flashcards, gemini_status):
+    """Enregistre le jeu créé à partir d'un fichier et construit la réponse de l'API"""
+    # Vérifier si nous avons des flashcards générées par Gemini ou par défaut
+    is_default = is_default_flashcards(flashcards)
+    
+    # Stockage des flashcards dans notre "base de données"
+    set_id = str(uuid.uuid4())
+    card_set = {
+        "title": filename.rsplit('.', 1)[0],  # Utiliser le nom du fichier sans extension
+        "source": filename,
+        "creation_date": datetime.datetime.now().isoformat(),
+        "flashcards": flashcards
+    }
+    
+    # Sauvegarder uniquement le nouveau jeu, dans la partition du locataire
+    with span("persist"):
+        store.create_set(set_id, card_set)
+    
+    return {
+        "success": True,
+        "message": "Fichier traité avec succès",
+        "gemini_used": not is_default,
+        "gemini_status": gemini_status if not is_default else "Fallback utilisé",
+        "set_id": set_id,
+        "title": card_set["title"],
+        "flashcards": flashcards,
+        "text_length": len(text)
+    }
+
+def run_upload_job(job, report, buffer=None):
+    """
+    Tâche de génération à partir d'un fichier téléchargé. En mode bloquant,
+    le fichier est lu directement depuis le tampon de la requête (`buffer`);
+    sinon depuis la copie enregistrée pour la tâche.
+    """
+    params = job["params"]
+    filename = params["filename"]
+    file_path = params.get("file_path")
+    source = buffer if buffer is not None else file_path
+    tenant = job_tenant(job)
+    store = job_store(job)
+    
+    try:
+        # Statut en cache de l'API Gemini (aucun appel réseau ici)
+        gemini_status = test_gemini_api()
+        if gemini_known_unavailable(gemini_status):
+            # Si le test échoue, on continue quand même mais on informe l'utilisateur
+            print("Test API Gemini échoué, utilisation du générateur par défaut")
+        
+        cached_text = TEXT_CACHE.get(text_cache_key(params["file_hash"]))
+        if cached_text is not None:
+            text = cached_text["text"]
+            flashcards = generate_flashcards_cached(
+                text, params["num_cards"], tenant, on_progress=report, library=store
+            )
+        else:
+            # La génération démarre pendant l'extraction des pages
+            stream = iter_file_pages(source, filename)
+            flashcards, complete = generate_flashcards_with_status(
+                stream, params["num_cards"], on_progress=report, library=store
+            )
+            text = stream.text()
+            # Les cartes d'un texte incomplet sont associées à ce texte: elles ne sont pas mises en cache
+            if is_complete_extraction(stream, text):
+                TEXT_CACHE.set(text_cache_key(params["file_hash"]), {"text": text})
+                if complete:
+                    CARDS_CACHE.set(flashcards_cache_key(text, params["num_cards"], tenant), flashcards)
+    finally:
+        # La copie temporaire n'est plus nécessaire une fois le texte extrait
+        # (les originaux conservés dans BLOBS ne sont jamais supprimés ici)
+        if file_path and params.get("temporary") and os.path.exists(file_path):
+            os.remove(file_path)
+    
+    return save_upload_result(store, filename, text, flashcards, gemini_status)
+
+def run_text_job(job, report):
+    """Tâche de génération à partir d'un texte fourni directement"""
+    params = job["params"]
+    store = job_store(job)
+    
+    # Génération des flashcards
+    flashcards = generate_flashcards_cached(
+        params["text"], params["num_cards"], job_tenant(job), on_progress=report, library=store
+    )
+    
+    # Vérifier si nous avons des flashcards générées par Gemini ou par défaut
+    is_default = is_default_flashcards(flashcards)
+    
+    # Stockage des flashcards dans notre "base de données"
+    set_id = str(uuid.uuid4())
+    with span("persist"):
+        store.create_set(set_id, {
+            "title": params["title"],
+            "source": "Texte manuel",
+            "creation_date": datetime.datetime.now().isoformat(),
+            "flashcards": flashcards
+        })
+    
+    return {
+        "success": True,
+        "message": "Flashcards générées avec succès",
+        "gemini_used": not is_default,
+        "gemini_status": params["gemini_status"] if not is_default else "Fallback utilisé",
+        "set_id": set_id,
+        "title": params["title"],
+        "flashcards": flashcards
+    }
+
+# Tâches de génération exécutées en arrière-plan (et relancées au redémarrage)
+JOBS = JobRunner(
+    STORE,
+    {"upload": run_upload_job, "text": run_text_job},
+    max_workers=int(os.getenv("JOB_WORKERS", 2)),
+    keep_finished=int(os.getenv("JOB_RETENTION_DAYS", 7)) * 24 * 3600
+)
+# Les processus d'extraction PDF (démarrés en "spawn") réimportent ce module: ils ne relancent pas les tâches
+if multiprocessing.parent_process() is None:
+    JOBS.resume_pending()
+    # Copies temporaires laissées par un processus arrêté avant la fin de leur tâche
+    sweep_orphan_uploads(UPLOAD_FOLDER, [
+        job["params"]["file_path"] for job in STORE.list_jobs(statuses=("queued", "running"))
+        if job["params"].get("file_path")
+    ])
+
+def wants_sync():
+    """Le client peut demander l'ancien mode bloquant avec ?sync=true"""
+    return request.args.get('sync', '').lower() in ('1', 'true', 'yes')
+
+def save_upload_buffer(params, buffer):
+    """La tâche survit à la requête (et aux redémarrages): le fichier doit être sur disque"""
+    with span("upload_save"):
+        if BLOBS is not None:
+            params.update(file_path=BLOBS.put(buffer, params["file_hash"]), temporary=False)
+        else:
+            params.update(file_path=write_temp_copy(buffer, UPLOAD_FOLDER), temporary=True)
+
+def job_response(kind, params, buffer=None):
+    """Lance une tâche et retourne soit son identifiant (202), soit son résultat en mode bloquant"""
+    if wants_sync():
+        job = JOBS.run_inline(kind, params, **({"buffer": buffer} if buffer is not None else {}))
+        if job["status"] == FAILED:
+            return jsonify({"success": False, "error": job["error"]}), 500
+        return jsonify(job["result"]), 200
+    
+    if buffer is not None:
+        save_upload_buffer(params, buffer)
+    job = JOBS.submit(kind, params)
+    return jsonify({
+        "success": True,
+        "message": "Tâche de génération créée",
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+        "events_url": f"/api/jobs/{job['id']}/events"
+    }), 202
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
-    """Route pour télécharger un fichier et générer des flashcards"""
+    """Route pour télécharger un fichier et lancer la génération des flashcards"""
     # Vérifier si la requête contient le fichier
     if 'file' not in request.files:
         return jsonify({"error": "Aucun fichier dans la requête"}), 400
@@ -340,103 +933,436 @@ def upload_file():
         return jsonify({"error": "Aucun fichier sélectionné"}), 400
     
     if file and allowed_file(file.filename):
+        limited = limit_generations()
+        if limited is not None:
+            return limited
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
-        # Extraction du texte selon le type de fichier
-        file_ext = filename.rsplit('.', 1)[1].lower()
-        text = ""
-        
-        if file_ext == 'pdf':
-            text = extract_text_from_pdf(file_path)
-        elif file_ext in ['png', 'jpg', 'jpeg']:
-            text = extract_text_from_image(file_path)
-        elif file_ext == 'txt':
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-        
-        # Obtenir le nombre de cartes demandé (paramètre optionnel)
-        num_cards = request.args.get('num_cards', default=5, type=int)
-        
-        # Test de l'API Gemini avant génération
-        gemini_status = test_gemini_api()
-        if not gemini_status.get("success", False):
-            # Si le test échoue, on continue quand même mais on informe l'utilisateur
-            print("Test API Gemini échoué, utilisation du générateur par défaut")
+        # Tampon propre à la requête (mémoire, puis fichier temporaire anonyme), haché au passage
+        with span("upload_receive"):
+            buffer, file_hash = spool_upload(file, UPLOAD_FOLDER, max_memory=UPLOAD_SPOOL_MAX_MEMORY)
         
-        # Génération des flashcards à partir du texte extrait
-        flashcards = generate_flashcards_from_text(text, num_cards)
-        
-        # Vérifier si nous avons des flashcards générées par Gemini ou par défaut
-        is_default = any("générée automatiquement" in card.get("question", "") for card in flashcards)
-        
-        # Stockage des flashcards dans notre "base de données"
-        set_id = str(uuid.uuid4())
-        FLASHCARDS_DB[set_id] = {
-            "title": filename.rsplit('.', 1)[0],  # Utiliser le nom du fichier sans extension
-            "source": filename,
-            "creation_date": datetime.datetime.now().isoformat(),
-            "flashcards": flashcards
-        }
-        
-        # Sauvegarder les changements dans le fichier
-        save_flashcards_db(FLASHCARDS_DB)
-        
-        return jsonify({
-            "success": True,
-            "message": "Fichier traité avec succès",
-            "gemini_used": not is_default,
-            "gemini_status": gemini_status if not is_default else "Fallback utilisé",
-            "set_id": set_id,
-            "title": FLASHCARDS_DB[set_id]["title"],
-            "flashcards": flashcards,
-            "text_length": len(text)
-        }), 200
+        with buffer:
+            # Obtenir le nombre de cartes demandé (paramètre optionnel)
+            num_cards = request.args.get('num_cards', default=5, type=int)
+            
+            # Fichier déjà traité: réponse immédiate avec une copie des cartes en cache
+            cached_text = TEXT_CACHE.get(text_cache_key(file_hash))
+            if cached_text is not None:
+                flashcards = get_cached_flashcards(cached_text["text"], num_cards, g.tenant)
+                if flashcards is not None:
+                    result = save_upload_result(tenant_store(), filename, cached_text["text"], flashcards, test_gemini_api())
+                    result["cached"] = True
+                    return jsonify(result), 200
+            
+            return job_response("upload", {
+                "filename": filename,
+                "file_hash": file_hash,
+                "num_cards": num_cards,
+                "tenant": g.tenant
+            }, buffer=buffer)
     
     return jsonify({"error": "Type de fichier non autorisé"}), 400
 
+# Erreurs de lecture d'un membre d'archive (CRC, en-tête corrompu, données tronquées,
+# compression non prise en charge, fichier chiffré): le membre est ignoré, pas le lot
+ZIP_MEMBER_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError)
+
+def zip_member_error(error):
+    return f"Fichier illisible dans l'archive ({type(error).__name__}: {error})"
+
+def iter_batch_files(files):
+    """
+    Fichiers d'un envoi groupé, y compris ceux contenus dans des archives
+    zip: (nom, flux binaire, None) pour un fichier à traiter, (nom, None,
+    raison) pour un fichier ignoré. Le nombre de fichiers et la taille
+    décompressée des archives sont bornés. Le flux d'un membre d'archive peut
+    lever une des ZIP_MEMBER_ERRORS pendant sa lecture.
+    """
+    accepted = 0
+    uncompressed = 0
+    for file in files:
+        filename = secure_filename(file.filename or "")
+        if filename.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(file.stream)
+            except (zipfile.BadZipFile, EOFError, ValueError, OSError):
+                yield filename, None, "Archive zip invalide"
+                continue
+            with archive:
+                for member in archive.infolist():
+                    name = secure_filename(os.path.basename(member.filename))
+                    if member.is_dir() or not name or member.filename.startswith("__MACOSX/"):
+                        continue
+                    if not allowed_file(name):
+                        yield name, None, "Type de fichier non autorisé"
+                        continue
+                    uncompressed += member.file_size
+                    if accepted >= BATCH_MAX_FILES or uncompressed > BATCH_MAX_UNCOMPRESSED_BYTES:
+                        yield name, None, "Limite du lot atteinte"
+                        continue
+                    try:
+                        stream = archive.open(member)
+                    except ZIP_MEMBER_ERRORS as e:
+                        yield name, None, zip_member_error(e)
+                        continue
+                    accepted += 1
+                    with stream:
+                        yield name, stream, None
+        elif filename and allowed_file(filename):
+            if accepted >= BATCH_MAX_FILES:
+                yield filename, None, "Limite du lot atteinte"
+                continue
+            accepted += 1
+            yield filename, file.stream, None
+        else:
+            yield filename or "(sans nom)", None, "Type de fichier non autorisé"
+
+@app.route('/api/upload/batch', methods=['POST'])
+def upload_batch():
+    """
+    Génération à partir de plusieurs fichiers (champ "files", répété) ou
+    d'archives zip: une tâche par fichier, exécutées par le pool de tâches.
+    La progression de chaque fichier est suivie sur /api/batches/<id>.
+    """
+    request.max_content_length = BATCH_MAX_UPLOAD_BYTES
+    files = request.files.getlist('files') + request.files.getlist('file')
+    if not files:
+        return jsonify({"error": "Aucun fichier dans la requête"}), 400
+    num_cards = request.args.get('num_cards', default=5, type=int)
+    # Le lot compte pour une requête dans la limite de débit, chaque fichier pour une génération
+    limited = limit_rate()
+    if limited is not None:
+        return limited
+
+    entries = []
+    skipped = []
+    for filename, stream, reason in iter_batch_files(files):
+        if stream is None:
+            skipped.append({"filename": filename, "reason": reason})
+            continue
+        try:
+            with span("upload_receive"):
+                buffer, file_hash = spool_stream(stream, UPLOAD_FOLDER, max_memory=UPLOAD_SPOOL_MAX_MEMORY)
+        except ZIP_MEMBER_ERRORS as e:
+            # Membre corrompu (CRC...) détecté à la lecture
+            skipped.append({"filename": filename, "reason": zip_member_error(e)})
+            continue
+        # Quota décompté une fois le fichier lu en entier
+        if consume_generation_quota() is not None:
+            buffer.close()
+            skipped.append({"filename": filename, "reason": "Quota journalier de générations atteint"})
+            continue
+        with buffer:
+            params = {"filename": filename, "file_hash": file_hash, "num_cards": num_cards, "tenant": g.tenant}
+            save_upload_buffer(params, buffer)
+        entries.append({"filename": filename, "job_id": JOBS.submit("upload", params)["id"]})
+
+    if not entries:
+        return jsonify({"error": "Aucun fichier exploitable dans le lot", "skipped": skipped}), 400
+
+    # Le lot est enregistré comme une tâche terminée qui référence les tâches de ses fichiers
+    batch = new_job("batch", {"tenant": g.tenant})
+    batch.update(status=DONE, result={"files": entries, "skipped": skipped})
+    STORE.create_job(batch)
+    return jsonify({
+        "success": True,
+        "message": f"{len(entries)} fichier(s) en cours de traitement",
+        "batch_id": batch["id"],
+        "files": entries,
+        "skipped": skipped,
+        "status_url": f"/api/batches/{batch['id']}"
+    }), 202
+
+@app.route('/api/batches/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """État d'un lot: statut, progression et jeu créé pour chaque fichier"""
+    batch = STORE.get_job(batch_id)
+    if not owns_job(batch) or batch["kind"] != "batch":
+        return jsonify({"error": "Lot non trouvé"}), 404
+
+    files = []
+    for entry in batch["result"]["files"]:
+        job = STORE.get_job(entry["job_id"]) or {"status": FAILED, "progress": None, "result": None, "error": "Tâche non trouvée"}
+        files.append({
+            "filename": entry["filename"],
+            "job_id": entry["job_id"],
+            "status": job["status"],
+            "progress": job["progress"],
+            "set_id": (job["result"] or {}).get("set_id"),
+            "error": job["error"]
+        })
+    finished = sum(1 for f in files if f["status"] in FINISHED_STATUSES)
+    return jsonify({
+        "id": batch_id,
+        "status": DONE if finished == len(files) else "running",
+        "total": len(files),
+        "done": sum(1 for f in files if f["status"] == DONE),
+        "failed": sum(1 for f in files if f["status"] == FAILED),
+        "files": files,
+        "skipped": batch["result"]["skipped"]
+    }), 200
+
+@app.route('/api/export', methods=['GET'])
+def export_sets():
+    """
+    Exporte les jeux (tous, ou ceux des paramètres set_id répétés) au format
+    ndjson, csv ou anki. La réponse est produite en flux, jeu par jeu.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORTERS:
+        return jsonify({"error": f"Format inconnu (formats: {', '.join(EXPORTERS)})"}), 400
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    lines = EXPORTERS[export_format](iter_sets(tenant_store(), request.args.getlist('set_id')))
+    return Response(lines, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=brainboost-export.{extension}"
+    })
+
+@app.route('/api/import', methods=['POST'])
+def import_sets():
+    """
+    Importe des jeux (format ndjson, csv ou anki) envoyés dans le corps de
+    la requête ou dans le champ "file". Le fichier est lu en flux et chaque
+    jeu est enregistré dès qu'il est complet. Les identifiants d'un export
+    sont conservés s'ils ne sont pas déjà utilisés.
+    """
+    import_format = request.args.get('format', 'ndjson')
+    if import_format not in IMPORTERS:
+        return jsonify({"error": f"Format inconnu (formats: {', '.join(IMPORTERS)})"}), 400
+    request.max_content_length = IMPORT_MAX_BYTES
+    upload = request.files.get('file')
+    lines = io.TextIOWrapper(upload.stream if upload is not None else request.stream, encoding='utf-8-sig', newline='')
+
+    imported_sets = 0
+    imported_cards = 0
+    errors = []
+    error_count = 0
+    try:
+        for record in IMPORTERS[import_format](lines):
+            if "error" in record:
+                error_count += 1
+                if len(errors) < 50:
+                    errors.append({"line": record["line"], "error": record["error"]})
+                continue
+            card_set = record["set"]
+            cards = card_set["flashcards"]
+            if not cards:
+                continue
+            # Identifiants de cartes uniques dans le jeu, difficulté estimée si absente
+            seen = set()
+            for card in cards:
+                if card["id"] in seen:
+                    card["id"] = str(uuid.uuid4())
+                seen.add(card["id"])
+            to_estimate = [card for card in cards if "difficulty" not in card]
+            for card, difficulty in zip(to_estimate, estimate_cards_difficulty(
+                    [(card["question"], card["answer"]) for card in to_estimate])):
+                card["difficulty"] = difficulty
+            card_set["creation_date"] = card_set.get("creation_date") or datetime.datetime.now().isoformat()
+
+            set_id = record["id"]
+            if not set_id or tenant_store().has_set(set_id):
+                set_id = str(uuid.uuid4())
+            with span("persist"):
+                tenant_store().create_set(set_id, card_set)
+            imported_sets += 1
+            imported_cards += len(cards)
+    except UnicodeDecodeError:
+        return jsonify({"success": False, "error": "Le fichier doit être encodé en UTF-8",
+                        "imported_sets": imported_sets, "imported_cards": imported_cards}), 400
+
+    return jsonify({
+        "success": True,
+        "imported_sets": imported_sets,
+        "imported_cards": imported_cards,
+        "error_count": error_count,
+        "errors": errors
+    }), 200
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Statistiques des caches d'extraction de texte et de cartes générées"""
+    return jsonify({
+        "text": TEXT_CACHE.stats(),
+        "flashcards": CARDS_CACHE.stats()
+    }), 200
+
+@app.route('/api/quota', methods=['GET'])
+def get_quota():
+    """Consommation du jour et limites du locataire"""
+    return jsonify({
+        "tenant": g.tenant,
+        "usage": QUOTAS.usage(g.tenant),
+        "limits": {
+            "daily_generations": TENANT_DAILY_GENERATIONS or None,
+            "generation_requests_per_minute": TENANT_RATE_LIMIT_PER_MINUTE or None,
+            "burst": TENANT_RATE_LIMIT_BURST
+        }
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métriques du processus au format texte de Prometheus"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Récupérer l'état et la progression d'une tâche de génération"""
+    job = STORE.get_job(job_id)
+    if not owns_job(job):
+        return jsonify({"error": "Tâche non trouvée"}), 404
+    
+    return jsonify(public_job(job, include_cards='cards' in request.args)), 200
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """
+    Diffuse en Server-Sent Events la progression d'une tâche: un événement
+    "card" par carte produite, "progress" à chaque morceau terminé, puis
+    "done" (résultat final) ou "error". Si la tâche est reprise après une
+    interruption, "restart" signale que ses cartes seront renvoyées depuis le
+    début.
+    """
+    if not owns_job(STORE.get_job(job_id)):
+        return jsonify({"error": "Tâche non trouvée"}), 404
+    
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    def events():
+        sent_cards = 0
+        last_progress = None
+        while True:
+            job = STORE.get_job(job_id)
+            if job is None:
+                # Tâche supprimée (rétention) pendant que le client est connecté
+                yield sse("error", {"error": "Tâche non trouvée"})
+                return
+            if len(job["cards"]) < sent_cards:
+                sent_cards = 0
+                yield sse("restart", {})
+            for card in job["cards"][sent_cards:]:
+                yield sse("card", card)
+            sent_cards = len(job["cards"])
+            if job["progress"] != last_progress:
+                last_progress = job["progress"]
+                yield sse("progress", last_progress)
+            if job["status"] == DONE:
+                yield sse("done", job["result"])
+                return
+            if job["status"] == FAILED:
+                yield sse("error", {"error": job["error"]})
+                return
+            time.sleep(JOB_EVENTS_POLL_INTERVAL)
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+def conditional_etag(*parts):
+    """
+    ETag calculé à partir des compteurs de révision du stockage et des
+    paramètres de la requête, sans charger les données. Retourne l'ETag et
+    une réponse 304 si le client possède déjà cette version.
+    """
+    etag = make_key(request.path, request.query_string.decode('utf-8'), g.tenant, *parts)[:32]
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return etag, response
+    return etag, None
+
+def with_etag(response, etag):
+    """Ajoute l'ETag et oblige le navigateur à revalider (If-None-Match) avant de réutiliser sa copie"""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 @app.route('/api/flashcards', methods=['GET'])
 def get_all_flashcard_sets():
-    """Récupérer tous les jeux de flashcards"""
-    result = []
-    
-    for set_id, card_set in FLASHCARDS_DB.items():
-        result.append({
-            "id": set_id,
-            "title": card_set["title"],
-            "source": card_set.get("source", ""),
-            "creation_date": card_set.get("creation_date", ""),
-            "count": len(card_set["flashcards"])
-        })
+    """
+    Récupérer les jeux de flashcards depuis l'index des résumés.
+
+    Paramètres optionnels: `limit` et `cursor` (pagination par curseur, le
+    curseur suivant est renvoyé dans l'en-tête X-Next-Cursor), `sort`
+    (creation_date ou -creation_date) et `fields` (liste de champs séparés par
+    des virgules).
+    """
+    sort = request.args.get('sort', 'creation_date')
+    if sort not in ('creation_date', '-creation_date'):
+        return jsonify({"error": f"Tri non supporté: {sort}"}), 400
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        return jsonify({"error": "Le paramètre limit doit être positif"}), 400
+    
+    etag, not_modified = conditional_etag(tenant_store().revision())
+    if not_modified is not None:
+        return not_modified
+    
+    try:
+        result, next_cursor = tenant_store().list_sets(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            descending=sort.startswith('-')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    return jsonify(result), 200
+    fields = request.args.get('fields')
+    if fields:
+        keep = set(fields.split(','))
+        result = [{key: value for key, value in item.items() if key in keep} for item in result]
+    
+    response = with_etag(jsonify(result), etag)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
 
 @app.route('/api/flashcards/<set_id>', methods=['GET'])
 def get_flashcard_set(set_id):
-    """Récupérer un jeu spécifique de flashcards"""
-    if set_id not in FLASHCARDS_DB:
+    """
+    Récupérer un jeu spécifique de flashcards. Avec `limit` (et `offset`),
+    seule la plage de cartes demandée est renvoyée, avec le total dans "count".
+    """
+    revision = tenant_store().set_revision(set_id)
+    if revision is None:
         return jsonify({"error": "Jeu de flashcards non trouvé"}), 404
     
-    return jsonify(FLASHCARDS_DB[set_id]), 200
+    etag, not_modified = conditional_etag(revision)
+    if not_modified is not None:
+        return not_modified
+    
+    offset = request.args.get('offset', default=0, type=int)
+    limit = request.args.get('limit', type=int)
+    if offset < 0 or (limit is not None and limit < 0):
+        return jsonify({"error": "Plage de cartes invalide"}), 400
+    
+    card_set = tenant_store().get_set(set_id, offset=offset, limit=limit)
+    if card_set is None:
+        return jsonify({"error": "Jeu de flashcards non trouvé"}), 404
+    
+    return with_etag(jsonify(card_set), etag), 200
 
 @app.route('/api/flashcards/<set_id>', methods=['PUT'])
 def update_flashcard_set(set_id):
     """Mettre à jour un jeu spécifique de flashcards"""
-    if set_id not in FLASHCARDS_DB:
-        return jsonify({"error": "Jeu de flashcards non trouvé"}), 404
-    
     data = request.json
+    flashcards = data.get("flashcards")
+    if flashcards is not None:
+        if not isinstance(flashcards, list) or not all(isinstance(card, dict) for card in flashcards):
+            return jsonify({"error": "Le champ flashcards doit être une liste de cartes"}), 400
+        # Une carte ajoutée dans l'éditeur reçoit un identifiant; un doublon est refusé
+        for card in flashcards:
+            if not card.get("id"):
+                card["id"] = str(uuid.uuid4())
     
-    # Mise à jour du jeu de flashcards
-    if "title" in data:
-        FLASHCARDS_DB[set_id]["title"] = data["title"]
-    
-    if "flashcards" in data:
-        FLASHCARDS_DB[set_id]["flashcards"] = data["flashcards"]
-    
-    # Save changes to file
-    save_flashcards_db(FLASHCARDS_DB)
+    # Mise à jour du jeu de flashcards (seul ce jeu est réécrit)
+    try:
+        updated = tenant_store().update_set(set_id, title=data.get("title"), flashcards=flashcards)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not updated:
+        return jsonify({"error": "Jeu de flashcards non trouvé"}), 404
     
     return jsonify({
         "success": True,
@@ -444,48 +1370,219 @@ def update_flashcard_set(set_id):
         "set_id": set_id
     }), 200
 
-@app.route('/api/flashcards/<set_id>/cards/<card_id>', methods=['PUT'])
+# Champs modifiables d'une carte et types acceptés
+CARD_FIELDS = {
+    "question": (str,),
+    "answer": (str,),
+    "tags": (list,),
+    "difficulty": (int,),
+    "lastReviewed": (str, type(None)),
+    "nextReview": (str, type(None)),
+    "reviewCount": (int,)
+}
+
+
+def validate_card_fields(data, card_id, strict=True):
+    """
+    Vérifie les champs d'une mise à jour de carte et retourne (champs, erreur).
+    En mode strict (PATCH), un champ inconnu est une erreur; sinon (PUT, qui
+    reçoit la carte complète de l'éditeur) il est simplement ignoré.
+    """
+    if not isinstance(data, dict):
+        return None, "Le corps de la requête doit être un objet JSON"
+
+    fields = {}
+    for key, value in data.items():
+        if key == "id":
+            if value != card_id:
+                return None, "L'identifiant d'une carte ne peut pas être modifié"
+            continue
+        if key not in CARD_FIELDS:
+            if strict:
+                return None, f"Champ inconnu: {key}"
+            continue
+        # bool est une sous-classe de int: on le refuse explicitement
+        if not isinstance(value, CARD_FIELDS[key]) or isinstance(value, bool):
+            return None, f"Type invalide pour le champ {key}"
+        fields[key] = value
+
+    if "difficulty" in fields and not 1 <= fields["difficulty"] <= 5:
+        return None, "La difficulté doit être comprise entre 1 et 5"
+    if "reviewCount" in fields and fields["reviewCount"] < 0:
+        return None, "Le nombre de révisions ne peut pas être négatif"
+    if "tags" in fields and not all(isinstance(tag, str) for tag in fields["tags"]):
+        return None, "Les tags doivent être des chaînes de caractères"
+    for key in ("question", "answer"):
+        if key in fields and not fields[key].strip():
+            return None, f"Le champ {key} ne peut pas être vide"
+    return fields, None
+
+
+@app.route('/api/flashcards/<set_id>/cards/<card_id>', methods=['PUT', 'PATCH'])
 def update_flashcard(set_id, card_id):
-    """Mettre à jour une carte spécifique"""
-    if set_id not in FLASHCARDS_DB:
+    """Mettre à jour une carte spécifique (PATCH: seuls les champs fournis sont modifiés)"""
+    if not tenant_store().has_set(set_id):
         return jsonify({"error": "Jeu de flashcards non trouvé"}), 404
     
-    data = request.json
-    
-    # Recherche de la carte
-    card_index = None
-    for i, card in enumerate(FLASHCARDS_DB[set_id]["flashcards"]):
-        if card["id"] == card_id:
-            card_index = i
-            break
+    fields, error = validate_card_fields(request.get_json(silent=True), card_id, strict=request.method == 'PATCH')
+    if error:
+        return jsonify({"error": error}), 400
     
-    if card_index is None:
+    # Mise à jour des champs de la carte (seule cette carte est réécrite)
+    card = tenant_store().update_card(set_id, card_id, fields)
+    if card is None:
         return jsonify({"error": "Carte non trouvée"}), 404
     
-    # Mise à jour des champs de la carte
-    for key, value in data.items():
-        FLASHCARDS_DB[set_id]["flashcards"][card_index][key] = value
+    return jsonify({
+        "success": True,
+        "message": "Carte mise à jour avec succès",
+        "card": card
+    }), 200
+
+@app.route('/api/flashcards/<set_id>/cards/batch', methods=['POST'])
+def update_flashcards_batch(set_id):
+    """
+    Appliquer en une requête les résultats d'une session de révision:
+    {"updates": [{"id": ..., "lastReviewed": ..., ...}, ...]}.
+    Les mises à jour sont écrites en une seule transaction (tout ou rien).
+    """
+    if not tenant_store().has_set(set_id):
+        return jsonify({"error": "Jeu de flashcards non trouvé"}), 404
+    
+    data = request.get_json(silent=True) or {}
+    updates = data.get("updates")
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"error": "Aucune mise à jour fournie"}), 400
     
-    # Save changes to file
-    save_flashcards_db(FLASHCARDS_DB)
+    changes = {}
+    for update in updates:
+        card_id = update.get("id") if isinstance(update, dict) else None
+        if not isinstance(card_id, str):
+            return jsonify({"error": "Chaque mise à jour doit contenir l'identifiant de la carte"}), 400
+        fields, error = validate_card_fields(update, card_id)
+        if error:
+            return jsonify({"error": f"Carte {card_id}: {error}"}), 400
+        # Plusieurs mises à jour d'une même carte sont fusionnées dans l'ordre
+        changes.setdefault(card_id, {}).update(fields)
+    
+    try:
+        cards = tenant_store().update_cards(set_id, changes)
+    except KeyError as e:
+        return jsonify({"error": "Cartes non trouvées", "missing": e.args[0]}), 404
     
     return jsonify({
         "success": True,
-        "message": "Carte mise à jour avec succès",
-        "card": FLASHCARDS_DB[set_id]["flashcards"][card_index]
+        "message": f"{len(cards)} carte(s) mise(s) à jour",
+        "cards": cards
+    }), 200
+
+def parse_grade(value):
+    """Note d'une révision (entier de 0 à 5), ou None si elle est invalide"""
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= MAX_GRADE:
+        return None
+    return value
+
+@app.route('/api/flashcards/<set_id>/review', methods=['POST'])
+def review_flashcards(set_id):
+    """
+    Enregistrer les réponses d'une session de révision:
+    {"reviews": [{"id": ..., "grade": 0-5}, ...]}. Le planificateur SM-2
+    calcule la prochaine échéance de chaque carte; toutes les cartes sont
+    écrites en une seule transaction.
+    """
+    if not tenant_store().has_set(set_id):
+        return jsonify({"error": "Jeu de flashcards non trouvé"}), 404
+    
+    data = request.get_json(silent=True) or {}
+    reviews = data.get("reviews")
+    if not isinstance(reviews, list) or not reviews:
+        return jsonify({"error": "Aucune révision fournie"}), 400
+    
+    now = datetime.datetime.now()
+    grades = {}
+    for review in reviews:
+        card_id = review.get("id") if isinstance(review, dict) else None
+        grade = parse_grade(review.get("grade")) if isinstance(review, dict) else None
+        if not isinstance(card_id, str) or grade is None:
+            return jsonify({"error": "Chaque révision doit contenir l'identifiant de la carte et une note de 0 à 5"}), 400
+        grades.setdefault(card_id, []).append(grade)
+    
+    def schedule(card_grades):
+        def apply(card):
+            # Une carte révisée plusieurs fois dans la session est planifiée à partir de son dernier état
+            for grade in card_grades:
+                changes = review_card(card, grade, now)
+                card.update(changes)
+            return changes
+        return apply
+    
+    try:
+        # Lecture de l'état courant et écriture dans la même transaction du stockage
+        cards = tenant_store().update_cards(set_id, {
+            card_id: schedule(card_grades) for card_id, card_grades in grades.items()
+        })
+    except KeyError as e:
+        return jsonify({"error": "Cartes non trouvées", "missing": e.args[0]}), 404
+    
+    return jsonify({
+        "success": True,
+        "message": f"{len(cards)} carte(s) planifiée(s)",
+        "cards": cards
     }), 200
 
+@app.route('/api/review/due', methods=['GET'])
+def get_due_cards():
+    """Prochaines cartes à réviser, tous jeux confondus (ou d'un seul jeu avec ?set_id=)"""
+    limit = request.args.get('limit', 20, type=int)
+    if limit is None or limit < 1:
+        return jsonify({"error": "Le paramètre limit doit être positif"}), 400
+    
+    now = datetime.datetime.now()
+    items = tenant_store().due_cards(now.timestamp(), limit=limit, set_id=request.args.get('set_id'))
+    return jsonify({
+        "now": now.isoformat(),
+        "count": len(items),
+        "cards": items
+    }), 200
+
+@app.route('/api/search', methods=['GET'])
+def search_flashcards():
+    """
+    Recherche plein texte (BM25) dans toutes les cartes: ?q=...&limit=20,
+    optionnellement limitée à un jeu (?set_id=) ; ?any=true accepte les
+    cartes qui ne contiennent qu'une partie des mots.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Le paramètre q est requis"}), 400
+    limit = request.args.get('limit', 20, type=int)
+    if limit is None or limit < 1:
+        return jsonify({"error": "Le paramètre limit doit être positif"}), 400
+    
+    etag, not_modified = conditional_etag(tenant_store().revision())
+    if not_modified is not None:
+        return not_modified
+    
+    started = time.monotonic()
+    results = tenant_store().search_cards(
+        query,
+        limit=min(limit, 100),
+        set_id=request.args.get('set_id'),
+        match_all=request.args.get('any', 'false').lower() not in ('1', 'true', 'yes')
+    )
+    return with_etag(jsonify({
+        "query": query,
+        "count": len(results),
+        "took_ms": round((time.monotonic() - started) * 1000, 1),
+        "results": results
+    }), etag), 200
+
 @app.route('/api/flashcards/<set_id>', methods=['DELETE'])
 def delete_flashcard_set(set_id):
     """Supprimer un jeu spécifique de flashcards"""
-    if set_id not in FLASHCARDS_DB:
+    if not tenant_store().delete_set(set_id):
         return jsonify({"error": "Jeu de flashcards non trouvé"}), 404
     
-    del FLASHCARDS_DB[set_id]
-    
-    # Save changes to file
-    save_flashcards_db(FLASHCARDS_DB)
-    
     return jsonify({
         "success": True,
         "message": "Jeu de flashcards supprimé avec succès"
@@ -499,13 +1596,9 @@ def generate_from_text():
     if not data or "text" not in data:
         return jsonify({"error": "Aucun texte fourni"}), 400
     
-    text = data["text"]
-    num_cards = data.get("num_cards", 5)
-    title = data.get("title", "Flashcards générées")
-    
-    # Test de l'API Gemini avant génération
+    # Statut en cache de l'API Gemini (aucun appel réseau ici)
     gemini_status = test_gemini_api()
-    if not gemini_status.get("success", False):
+    if gemini_known_unavailable(gemini_status):
         return jsonify({
             "success": False,
             "message": "Échec de connexion à l'API Gemini",
@@ -513,33 +1606,22 @@ def generate_from_text():
             "fallback": "Utilisation du générateur par défaut"
         }), 200  # Return 200 to show it worked, but with error info
     
-    # Génération des flashcards
-    flashcards = generate_flashcards_from_text(text, num_cards)
-    
-    # Vérifier si nous avons des flashcards générées par Gemini ou par défaut
-    is_default = any("générée automatiquement" in card.get("question", "") for card in flashcards)
-    
-    # Stockage des flashcards dans notre "base de données"
-    set_id = str(uuid.uuid4())
-    FLASHCARDS_DB[set_id] = {
-        "title": title,
-        "source": "Texte manuel",
-        "creation_date": datetime.datetime.now().isoformat(),
-        "flashcards": flashcards
-    }
+    limited = limit_generations()
+    if limited is not None:
+        return limited
     
-    # Save changes to file
-    save_flashcards_db(FLASHCARDS_DB)
-    
-    return jsonify({
-        "success": True,
-        "message": "Flashcards générées avec succès",
-        "gemini_used": not is_default,
-        "gemini_status": gemini_status if not is_default else "Fallback utilisé",
-        "set_id": set_id,
-        "title": title,
-        "flashcards": flashcards
-    }), 200
+    return job_response("text", {
+        "text": data["text"],
+        "num_cards": data.get("num_cards", 5),
+        "title": data.get("title", "Flashcards générées"),
+        "gemini_status": gemini_status,
+        "tenant": g.tenant
+    })
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0')
\ No newline at end of file
+    # Serveur de développement uniquement; en production: gunicorn -c gunicorn.conf.py app:app
+    app.run(
+        debug=os.getenv('FLASK_DEBUG') == '1',
+        host=os.getenv('HOST', '0.0.0.0'),
+        port=int(os.getenv('PORT', 5000))
+    )
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import math
+import time
+import platform
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def percentile(sorted_samples, fraction):
+    """Percentile par rang le plus proche d'une liste déjà triée"""
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, max(0, math.ceil(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples, items=1, elapsed=None):
+    """
+    Statistiques d'une série de durées (secondes): p50/p95/p99 et moyenne en
+    millisecondes, débit en éléments par seconde.
+    """
+    ordered = sorted(samples)
+    total = elapsed if elapsed is not None else sum(samples)
+    return {
+        "runs": len(samples),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "mean_ms": round(total / len(samples) * 1000, 3),
+        "throughput_per_s": round(items * len(samples) / total, 2) if total else None
+    }
+
+
+def measure(fn, repeat=5, warmup=1, items=1):
+    """Exécute `fn` `warmup` fois sans mesure puis `repeat` fois, et résume les durées"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, items)
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus et de ses enfants terminés (Mo)"""
+    if resource is None:
+        return None
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return {"self": round(own / 1024 / 1024, 1), "children": round(children / 1024 / 1024, 1)}
+
+
+def environment():
+    """Contexte de la mesure, pour comparer des résultats entre commits"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def compare(baseline, current, tolerance=0.10):
+    """
+    Compare deux fichiers de résultats: retourne les lignes du rapport et la
+    liste des benchmarks dont le p50 a augmenté de plus de `tolerance`.
+    """
+    lines = []
+    regressions = []
+    for name, result in sorted(current["benchmarks"].items()):
+        before = baseline.get("benchmarks", {}).get(name)
+        if before is None or not before.get("p50_ms"):
+            lines.append(f"{name}: nouveau ({result['p50_ms']} ms)")
+            continue
+        ratio = result["p50_ms"] / before["p50_ms"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  <-- régression"
+            regressions.append(name)
+        lines.append(f"{name}: p50 {before['p50_ms']} -> {result['p50_ms']} ms (x{ratio:.2f}){flag}")
+    return lines, regressions
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import uuid
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import summarize
+from benchmarks.synthetic import make_pdf, make_text
+
+
+class ApiClient:
+    """Client HTTP minimal (bibliothèque standard) pour le serveur de test"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def request(self, method, path, payload=None, body=None, headers=None):
+        headers = dict(headers or {})
+        if payload is not None:
+            body = json.dumps(payload).encode('utf-8')
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def json(self, method, path, payload=None):
+        status, body = self.request(method, path, payload)
+        return status, json.loads(body) if body else None
+
+    def upload(self, path, filename, content):
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n"
+        ).encode('utf-8') + content + f"\r\n--{boundary}--\r\n".encode('utf-8')
+        return self.request("POST", path, body=body, headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+
+def run_scenario(name, call, requests, concurrency):
+    """
+    Envoie `requests` requêtes (call(i) retourne le statut HTTP) avec
+    `concurrency` clients simultanés et résume les latences.
+    """
+    latencies = [None] * requests
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i):
+        started = time.perf_counter()
+        status = call(i)
+        latencies[i] = time.perf_counter() - started
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies)
+    # Débit observé: requêtes terminées par seconde d'horloge (clients en parallèle)
+    result["throughput_per_s"] = round(requests / elapsed, 2)
+    result["concurrency"] = concurrency
+    result["statuses"] = {str(status): count for status, count in sorted(statuses.items())}
+    return f"load.{name}", result
+
+
+def run_load_test(quick, concurrency=8):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from fake_gemini import make_server as make_fake_gemini
+
+    # Faux Gemini local (latence réaliste mais courte, sans erreurs) sur un port libre
+    fake = make_fake_gemini(port=0, latency=0.05, jitter=0.02)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+    os.environ["GEMINI_API_KEY"] = "fake"
+    os.environ["GEMINI_API_ENDPOINT"] = f"http://127.0.0.1:{fake.server_address[1]}"
+    os.environ["GEMINI_RATE_PER_MINUTE"] = "0"
+    # Limites des locataires désactivées: le test mesure le débit, pas les refus
+    os.environ["TENANT_RATE_LIMIT_PER_MINUTE"] = "0"
+    os.environ["TENANT_DAILY_GENERATIONS"] = "0"
+
+    import app
+    # Journal d'accès désactivé: il fausserait les mesures et noierait le rapport
+    quiet_handler = type("QuietRequestHandler", (WSGIRequestHandler,), {"log_request": lambda self, *args: None})
+    server = make_server("127.0.0.1", 0, app.app, threaded=True, request_handler=quiet_handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api = ApiClient(f"http://127.0.0.1:{server.server_address[1]}")
+    app.test_gemini_api(force=True)
+
+    requests = 40 if quick else 200
+    run_id = uuid.uuid4().hex[:8]
+
+    # Données initiales: des jeux générés par l'API
+    set_ids = []
+    for i in range(requests + 4):
+        _, created = api.json("POST", "/api/generate?sync=true", {
+            "text": make_text(16, seed=f"{run_id}-seed-{i}"), "num_cards": 5, "title": f"Jeu {i}"
+        })
+        set_ids.append(created["set_id"])
+    set_id = set_ids[0]
+    _, card_set = api.json("GET", f"/api/flashcards/{set_id}")
+    card_ids = [card["id"] for card in card_set["flashcards"]]
+    _, accepted = api.json("POST", "/api/generate", {"text": make_text(16, seed=f"{run_id}-job"), "num_cards": 5})
+    job_id = accepted["job_id"]
+    for _ in range(600):
+        if api.json("GET", f"/api/jobs/{job_id}")[1]["status"] in ("done", "failed"):
+            break
+        time.sleep(0.1)
+    pdf = make_pdf(20, seed=run_id)
+
+    scenarios = {
+        "index": lambda i: api.request("GET", "/")[0],
+        "test_gemini": lambda i: api.request("GET", "/api/test-gemini")[0],
+        "cache_stats": lambda i: api.request("GET", "/api/cache/stats")[0],
+        "list_sets": lambda i: api.request("GET", "/api/flashcards")[0],
+        "list_sets_page": lambda i: api.request("GET", "/api/flashcards?limit=20&fields=id,title")[0],
+        "get_set": lambda i: api.request("GET", f"/api/flashcards/{set_ids[i % len(set_ids)]}")[0],
+        "update_set": lambda i: api.json("PUT", f"/api/flashcards/{set_id}", {"title": f"Titre {i}"})[0],
+        "put_card": lambda i: api.json("PUT", f"/api/flashcards/{set_id}/cards/{card_ids[i % len(card_ids)]}",
+                                       {"question": f"Question {i} ?", "answer": "Réponse"})[0],
+        "patch_card": lambda i: api.json("PATCH", f"/api/flashcards/{set_id}/cards/{card_ids[i % len(card_ids)]}",
+                                         {"difficulty": 1 + i % 5})[0],
+        "batch_cards": lambda i: api.json("POST", f"/api/flashcards/{set_id}/cards/batch",
+                                          {"updates": [{"id": card_id, "reviewCount": i} for card_id in card_ids]})[0],
+        "review": lambda i: api.json("POST", f"/api/flashcards/{set_id}/review",
+                                     {"reviews": [{"id": card_ids[i % len(card_ids)], "grade": i % 6}]})[0],
+        "review_due": lambda i: api.request("GET", "/api/review/due?limit=20")[0],
+        "search": lambda i: api.request("GET", "/api/search?q=cellule&limit=20")[0],
+        "generate_sync": lambda i: api.json("POST", "/api/generate?sync=true", {
+            "text": make_text(16, seed=f"{run_id}-sync-{i}"), "num_cards": 5})[0],
+        "generate_async": lambda i: api.json("POST", "/api/generate", {
+            "text": make_text(16, seed=f"{run_id}-async-{i}"), "num_cards": 5})[0],
+        "job_status": lambda i: api.request("GET", f"/api/jobs/{job_id}")[0],
+        "job_events": lambda i: api.request("GET", f"/api/jobs/{job_id}/events")[0],
+        "upload_pdf": lambda i: api.upload("/api/upload?sync=true&num_cards=5", f"cours-{i}.pdf", pdf if i % 2 else make_pdf(20, seed=f"{run_id}-{i}"))[0],
+        "delete_set": lambda i: api.request("DELETE", f"/api/flashcards/{set_ids[4 + i]}")[0],
+    }
+
+    results = {}
+    for name, call in scenarios.items():
+        key, result = run_scenario(name, call, requests, concurrency)
+        results[key] = result
+        print(f"  {key}: p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, {result['throughput_per_s']} req/s")
+
+    server.shutdown()
+    fake.shutdown()
+    return results
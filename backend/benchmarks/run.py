@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+from benchmarks.harness import compare, environment, load_results, peak_rss_mb
+from benchmarks.suites import BACKEND_DIR, GROUPS, prepare_process
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+
+def _run_group(name, quick, queue):
+    # Processus dédié: imports, caches et pic mémoire propres au groupe
+    work_dir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    try:
+        prepare_process(work_dir)
+        started = time.perf_counter()
+        benchmarks = GROUPS[name](quick)
+        queue.put({
+            "benchmarks": benchmarks,
+            "seconds": round(time.perf_counter() - started, 2),
+            "peak_rss_mb": peak_rss_mb()
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+        raise
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_groups(names, quick):
+    context = multiprocessing.get_context("spawn")
+    results = {"meta": environment(), "benchmarks": {}, "groups": {}}
+    results["meta"]["quick"] = quick
+    for name in names:
+        print(f"Groupe {name}...")
+        queue = context.Queue()
+        process = context.Process(target=_run_group, args=(name, quick, queue))
+        process.start()
+        outcome = queue.get()
+        process.join()
+        if "error" in outcome:
+            print(f"Groupe {name} en échec: {outcome['error']}")
+            results["groups"][name] = {"error": outcome["error"]}
+            continue
+        for key, result in outcome["benchmarks"].items():
+            results["benchmarks"][key] = result
+            if not key.startswith("load."):
+                print(f"  {key}: p50 {result['p50_ms']} ms, {result['throughput_per_s']} /s")
+        results["groups"][name] = {"seconds": outcome["seconds"], "peak_rss_mb": outcome["peak_rss_mb"]}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks et tests de charge du backend")
+    parser.add_argument("--quick", action="store_true", help="tailles réduites (vérification rapide)")
+    parser.add_argument("--only", default=",".join(GROUPS), help=f"groupes à lancer ({','.join(GROUPS)})")
+    parser.add_argument("--output", help="fichier JSON des résultats (défaut: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="résultats de référence à comparer (p50)")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="hausse du p50 tolérée (0.10 = 10 %%)")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = [name for name in names if name not in GROUPS]
+    if unknown:
+        parser.error(f"groupes inconnus: {', '.join(unknown)}")
+
+    results = run_groups(names, args.quick)
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Résultats enregistrés dans {output}")
+
+    failed = [name for name, group in results["groups"].items() if "error" in group]
+    if args.compare:
+        lines, regressions = compare(load_results(args.compare), results, args.tolerance)
+        print("\n".join(lines))
+        if regressions:
+            print(f"{len(regressions)} régression(s) au-delà de {args.tolerance:.0%}")
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks.harness import percentile
+from benchmarks.suites import BACKEND_DIR
+
+# Modules lourds qui ne doivent plus être importés au démarrage
+DEFERRED_MODULES = ("google.generativeai", "pypdf", "PIL")
+
+PROBE = f"""
+import sys, time, json
+started = time.perf_counter()
+sys.path.insert(0, {BACKEND_DIR!r})
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import_seconds": elapsed, "loaded": [m for m in {DEFERRED_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def seed_store(engine, data_dir, set_count):
+    """Base de `set_count` jeux pour vérifier que le démarrage ne dépend pas de sa taille"""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    from storage import open_store
+    from benchmarks.synthetic import make_sets
+    os.makedirs(data_dir, exist_ok=True)
+    store = open_store(engine, data_dir)
+    store.replace_all(make_sets(set_count))
+    if hasattr(store, "close"):
+        store.close()
+
+
+def measure_startup(engine, data_dir, runs):
+    """Durée totale (interpréteur compris) de `runs` démarrages à froid de app.py"""
+    env = dict(os.environ, FLASHCARDS_STORAGE=engine, FLASHCARDS_DATA_DIR=data_dir, GEMINI_API_KEY="")
+    env.pop("GEMINI_API_ENDPOINT", None)
+    samples = []
+    loaded = set()
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=os.path.dirname(data_dir), env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(time.perf_counter() - started)
+        loaded.update(json.loads(output.strip().splitlines()[-1])["loaded"])
+    return sorted(samples), sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vérifie le temps de démarrage d'un processus du backend")
+    parser.add_argument("--budget", type=float, default=1.0, help="durée maximale (p50, secondes)")
+    parser.add_argument("--sets", type=int, default=10000, help="taille de la base de test (jeux)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--engines", default="sqlite,json")
+    args = parser.parse_args(argv)
+
+    failures = []
+    work_dir = tempfile.mkdtemp(prefix="bench-startup-")
+    try:
+        for engine in args.engines.split(","):
+            data_dir = os.path.join(work_dir, engine, "data")
+            seed_store(engine, data_dir, args.sets)
+            samples, loaded = measure_startup(engine, data_dir, args.runs)
+            p50 = percentile(samples, 0.5)
+            status = "ok" if p50 <= args.budget else "HORS BUDGET"
+            print(f"{engine} ({args.sets} jeux): p50 {p50:.3f}s, max {samples[-1]:.3f}s "
+                  f"(budget {args.budget}s) {status}")
+            if p50 > args.budget:
+                failures.append(engine)
+            if loaded:
+                print(f"  modules importés au démarrage: {', '.join(loaded)}")
+                failures.append(f"{engine}: {', '.join(loaded)}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_process(work_dir, env=None):
+    """
+    Isole un groupe de benchmarks: répertoire de travail et données
+    temporaires, variables d'environnement fixées avant l'import de app.py.
+    """
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.chdir(work_dir)
+    os.environ["FLASHCARDS_DATA_DIR"] = os.path.join(work_dir, "data")
+    os.environ["GEMINI_API_KEY"] = ""
+    os.environ.pop("GEMINI_API_ENDPOINT", None)
+    for key, value in (env or {}).items():
+        os.environ[key] = value
+
+
+def bench_pdf(quick):
+    """extract_text_from_pdf sur des PDF synthétiques de 1 à 1000 pages"""
+    import app
+    from benchmarks.harness import measure
+    from benchmarks.synthetic import make_pdf
+
+    results = {}
+    for pages in ((1, 10, 100) if quick else (1, 10, 100, 1000)):
+        path = os.path.abspath(f"bench-{pages}.pdf")
+        with open(path, 'wb') as f:
+            f.write(make_pdf(pages))
+        repeat = 2 if pages >= 1000 else 5
+        results[f"pdf.extract_text.{pages}_pages"] = measure(
+            lambda: app.extract_text_from_pdf(path), repeat=repeat, items=pages
+        )
+        os.remove(path)
+    return results
+
+
+def bench_generation(quick):
+    """generate_default_flashcards et estimate_card_difficulty à grande échelle"""
+    import app
+    from benchmarks.harness import measure
+    from benchmarks.synthetic import make_text
+    from difficulty import synthetic_corpus
+
+    results = {}
+    for num_cards in ((10, 100) if quick else (10, 100, 1000)):
+        text = make_text(num_cards * 2, seed=num_cards)
+        results[f"generation.default_flashcards.{num_cards}_cards"] = measure(
+            lambda: app.generate_default_flashcards(text, num_cards), repeat=5, items=num_cards
+        )
+
+    card_count = 10000 if quick else 100000
+    pairs = synthetic_corpus(card_count)
+    results[f"difficulty.per_card.{card_count}_cards"] = measure(
+        lambda: [app.estimate_card_difficulty(q, a) for q, a in pairs], repeat=3, items=card_count
+    )
+    results[f"difficulty.batch.{card_count}_cards"] = measure(
+        lambda: app.estimate_cards_difficulty(pairs), repeat=3, items=card_count
+    )
+    return results
+
+
+def bench_storage(quick):
+    """Sauvegarde et chargement complets de la base (save/load_flashcards_db) de 1k à 100k jeux"""
+    import shutil
+    from storage import open_store
+    from benchmarks.harness import measure
+    from benchmarks.synthetic import make_sets
+
+    results = {}
+    for engine in ("sqlite", "json"):
+        for set_count in ((1000, 10000) if quick else (1000, 10000, 100000)):
+            folder = os.path.abspath(f"store-{engine}-{set_count}")
+            os.makedirs(folder, exist_ok=True)
+            store = open_store(engine, folder)
+            db = make_sets(set_count)
+            repeat = 1 if set_count >= 100000 else 3
+            results[f"storage.{engine}.save.{set_count}_sets"] = measure(
+                lambda: store.replace_all(db), repeat=repeat, warmup=0, items=set_count
+            )
+            results[f"storage.{engine}.load.{set_count}_sets"] = measure(
+                lambda: store.export_all(), repeat=repeat, warmup=0, items=set_count
+            )
+            if hasattr(store, "close"):
+                store.close()
+            shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def bench_load(quick):
+    """Tests de charge de toutes les routes, Gemini remplacé par fake_gemini.py"""
+    from benchmarks.load import run_load_test
+    return run_load_test(quick)
+
+
+GROUPS = {
+    "pdf": bench_pdf,
+    "generation": bench_generation,
+    "storage": bench_storage,
+    "load": bench_load
+}
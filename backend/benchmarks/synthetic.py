@@ -0,0 +1,74 @@
+import random
+
+
+def make_pdf(page_count, lines=20, seed=0):
+    """PDF texte minimal de `page_count` pages (police standard, sans dépendance)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(page_count))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode())
+    font_id = 3 + 2 * page_count
+    for i in range(page_count):
+        content = "BT /F1 10 Tf 50 750 Td " + " ".join(
+            f"(Document {seed} page {i} ligne {j}: la notion numero {j} est definie ici.) Tj 0 -14 Td"
+            for j in range(lines)
+        ) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+_WORDS = ("cellule", "énergie", "ADN", "photosynthèse", "mitochondrie", "révolution", "1789", "équation",
+          "protéine", "molécule", "théorème", "GPU", "PageRank", "structure", "fonction", "histoire")
+
+
+def make_text(sentences, seed=0):
+    """Texte de cours synthétique de `sentences` phrases réparties en paragraphes"""
+    rng = random.Random(seed)
+    paragraphs = []
+    for start in range(0, sentences, 8):
+        paragraphs.append(" ".join(
+            " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+            for _ in range(min(8, sentences - start))
+        ))
+    return "\n\n".join(paragraphs)
+
+
+def make_sets(set_count, cards_per_set=5, seed=0):
+    """Base {set_id: jeu} au format de l'API"""
+    rng = random.Random(seed)
+    db = {}
+    for i in range(set_count):
+        set_id = f"bench-{seed}-{i}"
+        db[set_id] = {
+            "title": f"Jeu {i}",
+            "source": f"cours-{i}.pdf",
+            "creation_date": f"2024-01-01T00:00:{i:06d}",
+            "flashcards": [
+                {
+                    "id": f"{set_id}-{j}",
+                    "question": " ".join(rng.choice(_WORDS) for _ in range(6)) + " ?",
+                    "answer": " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 25))),
+                    "difficulty": rng.randint(1, 5),
+                    "lastReviewed": None,
+                    "nextReview": None,
+                    "reviewCount": 0
+                }
+                for j in range(cards_per_set)
+            ]
+        }
+    return db
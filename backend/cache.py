@@ -0,0 +1,156 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+
+def sha256_file(file_path, block_size=1024 * 1024):
+    """Empreinte SHA-256 d'un fichier, lue par blocs"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sha256_text(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def make_key(*parts):
+    """Clé de cache à partir de plusieurs composantes (hash, paramètres, version...)"""
+    return sha256_text("\x1f".join(str(part) for part in parts))
+
+
+class DiskCache:
+    """
+    Cache clé/valeur adressé par contenu, stocké dans SQLite pour survivre aux
+    redémarrages et être partagé entre processus.
+
+    Les entrées plus vieilles que `max_age` secondes sont ignorées puis
+    supprimées; au-delà de `max_bytes`, les entrées les moins récemment
+    utilisées sont évincées. La taille totale est tenue à jour par des
+    triggers (table cache_sizes), sans parcourir la table à chaque écriture.
+    Les compteurs de succès/échecs sont propres au processus.
+    """
+
+    def __init__(self, path, name, max_bytes=256 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.path = path
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {name} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_accessed ON {name}(accessed_at)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_created ON {name}(created_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_sizes (name TEXT PRIMARY KEY, total INTEGER NOT NULL)")
+            # Total initialisé une seule fois (y compris pour un cache créé avant les triggers)
+            conn.execute(
+                f"INSERT OR IGNORE INTO cache_sizes (name, total) SELECT ?, COALESCE(SUM(size), 0) FROM {name}",
+                (name,)
+            )
+            conn.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS {name}_size_insert AFTER INSERT ON {name} BEGIN
+                    UPDATE cache_sizes SET total = total + new.size WHERE name = '{name}';
+                END"""
+            )
+            conn.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS {name}_size_delete AFTER DELETE ON {name} BEGIN
+                    UPDATE cache_sizes SET total = total - old.size WHERE name = '{name}';
+                END"""
+            )
+            conn.execute(
+                f"""CREATE TRIGGER IF NOT EXISTS {name}_size_update AFTER UPDATE OF size ON {name} BEGIN
+                    UPDATE cache_sizes SET total = total + new.size - old.size WHERE name = '{name}';
+                END"""
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Retourne la valeur en cache, ou None (entrée absente ou expirée)"""
+        conn = self._conn()
+        row = conn.execute(f"SELECT value, created_at FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.max_age:
+            if row is not None:
+                conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+            with self._lock:
+                self.misses += 1
+            return None
+        conn.execute(f"UPDATE {self.name} SET accessed_at = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        conn = self._conn()
+        # UPSERT plutôt que REPLACE: le remplacement d'une entrée passe par le trigger de mise à jour
+        conn.execute(
+            f"INSERT INTO {self.name} (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+            (key, data, len(data), now, now)
+        )
+        self.evict()
+
+    def total_size(self):
+        return self._conn().execute("SELECT total FROM cache_sizes WHERE name = ?", (self.name,)).fetchone()[0]
+
+    def evict(self):
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà de max_bytes"""
+        conn = self._conn()
+        conn.execute(f"DELETE FROM {self.name} WHERE created_at < ?", (time.time() - self.max_age,))
+        total = self.total_size()
+        if total <= self.max_bytes:
+            return
+        to_delete = []
+        for key, size in conn.execute(f"SELECT key, size FROM {self.name} ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        conn.executemany(f"DELETE FROM {self.name} WHERE key = ?", to_delete)
+
+    def stats(self):
+        entries = self._conn().execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+        size = self.total_size()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None
+        }
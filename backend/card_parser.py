@@ -0,0 +1,139 @@
+import json
+
+
+# Schéma des cartes demandé au modèle (sortie JSON structurée)
+CARD_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "question": {"type": "string"},
+            "answer": {"type": "string"},
+            "difficulty": {"type": "integer"}
+        },
+        "required": ["question", "answer"]
+    }
+}
+
+
+def validate_card(value):
+    """
+    Carte nettoyée (question, réponse et difficulté éventuelle), ou None si
+    l'objet n'est pas une carte exploitable. Une difficulté invalide est
+    retirée: elle sera estimée plus tard.
+    """
+    if not isinstance(value, dict):
+        return None
+    question = value.get("question")
+    answer = value.get("answer")
+    if not isinstance(question, str) or not isinstance(answer, str):
+        return None
+    question, answer = question.strip(), answer.strip()
+    if not question or not answer:
+        return None
+    card = {"question": question, "answer": answer}
+    difficulty = value.get("difficulty")
+    if isinstance(difficulty, int) and not isinstance(difficulty, bool) and 1 <= difficulty <= 5:
+        card["difficulty"] = difficulty
+    return card
+
+
+class CardStreamParser:
+    """
+    Analyseur incrémental d'un tableau JSON de cartes.
+
+    Le texte est reçu par morceaux (`feed`) et parcouru une seule fois, sans
+    retour en arrière: chaque objet de premier niveau du tableau est décodé
+    dès que son accolade fermante arrive. Le texte autour du tableau (balises
+    ```json, explications) est ignoré, une réponse tronquée donne les cartes
+    complètes reçues jusque-là, et un objet invalide est écarté sans
+    perdre les autres.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.dropped = 0
+        self._opening = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._current = []
+
+    def feed(self, text):
+        """Analyse un nouveau morceau de texte et retourne les cartes valides qu'il complète"""
+        cards = []
+        for char in text:
+            if self.finished:
+                break
+            if not self.started:
+                # Le tableau commence à un "[" suivi d'un objet ou de "]" (pas à un
+                # crochet d'une phrase d'explication)
+                if char == "[":
+                    self._opening = True
+                    continue
+                if not self._opening or char.isspace():
+                    continue
+                self._opening = False
+                if char not in "{]":
+                    continue
+                self.started = True
+
+            if self._depth > 0:
+                self._current.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    if char == "[":
+                        # Tableau imbriqué hors d'un objet: pas une carte
+                        self.dropped += 1
+                    self._current = [char]
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    if char == "]":
+                        self.finished = True
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    card = self._decode("".join(self._current))
+                    self._current = []
+                    if card is not None:
+                        cards.append(card)
+        return cards
+
+    def _decode(self, raw):
+        if not raw.startswith("{"):
+            return None
+        try:
+            card = validate_card(json.loads(raw))
+        except ValueError:
+            card = None
+        if card is None:
+            self.dropped += 1
+        return card
+
+
+def parse_flashcards(text):
+    """
+    Cartes valides d'une réponse complète, ou None si la réponse ne contient
+    aucun tableau JSON.
+    """
+    parser = CardStreamParser()
+    cards = parser.feed(text)
+    if not parser.started:
+        return None
+    if parser.dropped:
+        print(f"{parser.dropped} carte(s) invalide(s) ignorée(s) dans la réponse de Gemini")
+    return cards
@@ -0,0 +1,181 @@
+import re
+import unicodedata
+
+
+# Séparateur de pages inséré par l'extraction PDF
+PAGE_BREAK = "\f"
+
+_PARAGRAPH_SPLIT = re.compile(r'\n\s*\n')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def _split_oversized(unit, max_chars):
+    """Découpe un paragraphe trop long sur les fins de phrase, puis en dur si nécessaire"""
+    pieces = []
+    current = ""
+    for sentence in _SENTENCE_SPLIT.split(unit):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _iter_units(pages, max_chars):
+    for piece in pages:
+        for page in piece.split(PAGE_BREAK):
+            for paragraph in _PARAGRAPH_SPLIT.split(page):
+                paragraph = paragraph.strip()
+                if not paragraph:
+                    continue
+                if len(paragraph) > max_chars:
+                    yield from _split_oversized(paragraph, max_chars)
+                else:
+                    yield paragraph
+
+
+def iter_text_chunks(pages, max_chars=4000):
+    """
+    Version incrémentale de `split_text_into_chunks`: consomme un itérable de
+    pages et produit chaque morceau dès qu'il est complet, ce qui permet de
+    commencer la génération avant la fin de l'extraction.
+    """
+    current = []
+    current_len = 0
+    for unit in _iter_units(pages, max_chars):
+        if current and current_len + 2 + len(unit) > max_chars:
+            yield "\n\n".join(current)
+            current = []
+            current_len = 0
+        current.append(unit)
+        current_len += len(unit) + (2 if current_len else 0)
+    if current:
+        yield "\n\n".join(current)
+
+
+def split_text_into_chunks(text, max_chars=4000):
+    """
+    Découpe le texte en morceaux d'au plus `max_chars` caractères en
+    respectant en priorité les limites de pages puis de paragraphes.
+    Les petits paragraphes consécutifs sont regroupés dans un même morceau.
+    """
+    return list(iter_text_chunks([text], max_chars))
+
+
+class TextStream:
+    """
+    Itérable de pages produit au fil de l'extraction. Les pages lues sont
+    conservées pour pouvoir reconstituer le texte complet (cache, générateur
+    par défaut) sans concaténations successives.
+    """
+
+    def __init__(self, pages, page_count=None):
+        self._pages = iter(pages)
+        self.page_count = page_count
+        self.pages = []
+
+    def __iter__(self):
+        for page in self._pages:
+            self.pages.append(page)
+            yield page
+
+    def text(self):
+        """Consomme les pages restantes et retourne le texte complet"""
+        for _ in self:
+            pass
+        return "".join(page + "\n" + PAGE_BREAK for page in self.pages if page)
+
+
+def plan_streamed_chunks(stream, num_cards, max_chars=4000, max_chunks=16, overgeneration=1.5):
+    """
+    Produit des couples (morceau, nombre de cartes) au fil d'un TextStream.
+
+    La taille totale du document est estimée à partir des pages déjà lues et
+    du nombre total de pages: elle sert à répartir les cartes entre les
+    morceaux et, au-delà de `max_chunks`, à ne garder qu'un morceau par
+    tranche du document.
+    """
+    target = num_cards * overgeneration
+    chars_seen = 0
+    last_bucket = -1
+    for index, chunk in enumerate(iter_text_chunks(stream, max_chars)):
+        chars_seen += len(chunk)
+        pages_seen = max(1, len(stream.pages))
+        total_pages = max(pages_seen, stream.page_count or pages_seen)
+        estimated_chars = max(chars_seen, chars_seen / pages_seen * total_pages)
+        estimated_chunks = max(index + 1, round(estimated_chars * (index + 1) / chars_seen))
+
+        if max_chunks > 0 and estimated_chunks > max_chunks:
+            bucket = int(index * max_chunks / estimated_chunks)
+            if bucket == last_bucket:
+                continue
+            last_bucket = bucket
+            share = len(chunk) * estimated_chunks / max_chunks
+        else:
+            share = len(chunk)
+        yield chunk, max(1, round(target * share / estimated_chars))
+
+
+def select_chunks(chunks, max_chunks):
+    """Garde au plus `max_chunks` morceaux répartis uniformément sur le document"""
+    if max_chunks <= 0 or len(chunks) <= max_chunks:
+        return chunks
+    step = len(chunks) / max_chunks
+    return [chunks[int(i * step)] for i in range(max_chunks)]
+
+
+def cards_per_chunk(chunks, num_cards, overgeneration=1.5):
+    """
+    Répartit le nombre de cartes à demander entre les morceaux, proportionnellement
+    à leur taille, avec une marge pour compenser les doublons et les échecs.
+    """
+    total_len = sum(len(chunk) for chunk in chunks) or 1
+    target = num_cards * overgeneration
+    return [max(1, round(target * len(chunk) / total_len)) for chunk in chunks]
+
+
+def normalize_question(question):
+    """Forme canonique d'une question pour la détection de doublons"""
+    question = unicodedata.normalize('NFKD', question.lower())
+    question = "".join(c for c in question if not unicodedata.combining(c))
+    return " ".join(re.findall(r'\w+', question))
+
+
+def merge_chunk_results(results, num_cards):
+    """
+    Fusionne les cartes produites par chaque morceau: supprime les doublons
+    puis sélectionne `num_cards` cartes en alternant entre les morceaux (dans
+    l'ordre du document) pour couvrir l'ensemble du texte. Dans chaque morceau,
+    l'ordre proposé par le modèle sert de classement.
+    """
+    seen = set()
+    per_chunk = []
+    for cards in results:
+        unique = []
+        for card in cards or []:
+            key = normalize_question(card.get("question", ""))
+            if not key or key in seen or not str(card.get("answer", "")).strip():
+                continue
+            seen.add(key)
+            unique.append(card)
+        per_chunk.append(unique)
+
+    merged = []
+    rank = 0
+    while len(merged) < num_cards and any(rank < len(cards) for cards in per_chunk):
+        for cards in per_chunk:
+            if rank < len(cards):
+                merged.append(cards[rank])
+                if len(merged) == num_cards:
+                    break
+        rank += 1
+    return merged
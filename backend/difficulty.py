@@ -0,0 +1,300 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+
+# Indicateurs de complexité (nombres, acronymes, CamelCase), compilés une seule
+# fois et recherchés une seule fois dans la question et la réponse réunies
+TECHNICAL_PATTERNS = (
+    re.compile(r'\d+[.,]?\d*'),
+    re.compile(r'\b[A-Z]{2,}\b'),
+    re.compile(r'\b[A-Z][a-z]+(?:[A-Z][a-z]+)+\b'),
+)
+# Au-delà, les indicateurs supplémentaires ne changent plus le score
+MAX_COMPLEXITY = 2
+
+
+def technical_indicators(text, limit=len(TECHNICAL_PATTERNS)):
+    """Nombre d'indicateurs présents dans le texte (arrêt dès `limit` atteint)"""
+    found = 0
+    for pattern in TECHNICAL_PATTERNS:
+        if pattern.search(text):
+            found += 1
+            if found >= limit:
+                break
+    return found
+
+
+def answer_length_score(word_count):
+    if word_count < 5:
+        return 1  # Très court, probablement facile
+    if word_count < 15:
+        return 2  # Longueur moyenne
+    return 3  # Réponse longue, plus difficile à mémoriser
+
+
+# Score de longueur précalculé pour 0 à 15 mots (15 et plus: 3)
+LENGTH_SCORES = [answer_length_score(words) for words in range(16)]
+
+
+def estimate_difficulties(pairs):
+    """
+    Difficulté (1 à 5) de chaque couple (question, réponse), avec la même
+    échelle que l'estimation carte par carte: longueur de la réponse plus
+    complexité linguistique (au plus 2 points).
+    """
+    pairs = list(pairs)
+    # Question et réponse sont analysées ensemble: le saut de ligne empêche une
+    # correspondance à cheval sur les deux textes
+    texts = [f"{question}\n{answer}" for question, answer in pairs]
+    word_counts = [len(answer.split()) for _, answer in pairs]
+    complexities = [technical_indicators(text, MAX_COMPLEXITY) for text in texts]
+    return [
+        min(LENGTH_SCORES[min(words, 15)] + complexity, 5)
+        for words, complexity in zip(word_counts, complexities)
+    ]
+
+
+def estimate_difficulty(question, answer):
+    return estimate_difficulties([(question, answer)])[0]
+
+
+def lexical_features(question, answer):
+    """Variables lexicales légères d'une carte pour le modèle linéaire"""
+    answer_words = answer.split()
+    question_words = question.split()
+    word_count = len(answer_words) or 1
+    return [
+        min(len(answer_words), 60) / 10,
+        min(len(question_words), 30) / 10,
+        sum(len(word) for word in answer_words) / word_count / 5,
+        sum(len(word) >= 9 for word in answer_words) / word_count,
+        technical_indicators(f"{question}\n{answer}"),
+        (answer.count(",") + answer.count(";")) / 3
+    ]
+
+
+class LexicalDifficultyModel:
+    """
+    Régression linéaire sur les variables de `lexical_features`, ajustée sur
+    des cartes déjà notées (par exemple les difficultés proposées par Gemini)
+    et enregistrée dans un petit fichier JSON.
+    """
+
+    def __init__(self, weights, bias):
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data["weights"], data["bias"])
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"weights": self.weights, "bias": self.bias}, f, indent=2)
+
+    @classmethod
+    def fit(cls, pairs, labels, regularization=1.0):
+        """Moindres carrés régularisés (équations normales), sans dépendance externe"""
+        rows = [lexical_features(q, a) + [1.0] for q, a in pairs]
+        size = len(rows[0])
+        # Matrice augmentée [XᵀX + λI | Xᵀy]
+        matrix = [[0.0] * (size + 1) for _ in range(size)]
+        for row, label in zip(rows, labels):
+            for i in range(size):
+                for j in range(size):
+                    matrix[i][j] += row[i] * row[j]
+                matrix[i][size] += row[i] * label
+        for i in range(size - 1):
+            matrix[i][i] += regularization
+        # Élimination de Gauss avec pivot partiel
+        for col in range(size):
+            pivot = max(range(col, size), key=lambda r: abs(matrix[r][col]))
+            matrix[col], matrix[pivot] = matrix[pivot], matrix[col]
+            if abs(matrix[col][col]) < 1e-12:
+                continue
+            for r in range(size):
+                if r != col:
+                    factor = matrix[r][col] / matrix[col][col]
+                    for c in range(col, size + 1):
+                        matrix[r][c] -= factor * matrix[col][c]
+        solution = [
+            matrix[i][size] / matrix[i][i] if abs(matrix[i][i]) >= 1e-12 else 0.0 for i in range(size)
+        ]
+        return cls([round(w, 6) for w in solution[:-1]], round(solution[-1], 6))
+
+    def predict(self, pairs):
+        return [
+            max(1, min(5, round(self.bias + sum(w * x for w, x in zip(self.weights, lexical_features(q, a))))))
+            for q, a in pairs
+        ]
+
+
+def load_model(path):
+    """Modèle lexical configuré (DIFFICULTY_MODEL), ou None pour l'heuristique par défaut"""
+    if not path:
+        return None
+    try:
+        return LexicalDifficultyModel.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Modèle de difficulté {path} inutilisable ({e}), utilisation de l'heuristique")
+        return None
+
+
+def score_cards(pairs, model=None):
+    """Difficulté de chaque carte avec le modèle lexical s'il est fourni, sinon l'heuristique"""
+    return model.predict(pairs) if model is not None else estimate_difficulties(pairs)
+
+
+def _open_stores(args):
+    """
+    Magasins visés par la commande, sous la forme [(locataire, magasin)]: le
+    magasin par défaut, ceux de --tenant, ou tous avec --all-tenants
+    """
+    from storage import open_store
+    from tenants import TenantStores, DEFAULT_TENANT
+    data_folder = os.getenv("FLASHCARDS_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+    backend = os.getenv("FLASHCARDS_STORAGE", "sqlite")
+    # Le magasin par défaut n'est ouvert que s'il est visé
+    tenants = TenantStores(backend, data_folder, None, max_open=1)
+    known = tenants.tenant_ids()
+    tenant_ids = [DEFAULT_TENANT] + known if args.all_tenants else args.tenant or [DEFAULT_TENANT]
+    for tenant_id in tenant_ids:
+        if tenant_id == DEFAULT_TENANT:
+            yield tenant_id, open_store(backend, data_folder)
+        elif tenant_id in known:
+            yield tenant_id, tenants.get(tenant_id)
+        else:
+            raise SystemExit(f"Locataire inconnu: {tenant_id}")
+
+
+def _iter_sets(store):
+    sets, _ = store.list_sets()
+    for summary in sets:
+        card_set = store.get_set(summary["id"])
+        if card_set is not None:
+            yield summary["id"], card_set
+
+
+def _rescore(args):
+    model = load_model(args.model)
+    action = "à modifier" if args.dry_run else "modifiée(s)"
+    total = 0
+    for tenant_id, store in _open_stores(args):
+        changed_cards = 0
+        for set_id, card_set in _iter_sets(store):
+            cards = [card for card in card_set["flashcards"] if isinstance(card.get("id"), str)]
+            scores = score_cards([(str(c.get("question", "")), str(c.get("answer", ""))) for c in cards], model)
+            updates = {
+                card["id"]: {"difficulty": score}
+                for card, score in zip(cards, scores)
+                if card.get("difficulty") != score
+            }
+            changed_cards += len(updates)
+            if updates and not args.dry_run:
+                # Une transaction par jeu
+                store.update_cards(set_id, updates)
+        store.close()
+        print(f"{tenant_id}: {changed_cards} carte(s) {action}")
+        total += changed_cards
+    print(f"{total} carte(s) {action}")
+
+
+def _fit(args):
+    pairs, labels = [], []
+    # Un seul modèle ajusté sur les cartes notées de tous les locataires visés
+    for _, store in _open_stores(args):
+        for _, card_set in _iter_sets(store):
+            for card in card_set["flashcards"]:
+                if isinstance(card.get("difficulty"), int) and isinstance(card.get("question"), str):
+                    pairs.append((card["question"], str(card.get("answer", ""))))
+                    labels.append(card["difficulty"])
+        store.close()
+    if not pairs:
+        print("Aucune carte notée pour ajuster le modèle")
+        return 1
+    model = LexicalDifficultyModel.fit(pairs, labels)
+    model.save(args.output)
+    agreement = sum(p == l for p, l in zip(model.predict(pairs), labels)) / len(labels)
+    print(f"Modèle ajusté sur {len(pairs)} cartes ({agreement:.0%} d'accord), enregistré dans {args.output}")
+
+
+def synthetic_corpus(size, seed=0):
+    """Corpus de couples (question, réponse) de longueurs et de contenus variés"""
+    rng = random.Random(seed)
+    vocabulary = ("cellule", "énergie", "ADN", "photosynthèse", "mitochondrie", "PageRank", "1789",
+                  "révolution", "équation", "3,14", "protéine", "GPU", "molécule", "théorème", "de", "la")
+    return [
+        (
+            " ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, 12))) + " ?",
+            " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 40)))
+        )
+        for _ in range(size)
+    ]
+
+
+def _legacy_estimate(question, answer):
+    # Ancienne implémentation (motifs non compilés, jusqu'à six recherches), pour comparaison
+    score = answer_length_score(len(answer.split()))
+    indicators = [r'\d+[.,]?\d*', r'\b[A-Z]{2,}\b', r'\b[A-Z][a-z]+(?:[A-Z][a-z]+)+\b']
+    complexity = sum(1 for p in indicators if re.search(p, question) or re.search(p, answer))
+    return max(1, min(score + min(complexity, 2), 5))
+
+
+def _benchmark(args):
+    pairs = synthetic_corpus(args.cards)
+    started = time.perf_counter()
+    legacy = [_legacy_estimate(q, a) for q, a in pairs]
+    legacy_time = time.perf_counter() - started
+    started = time.perf_counter()
+    batch = estimate_difficulties(pairs)
+    batch_time = time.perf_counter() - started
+    if legacy != batch:
+        print("Attention: les deux implémentations ne donnent pas les mêmes scores")
+    result = {
+        "cards": len(pairs),
+        "legacy_seconds": round(legacy_time, 3),
+        "batch_seconds": round(batch_time, 3),
+        "legacy_cards_per_second": round(len(pairs) / legacy_time),
+        "batch_cards_per_second": round(len(pairs) / batch_time),
+        "speedup": round(legacy_time / batch_time, 2)
+    }
+    print(json.dumps(result, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimation de la difficulté des flashcards")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rescore = commands.add_parser("rescore", help="recalculer la difficulté des cartes du stockage")
+    rescore.add_argument("--model", default=os.getenv("DIFFICULTY_MODEL"), help="modèle lexical (JSON)")
+    rescore.add_argument("--dry-run", action="store_true", help="compter les changements sans écrire")
+    rescore.set_defaults(handler=_rescore)
+
+    fit = commands.add_parser("fit", help="ajuster le modèle lexical sur les cartes du stockage")
+    fit.add_argument("--output", default="difficulty_model.json")
+    fit.set_defaults(handler=_fit)
+
+    benchmark = commands.add_parser("benchmark", help="mesurer le débit de l'estimation")
+    benchmark.add_argument("--cards", type=int, default=100000)
+    benchmark.set_defaults(handler=_benchmark)
+
+    for command in (rescore, fit):
+        tenants = command.add_mutually_exclusive_group()
+        tenants.add_argument("--tenant", action="append", metavar="ID",
+                             help="locataire à traiter (répétable, par défaut: locataire par défaut)")
+        tenants.add_argument("--all-tenants", action="store_true",
+                             help="traiter le locataire par défaut et tous les locataires")
+
+    args = parser.parse_args(argv)
+    return args.handler(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
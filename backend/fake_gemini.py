@@ -0,0 +1,121 @@
+"""
+Faux serveur Gemini pour les tests de débit hors ligne.
+
+Il répond aux appels REST utilisés par le backend (métadonnées du modèle et
+generateContent) avec des flashcards synthétiques, après une latence
+configurable, et peut simuler des erreurs 429/503.
+
+Utilisation:
+    python fake_gemini.py --port 8089 --latency 0.5 --error-rate 0.05
+puis démarrer le backend avec GEMINI_API_ENDPOINT=http://127.0.0.1:8089
+(et une valeur quelconque pour GEMINI_API_KEY).
+"""
+import re
+import json
+import time
+import random
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def fake_flashcards(prompt, num_cards):
+    """Cartes déterministes tirées des phrases du texte du prompt"""
+    match = re.search(r"TEXTE À ANALYSER:\n(.*?)\n\nINSTRUCTIONS:", prompt, re.S)
+    text = match.group(1) if match else prompt
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if len(s.strip()) > 20] or [text[:200]]
+    return [
+        {
+            "question": f"Que dit le texte au sujet de: {sentences[i % len(sentences)][:60]}?",
+            "answer": sentences[i % len(sentences)],
+            "difficulty": 1 + i % 5
+        }
+        for i in range(num_cards)
+    ]
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # genai.get_model: GET /v1beta/models/<modèle>
+        match = re.match(r"^/v1beta/(models/[^/?:]+)", self.path)
+        if not match:
+            return self._send(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+        self._send(200, {
+            "name": match.group(1),
+            "baseModelId": match.group(1).split("/")[-1],
+            "version": "fake",
+            "displayName": "Fake Gemini",
+            "inputTokenLimit": 1048576,
+            "outputTokenLimit": 8192,
+            "supportedGenerationMethods": ["generateContent"]
+        })
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not re.match(r"^/v1beta/models/[^/?]+:generateContent", self.path):
+            return self._send(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.error_rate:
+            status, name = random.choice([(429, "RESOURCE_EXHAUSTED"), (503, "UNAVAILABLE")])
+            return self._send(status, {"error": {"code": status, "message": "Fake error", "status": name}})
+
+        prompt = "".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        match = re.search(r"crée (\d+) cartes", prompt)
+        cards = fake_flashcards(prompt, int(match.group(1)) if match else 5)
+        self._send(200, {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": json.dumps(cards, ensure_ascii=False)}]},
+                "finishReason": "STOP",
+                "index": 0
+            }]
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host="127.0.0.1", port=8089, latency=0.0, jitter=0.0, error_rate=0.0):
+    """Crée le serveur (à lancer avec serve_forever, par exemple dans un thread)"""
+    handler = type("ConfiguredFakeGeminiHandler", (FakeGeminiHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Faux serveur Gemini pour les tests hors ligne")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="latence moyenne d'un appel (secondes)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="variation aléatoire de la latence (secondes)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proportion de réponses 429/503")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.jitter, args.error_rate)
+    print(f"Faux serveur Gemini sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
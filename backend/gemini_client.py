@@ -0,0 +1,210 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import dataclasses
+from cache import make_key
+from telemetry import span
+
+
+# Codes HTTP pour lesquels un nouvel essai a des chances d'aboutir
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+
+
+def is_retryable(error):
+    """Erreur transitoire (quota, surcharge, délai): l'appel peut être retenté"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    # Les exceptions google.api_core exposent le code HTTP dans `code`
+    return getattr(error, "code", None) in RETRYABLE_STATUS
+
+
+def import_sdk():
+    """
+    Module google.generativeai, importé à la première utilisation: son import
+    (près d'une seconde) ne pèse plus sur le démarrage des processus.
+    """
+    import google.generativeai as genai
+    return genai
+
+
+def json_generation_config(schema=None, genai=None):
+    """
+    Configuration de génération demandant une réponse JSON, conforme à
+    `schema` si la version installée du SDK prend en charge response_schema.
+    """
+    genai = genai or import_sdk()
+    config = {"response_mime_type": "application/json"}
+    supported = {field.name for field in dataclasses.fields(genai.types.GenerationConfig)}
+    if schema is not None and "response_schema" in supported:
+        config["response_schema"] = schema
+    return config
+
+
+class TokenBucket:
+    """
+    Limiteur de débit: `rate` appels par seconde en moyenne, avec des rafales
+    d'au plus `burst` appels. À utiliser depuis la boucle asyncio du client.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class GeminiClient:
+    """
+    Client Gemini partagé par toutes les requêtes d'un processus.
+
+    Les appels sont exécutés sur une boucle asyncio dédiée (un thread par
+    processus) avec un seul modèle GenerativeModel réutilisé, ce qui garde les
+    connexions ouvertes. Le client limite le nombre d'appels simultanés
+    (`max_concurrency`) et le débit (`rate_per_minute`, seau à jetons),
+    retente les erreurs 429/5xx avec un délai exponentiel et aléatoire, et
+    fusionne les prompts identiques en cours d'exécution en un seul appel.
+
+    Les appelants synchrones (threads Flask, tâches) utilisent `generate`;
+    le code asynchrone peut attendre `generate_async`.
+
+    Le SDK n'est chargé qu'au premier appel, par `sdk()` (par défaut
+    import_sdk), qui retourne le module google.generativeai configuré. Avec
+    `response_schema`, une réponse JSON conforme au schéma est demandée.
+    """
+
+    def __init__(self, model_name, max_concurrency=4, rate_per_minute=60, burst=None,
+                 max_retries=4, backoff_base=1.0, backoff_max=30.0, use_async_transport=True,
+                 generation_config=None, response_schema=None, sdk=import_sdk):
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst or max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Le transport REST (serveur de test local) n'a pas de version asynchrone dans le SDK
+        self.use_async_transport = use_async_transport
+        self.generation_config = generation_config
+        self.response_schema = response_schema
+        self.sdk = sdk
+        self.calls = 0
+        self.retries = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+
+    def _ensure_loop(self):
+        # Une boucle par processus: recréée après un fork (workers gunicorn)
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+            genai = self.sdk()
+            generation_config = self.generation_config
+            if generation_config is None and self.response_schema is not None:
+                generation_config = json_generation_config(self.response_schema, genai)
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="gemini-client", daemon=True)
+            thread.start()
+            self._loop = loop
+            self._pid = os.getpid()
+            self._model = genai.GenerativeModel(
+                model_name=self.model_name,
+                generation_config=generation_config
+            )
+            self._semaphore = None
+            self._bucket = None
+            self._in_flight = {}
+            return loop
+
+    def generate(self, prompt, timeout=60):
+        """Version synchrone de `generate_async`, utilisable depuis n'importe quel thread"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self.generate_async(prompt, timeout), loop)
+        return future.result()
+
+    async def generate_async(self, prompt, timeout=60):
+        """
+        Texte de la réponse de Gemini au prompt. Un prompt identique déjà en
+        cours d'exécution n'est pas renvoyé: l'appelant attend le même résultat.
+        """
+        key = make_key(self.model_name, prompt)
+        task = self._in_flight.get(key)
+        if task is not None:
+            with self._lock:
+                self.coalesced += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._call_with_retries(prompt, timeout))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _call_with_retries(self, prompt, timeout):
+        # Créés dans la boucle du client, à la première utilisation
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.rate_per_minute / 60, self.burst)
+
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    await self._bucket.acquire()
+                    return await self._call(prompt, timeout)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                # Délai exponentiel avec gigue complète pour étaler les nouveaux essais
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                print(f"Appel Gemini en échec ({e}), nouvel essai {attempt}/{self.max_retries} dans {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _call(self, prompt, timeout):
+        with self._lock:
+            self.calls += 1
+        request_options = {"timeout": timeout}
+        # Une mesure par tentative (les nouveaux essais apparaissent comme des appels distincts)
+        with span("gemini_call", model=self.model_name):
+            if self.use_async_transport:
+                response = await asyncio.wait_for(
+                    self._model.generate_content_async(prompt, request_options=request_options),
+                    timeout
+                )
+            else:
+                response = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        None, lambda: self._model.generate_content(prompt, request_options=request_options)
+                    ),
+                    timeout
+                )
+            return response.text
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "coalesced": self.coalesced,
+                "max_concurrency": self.max_concurrency,
+                "rate_per_minute": self.rate_per_minute
+            }
@@ -0,0 +1,137 @@
+import os
+import time
+import threading
+
+
+class GeminiHealthMonitor:
+    """
+    Surveille la disponibilité de l'API Gemini en arrière-plan.
+
+    Le statut est mis en cache pendant `ttl` secondes et rafraîchi par un
+    thread démon, afin que les requêtes de génération n'aient jamais à faire
+    d'appel de test. Un disjoncteur (circuit breaker) s'ouvre après
+    `failure_threshold` échecs consécutifs (vérifications ou vraies
+    générations) et laisse passer un seul essai après `cooldown` secondes.
+    L'essai est rendu par `release_trial` si la requête n'a finalement pas
+    appelé Gemini, et expire après `trial_timeout` secondes sans résultat.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, check_fn, ttl=300, failure_threshold=3, cooldown=60, trial_timeout=120):
+        self.check_fn = check_fn
+        self.ttl = ttl
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.trial_timeout = trial_timeout
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.success = None
+        self.message = "Vérification de l'API Gemini pas encore effectuée"
+        self.last_checked = None
+        self.last_latency = None
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.opened_at = None
+        # Essai en cours à l'état semi-ouvert: thread qui l'a obtenu et date de début
+        self._trial_owner = None
+        self._trial_started = None
+
+    def start(self):
+        """Démarre le thread de vérification (une fois par processus, y compris après un fork)"""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="gemini-health", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.check_now()
+            self._wakeup.wait(self.ttl)
+            self._wakeup.clear()
+
+    def check_now(self):
+        """Exécute immédiatement une vérification et met à jour le statut en cache"""
+        started = time.monotonic()
+        try:
+            message = self.check_fn()
+            self.record_success(time.monotonic() - started, message)
+        except Exception as e:
+            self.record_failure(time.monotonic() - started, f"Erreur lors du test de l'API Gemini: {e}")
+        return self.snapshot()
+
+    def record_success(self, latency, message="API Gemini disponible"):
+        with self._lock:
+            self.success = True
+            self.message = message
+            self.last_checked = time.time()
+            self.last_latency = latency
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+            self.opened_at = None
+            self._trial_owner = None
+
+    def record_failure(self, latency, message):
+        with self._lock:
+            self.success = False
+            self.message = message
+            self.last_checked = time.time()
+            self.last_latency = latency
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_owner = None
+
+    def is_available(self):
+        """
+        Indique si une vraie requête peut être envoyée à Gemini.
+        Lit uniquement le statut en cache, sans appel réseau.
+        """
+        self.start()
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at < self.cooldown:
+                return False
+            if self.state == self.HALF_OPEN and self._trial_owner is not None \
+                    and now - self._trial_started < self.trial_timeout:
+                # Un essai est déjà en cours
+                return False
+            if self.state != self.CLOSED:
+                # Refroidissement écoulé, ou essai précédent rendu ou expiré: on laisse passer un essai
+                self.state = self.HALF_OPEN
+                self._trial_owner = threading.get_ident()
+                self._trial_started = now
+            return True
+
+    def release_trial(self):
+        """
+        Rend l'essai obtenu par ce thread s'il n'a produit ni succès ni échec
+        (la requête n'a finalement pas appelé Gemini): le suivant peut essayer.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._trial_owner == threading.get_ident():
+                self._trial_owner = None
+
+    def snapshot(self):
+        """Retourne le statut en cache sous forme de dictionnaire sérialisable"""
+        with self._lock:
+            age = time.time() - self.last_checked if self.last_checked else None
+            return {
+                "success": bool(self.success),
+                # Aucune vérification terminée: statut inconnu, la première est en cours
+                "pending": self.last_checked is None,
+                "message": self.message,
+                "circuit": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "last_checked": self.last_checked,
+                "age_seconds": round(age, 3) if age is not None else None,
+                "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+                "ttl_seconds": self.ttl,
+            }
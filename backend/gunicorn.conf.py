@@ -0,0 +1,28 @@
+import os
+
+
+# Configuration du serveur de production: gunicorn -c gunicorn.conf.py app:app
+# L'état partagé (jeux, cartes, tâches, caches) vit dans le stockage (data/),
+# chaque worker peut donc traiter n'importe quelle requête.
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+
+# Processus workers (WEB_CONCURRENCY est la variable standard des hébergeurs)
+workers = int(os.getenv("GUNICORN_WORKERS", os.getenv("WEB_CONCURRENCY", "2")))
+
+# Threads par worker: les requêtes passent surtout leur temps à attendre Gemini
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Les flux SSE (/api/jobs/<id>/events) et le mode ?sync=true gardent la connexion ouverte
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = 30
+keepalive = 5
+
+# Chaque worker importe l'application lui-même: les threads de fond (santé
+# Gemini, tâches) et les connexions SQLite ne sont pas partagés par fork
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
@@ -0,0 +1,197 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# États possibles d'une tâche de génération
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATUSES = (DONE, FAILED)
+
+
+def new_job(kind, params):
+    """Crée l'enregistrement initial d'une tâche"""
+    now = time.time()
+    return {
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "status": QUEUED,
+        "params": params,
+        "progress": {"done": 0, "total": 0},
+        "cards": [],
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def public_job(job, include_cards=False):
+    """Vue d'une tâche renvoyée par l'API (sans les paramètres internes)"""
+    view = {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "cards_ready": len(job["cards"]),
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+    if include_cards:
+        view["cards"] = job["cards"]
+    return view
+
+
+class JobRunner:
+    """
+    Exécute les tâches de génération dans un pool de threads local au processus.
+
+    Les tâches sont enregistrées dans le stockage des flashcards avant d'être
+    lancées. Chaque gestionnaire reçoit la tâche et une fonction
+    `report(done, total, new_cards)` pour publier sa progression.
+
+    Un thread de maintenance par processus signale toutes les
+    `heartbeat_interval` secondes les tâches en cours d'exécution ici, relance
+    celles dont le processus s'est arrêté (aucun signal depuis `stale_after`
+    secondes; échec après `max_attempts` exécutions interrompues) et supprime
+    les tâches terminées depuis plus de `keep_finished` secondes.
+    """
+
+    def __init__(self, store, handlers, max_workers=2, stale_after=120, heartbeat_interval=15,
+                 max_attempts=3, keep_finished=7 * 24 * 3600):
+        self.store = store
+        self.handlers = handlers
+        self.max_workers = max_workers
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval
+        self.max_attempts = max_attempts
+        self.keep_finished = keep_finished
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # Tâches soumises au pool de ce processus et pas encore terminées
+        self._local_jobs = set()
+        self._last_prune = 0
+
+    def _pool(self):
+        # Recréer le pool (et le thread de maintenance) après un fork (workers gunicorn)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+                self._pid = os.getpid()
+                self._local_jobs = set()
+                threading.Thread(target=self._maintain_forever, name="job-maintenance", daemon=True).start()
+            return self._executor
+
+    def _schedule(self, job_id):
+        pool = self._pool()
+        with self._lock:
+            self._local_jobs.add(job_id)
+        pool.submit(self._run, job_id)
+
+    def submit(self, kind, params):
+        """Enregistre une nouvelle tâche et la place dans la file"""
+        job = new_job(kind, params)
+        self.store.create_job(job)
+        self._schedule(job["id"])
+        return job
+
+    def run_inline(self, kind, params, **runtime):
+        """
+        Exécute une tâche immédiatement dans le thread appelant et retourne la
+        tâche terminée. `runtime` est transmis tel quel au gestionnaire (objets
+        non sérialisables, comme le tampon d'un fichier reçu).
+        """
+        job = new_job(kind, params)
+        self.store.create_job(job)
+        self._pool()
+        with self._lock:
+            self._local_jobs.add(job["id"])
+        self._run(job["id"], runtime)
+        return self.store.get_job(job["id"])
+
+    def resume_pending(self):
+        """
+        Relance les tâches en attente ou abandonnées par un processus arrêté
+        (sans signal depuis `stale_after` secondes). Appelée au démarrage
+        puis périodiquement par le thread de maintenance.
+        """
+        self._pool()
+        resumed = 0
+        stale_before = time.time() - self.stale_after
+        for job in self.store.list_jobs(statuses=(QUEUED, RUNNING)):
+            with self._lock:
+                if job["id"] in self._local_jobs:
+                    continue
+            # Remise en file atomique: un seul processus reprend une tâche abandonnée
+            if job["updated_at"] >= stale_before or self.store.requeue_stale_job(job["id"], stale_before) is None:
+                continue
+            self._schedule(job["id"])
+            resumed += 1
+        if resumed:
+            print(f"{resumed} tâche(s) de génération relancée(s)")
+        return resumed
+
+    def _maintain_forever(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.heartbeat_interval)
+            try:
+                self._maintain()
+            except Exception as e:
+                print(f"Maintenance des tâches en échec: {e}")
+
+    def _maintain(self):
+        with self._lock:
+            local_jobs = list(self._local_jobs)
+        # Signal de vie: la date de mise à jour des tâches en cours reste récente
+        for job_id in local_jobs:
+            self.store.touch_job(job_id)
+        self.resume_pending()
+        if self.keep_finished and time.time() - self._last_prune > 3600:
+            self._last_prune = time.time()
+            pruned = self.store.delete_finished_jobs(time.time() - self.keep_finished)
+            if pruned:
+                print(f"{pruned} tâche(s) terminée(s) supprimée(s)")
+
+    def _run(self, job_id, runtime=None):
+        try:
+            # Réservation atomique: une tâche n'est exécutée que par un seul worker
+            job = self.store.claim_job(job_id)
+            if job is None:
+                return
+            self._execute(job, runtime)
+        finally:
+            with self._lock:
+                self._local_jobs.discard(job_id)
+
+    def _execute(self, job, runtime):
+        job_id = job["id"]
+        attempts = job.get("attempts", 0) + 1
+        if attempts > self.max_attempts:
+            self.store.update_job(job_id, {"status": FAILED, "error": "Tâche interrompue à chaque exécution, abandonnée"})
+            return
+        # Une tâche reprise régénère tous ses morceaux: les cartes et la
+        # progression d'une exécution interrompue sont effacées
+        cards = []
+        self.store.update_job(job_id, {"attempts": attempts, "cards": cards, "progress": {"done": 0, "total": 0}})
+
+        def report(done, total, new_cards=()):
+            # Un morceau en échec ne produit aucune carte (None)
+            cards.extend(new_cards or ())
+            self.store.update_job(job_id, {"progress": {"done": done, "total": total}, "cards": cards})
+
+        # Le texte source n'est plus utile une fois la tâche terminée
+        params = {key: value for key, value in job["params"].items() if key != "text"}
+        try:
+            result = self.handlers[job["kind"]](job, report, **(runtime or {}))
+            self.store.update_job(job_id, {"status": DONE, "result": result, "params": params})
+        except Exception as e:
+            print(f"Échec de la tâche {job_id}: {e}")
+            self.store.update_job(job_id, {"status": FAILED, "error": str(e), "params": params})
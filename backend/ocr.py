@@ -0,0 +1,231 @@
+import io
+import os
+import time
+import hashlib
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from cache import DiskCache, make_key
+from uploads import write_temp_copy
+from telemetry import record_stage
+from pdf_extraction import FailedPage
+
+# À incrémenter si le prétraitement change, pour invalider le cache des pages
+OCR_VERSION = 1
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+
+# État propre à chaque processus du pool: cache et dernier PDF ouvert
+_caches = {}
+_documents = {}
+
+
+def preprocess(image, min_side=1000, max_side=4000):
+    """
+    Prépare une numérisation pour Tesseract: orientation EXIF, niveaux de
+    gris, agrandissement des petites images (le moteur attend environ 300
+    dpi), réduction des très grandes, contraste étiré et bruit atténué.
+    """
+    from PIL import Image, ImageFilter, ImageOps
+    image = ImageOps.exif_transpose(image)
+    image = ImageOps.grayscale(image)
+    side = max(image.size)
+    if side < min_side:
+        scale = min_side / side
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+    elif side > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    image = ImageOps.autocontrast(image, cutoff=1)
+    return image.filter(ImageFilter.MedianFilter(3))
+
+
+def _cache(cache_path):
+    if cache_path is None:
+        return None
+    cache = _caches.get(cache_path)
+    if cache is None:
+        cache = _caches[cache_path] = DiskCache(cache_path, "ocr_cache")
+    return cache
+
+
+def recognize(image, digest, lang, timeout, cache_path=None):
+    """Texte reconnu dans une image PIL, mis en cache par hash de l'image"""
+    cache = _cache(cache_path)
+    key = make_key(digest, lang, OCR_VERSION)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return cached["text"]
+    import pytesseract
+    text = pytesseract.image_to_string(preprocess(image), lang=lang, timeout=timeout)
+    if cache is not None:
+        cache.set(key, {"text": text})
+    return text
+
+
+def _ocr_image(data, lang, timeout, cache_path):
+    """Exécuté dans un processus du pool: OCR d'une image (octets PNG/JPEG)"""
+    from PIL import Image
+    started = time.perf_counter()
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        text = recognize(image, hashlib.sha256(data).hexdigest(), lang, timeout, cache_path)
+    return text, time.perf_counter() - started
+
+
+def _page_images(file_path, page_index, dpi):
+    """
+    Images à reconnaître pour une page PDF: la page rendue en entier si
+    pypdfium2 est installé, sinon les images qu'elle contient (la
+    numérisation de la page dans un PDF scanné). Couples (hash, image PIL).
+    """
+    try:
+        import pypdfium2
+    except ImportError:
+        pypdfium2 = None
+
+    key = (file_path, os.path.getmtime(file_path))
+    document = _documents.get(key)
+    if document is None:
+        if pypdfium2 is not None:
+            document = pypdfium2.PdfDocument(file_path)
+        else:
+            from pdf_extraction import open_pdf
+            document = open_pdf(file_path)
+        _documents.clear()
+        _documents[key] = document
+
+    if pypdfium2 is not None:
+        image = document[page_index].render(scale=dpi / 72).to_pil()
+        return [(hashlib.sha256(image.tobytes()).hexdigest(), image)]
+    return [
+        (hashlib.sha256(embedded.data).hexdigest(), embedded.image)
+        for embedded in document.pages[page_index].images
+    ]
+
+
+def _ocr_pdf_page(file_path, page_index, lang, timeout, cache_path, dpi):
+    """Exécuté dans un processus du pool: rendu puis OCR d'une page PDF"""
+    started = time.perf_counter()
+    texts = [
+        recognize(image, digest, lang, timeout, cache_path)
+        for digest, image in _page_images(file_path, page_index, dpi)
+    ]
+    return "\n".join(text.strip() for text in texts if text.strip()), time.perf_counter() - started
+
+
+class OcrEngine:
+    """
+    OCR local (Tesseract via pytesseract) sur un pool de processus borné.
+
+    Les images reçues et les pages PDF sans couche texte (moins de
+    `min_text_chars` caractères) sont rendues puis reconnues dans les
+    processus du pool; le texte de chaque image est mis en cache par hash
+    dans `cache_path`. Les pages sont rendues dans l'ordre au fur et à
+    mesure: la génération commence sur les premières pages pendant que les
+    suivantes sont encore en cours de reconnaissance. Une page en échec ou
+    hors délai garde simplement son texte d'origine.
+    """
+
+    def __init__(self, workers=None, lang="fra+eng", timeout=60, cache_path=None,
+                 min_text_chars=20, dpi=300, temp_dir=None):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.lang = lang
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.min_text_chars = min_text_chars
+        self.dpi = dpi
+        self.temp_dir = temp_dir
+        # Pages soumises à l'avance par document (le pool reste partagé entre les requêtes)
+        self.window = self.workers * 2
+        self._available = None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+
+    def available(self):
+        """Vrai si pytesseract et le binaire tesseract sont installés (vérifié une fois)"""
+        if self._available is not None:
+            return self._available
+        # Une seule vérification même si plusieurs requêtes arrivent en même temps
+        with self._probe_lock:
+            if self._available is None:
+                try:
+                    import pytesseract
+                    pytesseract.get_tesseract_version()
+                    self._available = True
+                except Exception as e:
+                    print(f"OCR indisponible ({type(e).__name__}: {e}), installez tesseract et pytesseract")
+                    self._available = False
+        return self._available
+
+    def _executor(self):
+        # Même politique que l'extraction PDF: "spawn", pool recréé après un fork
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                self._pid = os.getpid()
+            return self._pool
+
+    def needs_ocr(self, text):
+        return len(text.strip()) < self.min_text_chars
+
+    def _result(self, future, fallback="", stage="ocr_page"):
+        try:
+            text, seconds = future.result(timeout=self.timeout + 30)
+        except Exception as e:
+            print(f"OCR abandonné: {type(e).__name__}: {e}")
+            record_stage(stage, 0, "error")
+            # Texte d'origine conservé, mais marqué comme incomplet (pas de mise en cache)
+            return FailedPage(fallback)
+        record_stage(stage, seconds)
+        return text if text.strip() else fallback
+
+    def iter_image(self, source):
+        """Texte d'une image (chemin ou flux binaire), sous forme d'une seule page"""
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                data = f.read()
+        else:
+            source.seek(0)
+            data = source.read()
+        future = self._executor().submit(_ocr_image, data, self.lang, self.timeout, self.cache_path)
+        yield self._result(future, stage="ocr_image")
+
+    def iter_pdf_pages(self, pages, source):
+        """
+        Complète le texte des pages (itérable, dans l'ordre) par l'OCR des
+        pages presque vides. `source` est le PDF (chemin ou flux binaire):
+        un flux n'est copié sur disque qu'à la première page à reconnaître.
+        """
+        file_path = source if isinstance(source, (str, os.PathLike)) else None
+        temp_path = None
+        pending = deque()
+        try:
+            for index, text in enumerate(pages):
+                future = None
+                if self.needs_ocr(text):
+                    if file_path is None:
+                        position = source.tell()
+                        file_path = temp_path = write_temp_copy(source, self.temp_dir, suffix=".pdf")
+                        source.seek(position)
+                    future = self._executor().submit(
+                        _ocr_pdf_page, file_path, index, self.lang, self.timeout, self.cache_path, self.dpi
+                    )
+                pending.append((text, future))
+                # Pages rendues dans l'ordre, au plus `window` pages en avance
+                while pending and (pending[0][1] is None or pending[0][1].done() or len(pending) > self.window):
+                    text, future = pending.popleft()
+                    yield text if future is None else self._result(future, text)
+            while pending:
+                text, future = pending.popleft()
+                yield text if future is None else self._result(future, text)
+        finally:
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+            if temp_path is not None:
+                os.remove(temp_path)
@@ -0,0 +1,205 @@
+import os
+import mmap
+import time
+import signal
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from uploads import write_temp_copy
+from telemetry import record_stage
+
+# À incrémenter si l'extraction change, pour invalider le texte mis en cache
+EXTRACTION_VERSION = 1
+
+
+def open_pdf(source):
+    """Lecteur pypdf (chemin, flux ou mmap); pypdf n'est importé qu'à la première extraction"""
+    from pypdf import PdfReader
+    return PdfReader(source)
+
+
+class PageTimeout(Exception):
+    pass
+
+
+class FailedPage(str):
+    """
+    Texte d'une page dont l'extraction a échoué ou dépassé son budget: se
+    comporte comme le texte obtenu (souvent vide), mais signale un résultat
+    incomplet qui ne doit pas être mis en cache.
+    """
+
+
+FAILED_PAGE = FailedPage()
+
+
+def page_budget_supported():
+    """SIGALRM n'est utilisable que dans le thread principal (et pas sous Windows)"""
+    return hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+
+
+def _raise_timeout(signum, frame):
+    raise PageTimeout()
+
+
+@contextmanager
+def page_budget(seconds):
+    """
+    Limite le temps d'extraction d'une page avec SIGALRM. Sans effet hors du
+    thread principal ou sur les plateformes sans SIGALRM (Windows).
+    """
+    if not seconds or not page_budget_supported():
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def extract_page_text(page, page_timeout=None):
+    """Texte d'une page, ou FAILED_PAGE si l'extraction échoue ou dépasse son budget"""
+    try:
+        with page_budget(page_timeout):
+            return page.extract_text() or ""
+    except PageTimeout:
+        print(f"Extraction de page abandonnée après {page_timeout}s")
+        return FAILED_PAGE
+    except Exception as e:
+        print(f"Erreur lors de l'extraction d'une page du PDF: {e}")
+        return FAILED_PAGE
+
+
+def timed_page_text(page, page_timeout=None):
+    """Texte d'une page et durée de son extraction (secondes)"""
+    started = time.perf_counter()
+    text = extract_page_text(page, page_timeout)
+    return text, time.perf_counter() - started
+
+
+def _extract_page_range(file_path, start, stop, page_timeout):
+    """
+    Exécuté dans un processus du pool: chaque worker projette le PDF en
+    mémoire (mmap) plutôt que de le relire entièrement. Retourne le texte et
+    la durée d'extraction de chaque page.
+    """
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = open_pdf(mapped)
+        return [timed_page_text(reader.pages[i], page_timeout) for i in range(start, stop)]
+
+
+class PdfExtractor:
+    """
+    Extraction du texte des PDF, page par page.
+
+    Les documents de plus de `min_pages_for_pool` pages sont répartis par
+    tranches de `pages_per_task` pages sur un pool de processus (l'extraction
+    pypdf est limitée par le CPU et indépendante d'une page à l'autre). Les
+    pages sont produites dans l'ordre, au fur et à mesure, par un générateur.
+    Chaque page dispose d'un budget de `page_timeout` secondes, appliqué par
+    SIGALRM dans le thread principal d'un worker: hors du thread principal
+    (tâches, requêtes), même un petit document passe donc par le pool.
+    """
+
+    def __init__(self, workers=None, page_timeout=10, pages_per_task=8, min_pages_for_pool=16, temp_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.temp_dir = temp_dir
+        self.page_timeout = page_timeout
+        self.pages_per_task = pages_per_task
+        self.min_pages_for_pool = min_pages_for_pool
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # "spawn" évite de dupliquer les threads du serveur dans les workers
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                self._pid = os.getpid()
+            return self._pool
+
+    def count_pages(self, source):
+        """Nombre de pages d'un PDF (chemin ou flux binaire)"""
+        return len(open_pdf(source).pages)
+
+    def iter_pages(self, source, page_count=None):
+        """
+        Génère le texte de chaque page (chaîne vide pour une page sans texte).
+        `source` est un chemin ou un flux binaire (par exemple le tampon d'un
+        fichier reçu): un flux n'est écrit dans un fichier temporaire que s'il
+        doit être partagé avec le pool de processus.
+        """
+        if page_count is None:
+            page_count = self.count_pages(source)
+
+        in_process = self.workers <= 1 or page_count < self.min_pages_for_pool
+        if in_process and (not self.page_timeout or page_budget_supported()):
+            reader = open_pdf(source)
+            for page in reader.pages:
+                text, seconds = timed_page_text(page, self.page_timeout)
+                record_stage("pdf_page", seconds)
+                yield text
+            return
+
+        if isinstance(source, (str, os.PathLike)):
+            yield from self._iter_pages_in_pool(source, page_count)
+            return
+
+        temp_path = write_temp_copy(source, self.temp_dir, suffix=".pdf")
+        try:
+            yield from self._iter_pages_in_pool(temp_path, page_count)
+        finally:
+            os.remove(temp_path)
+
+    def _iter_pages_in_pool(self, file_path, page_count):
+        executor = self._executor()
+        ranges = [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        futures = [
+            executor.submit(_extract_page_range, file_path, start, stop, self.page_timeout)
+            for start, stop in ranges
+        ]
+        try:
+            for (start, stop), future in zip(ranges, futures):
+                try:
+                    # Marge au-delà du budget par page pour l'ouverture du PDF dans le worker
+                    pages = future.result(timeout=self.page_timeout * (stop - start) + 30)
+                except FuturesTimeoutError:
+                    print(f"Pages {start + 1}-{stop} ignorées: délai dépassé")
+                    pages = [(FAILED_PAGE, None)] * (stop - start)
+                except BrokenProcessPool:
+                    # Un worker a été tué: la tranche est reprise une fois dans un nouveau pool
+                    print(f"Pool d'extraction PDF interrompu, reprise des pages {start + 1}-{stop}")
+                    pages = self._retry_range(executor, file_path, start, stop)
+                except Exception as e:
+                    print(f"Pages {start + 1}-{stop} ignorées: {e}")
+                    pages = [(FAILED_PAGE, None)] * (stop - start)
+                for text, seconds in pages:
+                    if seconds is not None:
+                        record_stage("pdf_page", seconds)
+                    yield text
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _retry_range(self, broken, file_path, start, stop):
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+        try:
+            future = self._executor().submit(_extract_page_range, file_path, start, stop, self.page_timeout)
+            return future.result(timeout=self.page_timeout * (stop - start) + 30)
+        except Exception as e:
+            print(f"Pages {start + 1}-{stop} ignorées: {type(e).__name__}: {e}")
+            return [(FAILED_PAGE, None)] * (stop - start)
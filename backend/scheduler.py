@@ -0,0 +1,77 @@
+import datetime
+
+
+# Bornes du facteur de facilité SM-2
+MIN_EASE = 1.3
+DEFAULT_EASE = 2.5
+MAX_GRADE = 5
+# Une réponse notée en dessous de ce seuil est un oubli: la carte repart de zéro
+PASSING_GRADE = 3
+
+
+def parse_review_date(value):
+    """Date ISO d'une révision, ou None si elle est absente ou invalide"""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def due_timestamp(card):
+    """
+    Échéance d'une carte en secondes depuis l'epoch, utilisée comme clé de
+    l'index des cartes à réviser. Une carte jamais révisée est due immédiatement (0).
+    """
+    due = parse_review_date(card.get("nextReview"))
+    return due.timestamp() if due is not None else 0.0
+
+
+def initial_ease(difficulty):
+    """Facteur de facilité de départ déduit de la difficulté estimée (1 à 5)"""
+    if not isinstance(difficulty, int) or isinstance(difficulty, bool):
+        return DEFAULT_EASE
+    difficulty = max(1, min(difficulty, 5))
+    return round(DEFAULT_EASE + 0.3 - (difficulty - 1) * 0.375, 2)
+
+
+def ease_to_difficulty(ease):
+    """Difficulté (1 à 5) correspondant à un facteur de facilité"""
+    return max(1, min(5, round(1 + (DEFAULT_EASE + 0.3 - ease) / 0.375)))
+
+
+def review_card(card, grade, now=None):
+    """
+    Applique l'algorithme SM-2 à une carte notée `grade` (0 à 5) et retourne
+    les champs à mettre à jour: lastReviewed, nextReview, reviewCount,
+    difficulty, ainsi que l'état du planificateur (easeFactor, interval en
+    jours, repetitions réussies consécutives).
+    """
+    now = now or datetime.datetime.now()
+    ease = card.get("easeFactor") or initial_ease(card.get("difficulty"))
+    repetitions = card.get("repetitions") or 0
+    interval = card.get("interval") or 0
+
+    ease = max(MIN_EASE, ease + 0.1 - (MAX_GRADE - grade) * (0.08 + (MAX_GRADE - grade) * 0.02))
+    if grade < PASSING_GRADE:
+        repetitions = 0
+        interval = 1
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1
+        elif repetitions == 2:
+            interval = 6
+        else:
+            interval = max(1, round(interval * ease))
+
+    return {
+        "lastReviewed": now.isoformat(),
+        "nextReview": (now + datetime.timedelta(days=interval)).isoformat(),
+        "reviewCount": (card.get("reviewCount") or 0) + 1,
+        "difficulty": ease_to_difficulty(ease),
+        "easeFactor": round(ease, 2),
+        "interval": interval,
+        "repetitions": repetitions
+    }
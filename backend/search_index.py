@@ -0,0 +1,177 @@
+import re
+import math
+import zlib
+import heapq
+import random
+import unicodedata
+
+
+# Mots trop fréquents pour distinguer deux questions
+STOP_WORDS = frozenset("""
+le la les l un une des du de d et ou a à au aux en dans par pour sur avec sans ce ces cet cette
+qui que qu quoi quel quelle quels quelles est sont être il elle ils elles on se sa son ses leur leurs
+the a an of to in is are and or what which who how why
+""".split())
+
+_TOKEN = re.compile(r'\w+')
+# Nombre premier de Mersenne pour les permutations du MinHash
+_PRIME = (1 << 61) - 1
+
+
+def tokenize(text):
+    """Mots en minuscules et sans accents (même normalisation que l'index FTS5 de SQLite)"""
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN.findall(text)
+
+
+def content_words(text):
+    """Ensemble des mots significatifs d'une question (sans mots vides)"""
+    words = {word for word in tokenize(text) if word not in STOP_WORDS}
+    return words or set(tokenize(text))
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHashLSH:
+    """
+    Index LSH sur des signatures MinHash: `bands` bandes de `rows` valeurs.
+    Deux ensembles de similarité de Jaccard s partagent au moins une bande
+    avec une probabilité 1 - (1 - s^rows)^bands (≈ 99 % pour s = 0,7 avec
+    16 bandes de 4).
+    """
+
+    def __init__(self, bands=16, rows=4, seed=1):
+        self.bands = bands
+        self.rows = rows
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(bands * rows)
+        ]
+        self._buckets = {}
+
+    def signature(self, words):
+        hashes = [zlib.crc32(word.encode('utf-8')) for word in words] or [0]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._permutations]
+
+    def _band_keys(self, signature):
+        return [
+            (band, hash(tuple(signature[band * self.rows:(band + 1) * self.rows])))
+            for band in range(self.bands)
+        ]
+
+    def add(self, key, signature):
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def candidates(self, signature):
+        found = set()
+        for band_key in self._band_keys(signature):
+            found.update(self._buckets.get(band_key, ()))
+        return found
+
+
+class NearDuplicateFilter:
+    """
+    Détection des questions quasi identiques pendant une génération: les
+    candidats proposés par le LSH sont confirmés par la similarité de
+    Jaccard exacte de leurs mots significatifs.
+    """
+
+    def __init__(self, threshold=0.7, bands=16, rows=4):
+        self.threshold = threshold
+        self._lsh = MinHashLSH(bands, rows)
+        self._words = []
+
+    def is_duplicate(self, text):
+        words = content_words(text)
+        signature = self._lsh.signature(words)
+        return any(jaccard(words, self._words[key]) >= self.threshold for key in self._lsh.candidates(signature))
+
+    def add(self, text):
+        """Enregistre la question et retourne False si elle double une question déjà vue"""
+        words = content_words(text)
+        if not words:
+            return False
+        signature = self._lsh.signature(words)
+        if any(jaccard(words, self._words[key]) >= self.threshold for key in self._lsh.candidates(signature)):
+            return False
+        self._lsh.add(len(self._words), signature)
+        self._words.append(words)
+        return True
+
+
+class Bm25Index:
+    """
+    Index inversé en mémoire avec classement BM25, mis à jour document par
+    document (utilisé par le moteur JSON; SQLite s'appuie sur FTS5).
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._doc_terms = {}
+        self._lengths = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, doc, text):
+        self.remove(doc)
+        terms = {}
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0) + 1
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[doc] = count
+        self._doc_terms[doc] = tuple(terms)
+        self._lengths[doc] = sum(terms.values())
+        self._total_length += self._lengths[doc]
+
+    def remove(self, doc):
+        for term in self._doc_terms.pop(doc, ()):
+            postings = self._postings[term]
+            del postings[doc]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(doc, 0)
+
+    def search(self, query, limit=20, match_all=True, accept=None):
+        """
+        Les `limit` meilleurs documents [(score, doc)] pour la requête. Avec
+        `match_all`, un document doit contenir tous les mots de la requête.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._lengths:
+            return []
+        postings = [self._postings.get(term, {}) for term in terms]
+        if match_all:
+            if not all(postings):
+                return []
+            # Intersection en partant de la liste la plus courte
+            rarest = min(postings, key=len)
+            docs = [doc for doc in rarest if all(doc in p for p in postings)]
+        else:
+            docs = set().union(*postings)
+        if accept is not None:
+            docs = [doc for doc in docs if accept(doc)]
+
+        count = len(self._lengths)
+        average = self._total_length / count or 1
+        idf = [math.log(1 + (count - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+
+        def score(doc):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[doc] / average)
+            total = 0.0
+            for weight, p in zip(idf, postings):
+                tf = p.get(doc)
+                if tf:
+                    total += weight * tf * (self.k1 + 1) / (tf + norm)
+            return total
+
+        return heapq.nlargest(limit, ((score(doc), doc) for doc in docs), key=lambda item: item[0])
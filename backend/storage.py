@@ -0,0 +1,1093 @@
+import os
+import json
+import time
+import bisect
+import base64
+import itertools
+import sqlite3
+import threading
+from contextlib import contextmanager
+from scheduler import due_timestamp
+from search_index import Bm25Index, tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou entre processus
+    fcntl = None
+
+
+# Champs d'un jeu stockés dans des colonnes dédiées (le reste va dans "extra")
+SET_COLUMNS = ("title", "source", "creation_date")
+
+
+def encode_cursor(creation_date, set_id):
+    """Curseur de pagination opaque: position (date de création, id) du dernier jeu renvoyé"""
+    raw = json.dumps([creation_date, set_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Lève ValueError si le curseur est invalide"""
+    try:
+        creation_date, set_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(creation_date), str(set_id)
+    except Exception:
+        raise ValueError(f"Curseur invalide: {cursor}")
+
+
+def check_card_ids(flashcards):
+    """
+    Chaque carte d'un jeu doit avoir un identifiant (chaîne non vide) unique
+    dans le jeu: lève ValueError sinon. Les deux moteurs refusent ainsi les
+    mêmes jeux, sans perdre de carte en silence.
+    """
+    seen = set()
+    duplicates = []
+    for card in flashcards:
+        card_id = card.get("id") if isinstance(card, dict) else None
+        if not isinstance(card_id, str) or not card_id:
+            raise ValueError("Chaque carte doit avoir un identifiant")
+        if card_id in seen:
+            duplicates.append(card_id)
+        seen.add(card_id)
+    if duplicates:
+        raise ValueError(f"Identifiants de cartes en double: {', '.join(duplicates)}")
+
+
+class FlashcardStore:
+    """
+    Interface commune des moteurs de stockage des flashcards.
+
+    Chaque méthode ne touche que le jeu ou la carte concernés, ce qui permet
+    aux moteurs incrémentaux (SQLite) d'éviter de réécrire toute la base.
+    """
+
+    def list_sets(self, limit=None, cursor=None, descending=False):
+        """
+        Retourne le résumé (id, titre, source, date, nombre de cartes) des jeux
+        triés par date de création, à partir du curseur `cursor`, et le curseur
+        de la page suivante (None s'il n'y en a pas).
+        """
+        raise NotImplementedError
+
+    def get_set(self, set_id, offset=0, limit=None):
+        """
+        Retourne un jeu avec ses cartes, ou None s'il n'existe pas. Si `limit`
+        est donné, seules les cartes [offset, offset + limit) sont chargées et
+        le nombre total de cartes est ajouté dans "count".
+        """
+        raise NotImplementedError
+
+    def revision(self):
+        """Révision globale, nouvelle à chaque écriture (sert d'ETag pour les listes)"""
+        raise NotImplementedError
+
+    def set_revision(self, set_id):
+        """Révision d'un jeu, nouvelle à chaque écriture sur ce jeu ou ses cartes (None s'il n'existe pas)"""
+        raise NotImplementedError
+
+    def has_set(self, set_id):
+        return self.get_set(set_id) is not None
+
+    def create_set(self, set_id, card_set):
+        """Crée ou remplace un jeu. Lève ValueError si des cartes n'ont pas d'identifiant unique"""
+        raise NotImplementedError
+
+    def update_set(self, set_id, title=None, flashcards=None):
+        """
+        Met à jour le titre et/ou remplace les cartes. Retourne False si le jeu
+        n'existe pas; lève ValueError comme create_set.
+        """
+        raise NotImplementedError
+
+    def delete_set(self, set_id):
+        """Supprime un jeu. Retourne False si le jeu n'existe pas"""
+        raise NotImplementedError
+
+    def get_card(self, set_id, card_id):
+        raise NotImplementedError
+
+    def update_card(self, set_id, card_id, fields):
+        """Fusionne `fields` dans la carte et la retourne, ou None si elle n'existe pas"""
+        raise NotImplementedError
+
+    def update_cards(self, set_id, updates):
+        """
+        Applique plusieurs mises à jour {card_id: champs} d'un même jeu en une
+        seule transaction. Les champs peuvent aussi être une fonction de la
+        carte courante, appelée dans la transaction (lecture et écriture
+        atomiques, par exemple pour planifier une révision). Tout ou rien:
+        lève KeyError (avec la liste des identifiants inconnus) si une carte
+        n'existe pas. Retourne les cartes mises à jour, dans l'ordre de `updates`.
+        """
+        raise NotImplementedError
+
+    def due_cards(self, now, limit=20, set_id=None):
+        """
+        Cartes dont l'échéance (nextReview) est passée à la date `now` (epoch),
+        les plus en retard d'abord, sous la forme [{"set_id", "card"}]. Les
+        moteurs s'appuient sur un index trié des échéances plutôt que de
+        parcourir toutes les cartes.
+        """
+        raise NotImplementedError
+
+    def search_cards(self, query, limit=20, set_id=None, match_all=True):
+        """
+        Recherche plein texte (BM25) dans les questions et réponses de toutes
+        les cartes, ou d'un seul jeu. Retourne [{"set_id", "card", "score"}],
+        les plus pertinentes d'abord. Avec `match_all`, une carte doit
+        contenir tous les mots de la requête.
+        """
+        raise NotImplementedError
+
+    def export_all(self):
+        """Retourne toute la base sous la forme {set_id: jeu} (format historique du JSON)"""
+        raise NotImplementedError
+
+    def replace_all(self, db):
+        """Remplace toute la base par le dictionnaire `db`"""
+        raise NotImplementedError
+
+    def create_job(self, job):
+        raise NotImplementedError
+
+    def get_job(self, job_id):
+        raise NotImplementedError
+
+    def update_job(self, job_id, fields):
+        """Fusionne `fields` dans la tâche et met à jour son horodatage"""
+        raise NotImplementedError
+
+    def list_jobs(self, statuses=None):
+        raise NotImplementedError
+
+    def claim_job(self, job_id):
+        """Passe atomiquement une tâche de "queued" à "running". Retourne la tâche, ou None si elle est déjà prise"""
+        raise NotImplementedError
+
+    def touch_job(self, job_id):
+        """Signal de vie d'une tâche en attente ou en cours: met seulement à jour son horodatage"""
+        raise NotImplementedError
+
+    def requeue_stale_job(self, job_id, stale_before):
+        """
+        Remet atomiquement en file une tâche en attente ou en cours sans mise à
+        jour depuis `stale_before` (processus arrêté). Retourne la tâche, ou
+        None si elle est terminée ou toujours active.
+        """
+        raise NotImplementedError
+
+    def delete_finished_jobs(self, finished_before):
+        """Supprime les tâches terminées avant `finished_before`. Retourne leur nombre"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _summary(set_id, card_set):
+    return {
+        "id": set_id,
+        "title": card_set["title"],
+        "source": card_set.get("source", ""),
+        "creation_date": card_set.get("creation_date", ""),
+        "count": len(card_set["flashcards"])
+    }
+
+
+def _card_text(card):
+    """Texte indexé d'une carte pour la recherche"""
+    return f"{card.get('question', '')}\n{card.get('answer', '')}"
+
+
+def _slice_set(card_set, offset, limit):
+    if limit is None:
+        return card_set
+    count = len(card_set["flashcards"])
+    card_set["flashcards"] = card_set["flashcards"][offset:offset + limit]
+    card_set["count"] = count
+    return card_set
+
+
+class JsonFlashcardStore(FlashcardStore):
+    """
+    Moteur historique : toute la base est gardée en mémoire et réécrite
+    dans un seul fichier JSON à chaque modification. Le fichier n'est lu
+    qu'à la première opération sur les jeux (pas au démarrage du processus).
+
+    Plusieurs processus (workers gunicorn) peuvent partager les mêmes
+    fichiers: chaque opération prend un verrou de fichier exclusif et
+    recharge la base si un autre processus l'a réécrite entre-temps, ce qui
+    évite qu'un worker écrase les modifications d'un autre.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.jobs_path = os.path.join(os.path.dirname(path), 'jobs.json')
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = None
+        self._lock_pid = None
+        # Identité (inode, date, taille) des fichiers tels que ce processus les a lus ou écrits
+        self._signatures = {}
+        self._db = {}
+        self._jobs = {}
+        # Index des résumés tenu à jour à chaque écriture
+        self._summaries = {}
+        # Index {set_id: {card_id: position}} pour trouver une carte sans parcourir le jeu
+        self._card_index = {}
+        # Index trié des échéances [(due_at, set_id, card_id)] et échéance courante de chaque carte
+        self._due = []
+        self._card_due = {}
+        # Index inversé BM25 des cartes et texte indexé de chaque carte
+        self._search = Bm25Index()
+        self._card_text = {}
+        # Révision de chaque jeu: révision du fichier lors de sa dernière écriture par ce processus
+        self._set_revisions = {}
+
+    @staticmethod
+    def _file_signature(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read_if_changed(self, path, default):
+        """Contenu du fichier s'il a changé depuis la dernière lecture/écriture de ce processus, sinon None"""
+        signature = self._file_signature(path)
+        if signature == self._signatures.get(path, False):
+            return None
+        self._signatures[path] = signature
+        if signature is None:
+            return default
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _reload_if_changed(self, sets=True):
+        db = self._read_if_changed(self.path, {}) if sets else None
+        if db is not None:
+            self._db = db
+            self._rebuild_indexes()
+            # Le contenu a pu changer dans un autre processus: les jeux prennent la révision du fichier
+            self._set_revisions = {}
+        jobs = self._read_if_changed(self.jobs_path, {})
+        if jobs is not None:
+            self._jobs = jobs
+
+    def _rebuild_indexes(self):
+        self._summaries = {}
+        self._card_index = {}
+        self._due = []
+        self._card_due = {}
+        self._search = Bm25Index()
+        self._card_text = {}
+        for set_id, card_set in self._db.items():
+            self._summaries[set_id] = _summary(set_id, card_set)
+            self._index_cards(set_id)
+
+    @contextmanager
+    def _locked(self, sets=True):
+        """
+        Verrou du thread puis, au premier niveau, verrou de fichier partagé
+        entre processus (sans effet sur les plateformes sans fcntl). Avec
+        `sets=False` (opérations sur les tâches), la base des jeux n'est pas
+        rechargée.
+        """
+        with self._lock:
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1:
+                    self._acquire_file_lock()
+                    try:
+                        self._reload_if_changed(sets)
+                    except Exception:
+                        self._release_file_lock()
+                        raise
+                try:
+                    yield
+                finally:
+                    if self._lock_depth == 1:
+                        self._release_file_lock()
+            finally:
+                self._lock_depth -= 1
+
+    def _acquire_file_lock(self):
+        if fcntl is None:
+            return
+        # Après un fork, le descripteur hérité partagerait le verrou du parent
+        if self._lock_file is None or self._lock_pid != os.getpid():
+            self._lock_file = open(self.path + ".lock", 'a')
+            self._lock_pid = os.getpid()
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+
+    def _release_file_lock(self):
+        if fcntl is not None and self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _index_cards(self, set_id):
+        cards = self._db[set_id]["flashcards"]
+        self._card_index[set_id] = {card.get("id"): position for position, card in enumerate(cards)}
+        self._index_due(set_id, {card.get("id"): due_timestamp(card) for card in cards})
+        self._index_search(set_id, {card.get("id"): _card_text(card) for card in cards})
+
+    def _index_search(self, set_id, new_text):
+        # Seules les cartes ajoutées, modifiées ou supprimées sont réindexées
+        old_text = self._card_text.pop(set_id, {})
+        for card_id in old_text:
+            if card_id not in new_text:
+                self._search.remove((set_id, card_id))
+        for card_id, text in new_text.items():
+            if old_text.get(card_id) != text:
+                self._search.add((set_id, card_id), text)
+        if new_text:
+            self._card_text[set_id] = new_text
+
+    def _index_due(self, set_id, new_due):
+        # Seules les échéances modifiées sont déplacées dans la liste triée
+        old_due = self._card_due.pop(set_id, {})
+        for card_id, due_at in old_due.items():
+            if new_due.get(card_id) != due_at:
+                entry = (due_at, set_id, card_id)
+                position = bisect.bisect_left(self._due, entry)
+                if position < len(self._due) and self._due[position] == entry:
+                    del self._due[position]
+        for card_id, due_at in new_due.items():
+            if old_due.get(card_id) != due_at:
+                bisect.insort(self._due, (due_at, set_id, card_id))
+        if new_due:
+            self._card_due[set_id] = new_due
+
+    def _find_card(self, set_id, card_id):
+        position = self._card_index.get(set_id, {}).get(card_id)
+        return self._db[set_id]["flashcards"][position] if position is not None else None
+
+    def _write_atomic(self, path, data):
+        # Écriture atomique : un crash pendant l'écriture ne corrompt pas la base
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        self._signatures[path] = self._file_signature(path)
+
+    def _file_revision(self):
+        """
+        Révision tirée de l'identité du fichier des jeux (inode, date en ns,
+        taille), relue sous le verrou: identique dans tous les processus pour
+        un même contenu, et nouvelle après chaque écriture atomique.
+        """
+        signature = self._signatures.get(self.path)
+        return "-".join(str(part) for part in signature) if signature else "0"
+
+    def _flush(self, set_id=None):
+        self._write_atomic(self.path, self._db)
+        if set_id is not None:
+            if set_id in self._db:
+                self._summaries[set_id] = _summary(set_id, self._db[set_id])
+                self._index_cards(set_id)
+                # Révision du fichier écrit: jamais réutilisée pour un jeu recréé
+                self._set_revisions[set_id] = self._file_revision()
+            else:
+                self._summaries.pop(set_id, None)
+                self._card_index.pop(set_id, None)
+                self._index_due(set_id, {})
+                self._index_search(set_id, {})
+                self._set_revisions.pop(set_id, None)
+
+    def list_sets(self, limit=None, cursor=None, descending=False):
+        with self._locked():
+            summaries = sorted(
+                self._summaries.values(),
+                key=lambda s: (s["creation_date"], s["id"]),
+                reverse=descending
+            )
+        if cursor is not None:
+            position = decode_cursor(cursor)
+            summaries = [
+                s for s in summaries
+                if ((s["creation_date"], s["id"]) < position if descending else (s["creation_date"], s["id"]) > position)
+            ]
+        if limit is None or len(summaries) <= limit:
+            return [dict(s) for s in summaries], None
+        page = [dict(s) for s in summaries[:limit]]
+        return page, encode_cursor(page[-1]["creation_date"], page[-1]["id"])
+
+    def get_set(self, set_id, offset=0, limit=None):
+        with self._locked():
+            card_set = self._db.get(set_id)
+            if card_set is None:
+                return None
+            return _slice_set(json.loads(json.dumps(card_set)), offset, limit)
+
+    def revision(self):
+        with self._locked():
+            return self._file_revision()
+
+    def set_revision(self, set_id):
+        with self._locked():
+            if set_id not in self._db:
+                return None
+            return self._set_revisions.get(set_id) or self._file_revision()
+
+    def has_set(self, set_id):
+        with self._locked():
+            return set_id in self._db
+
+    def create_set(self, set_id, card_set):
+        check_card_ids(card_set.get("flashcards", []))
+        with self._locked():
+            self._db[set_id] = card_set
+            self._flush(set_id)
+
+    def update_set(self, set_id, title=None, flashcards=None):
+        if flashcards is not None:
+            check_card_ids(flashcards)
+        with self._locked():
+            if set_id not in self._db:
+                return False
+            if title is not None:
+                self._db[set_id]["title"] = title
+            if flashcards is not None:
+                self._db[set_id]["flashcards"] = flashcards
+            self._flush(set_id)
+            return True
+
+    def delete_set(self, set_id):
+        with self._locked():
+            if set_id not in self._db:
+                return False
+            del self._db[set_id]
+            self._flush(set_id)
+            return True
+
+    def get_card(self, set_id, card_id):
+        with self._locked():
+            card = self._find_card(set_id, card_id)
+            return dict(card) if card is not None else None
+
+    def update_card(self, set_id, card_id, fields):
+        with self._locked():
+            card = self._find_card(set_id, card_id)
+            if card is None:
+                return None
+            card.update(fields)
+            card["id"] = card_id
+            self._flush(set_id)
+            return dict(card)
+
+    def update_cards(self, set_id, updates):
+        with self._locked():
+            missing = [card_id for card_id in updates if self._find_card(set_id, card_id) is None]
+            if missing:
+                raise KeyError(missing)
+            updated = []
+            for card_id, fields in updates.items():
+                card = self._find_card(set_id, card_id)
+                card.update(fields(dict(card)) if callable(fields) else fields)
+                card["id"] = card_id
+                updated.append(dict(card))
+            self._flush(set_id)
+            return updated
+
+    def due_cards(self, now, limit=20, set_id=None):
+        with self._locked():
+            end = bisect.bisect_right(self._due, (now, chr(0x10FFFF), chr(0x10FFFF)))
+            items = []
+            # Parcours sans copie de l'index: arrêt dès `limit` cartes trouvées
+            for _, due_set_id, card_id in itertools.islice(self._due, end):
+                if set_id is not None and due_set_id != set_id:
+                    continue
+                items.append({"set_id": due_set_id, "card": dict(self._find_card(due_set_id, card_id))})
+                if len(items) >= limit:
+                    break
+            return items
+
+    def search_cards(self, query, limit=20, set_id=None, match_all=True):
+        with self._locked():
+            accept = (lambda doc: doc[0] == set_id) if set_id is not None else None
+            return [
+                {"set_id": doc[0], "card": dict(self._find_card(*doc)), "score": round(score, 4)}
+                for score, doc in self._search.search(query, limit, match_all, accept)
+            ]
+
+    def export_all(self):
+        with self._locked():
+            return json.loads(json.dumps(self._db))
+
+    def replace_all(self, db):
+        for card_set in db.values():
+            check_card_ids(card_set.get("flashcards", []))
+        with self._locked():
+            self._db = db
+            self._rebuild_indexes()
+            self._set_revisions = {}
+            self._flush()
+
+    def create_job(self, job):
+        with self._locked(sets=False):
+            self._jobs[job["id"]] = json.loads(json.dumps(job))
+            self._write_atomic(self.jobs_path, self._jobs)
+
+    def get_job(self, job_id):
+        with self._locked(sets=False):
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job is not None else None
+
+    def update_job(self, job_id, fields):
+        with self._locked(sets=False):
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(json.loads(json.dumps(fields)))
+            job["updated_at"] = time.time()
+            self._write_atomic(self.jobs_path, self._jobs)
+            return json.loads(json.dumps(job))
+
+    def list_jobs(self, statuses=None):
+        with self._locked(sets=False):
+            return [
+                json.loads(json.dumps(job)) for job in self._jobs.values()
+                if statuses is None or job["status"] in statuses
+            ]
+
+    def claim_job(self, job_id):
+        with self._locked(sets=False):
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "queued":
+                return None
+            return self.update_job(job_id, {"status": "running"})
+
+    def touch_job(self, job_id):
+        with self._locked(sets=False):
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ("queued", "running"):
+                return None
+            return self.update_job(job_id, {})
+
+    def requeue_stale_job(self, job_id, stale_before):
+        with self._locked(sets=False):
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ("queued", "running") or job["updated_at"] >= stale_before:
+                return None
+            return self.update_job(job_id, {"status": "queued"})
+
+    def delete_finished_jobs(self, finished_before):
+        with self._locked(sets=False):
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in ("done", "failed") and job["updated_at"] < finished_before
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            if expired:
+                self._write_atomic(self.jobs_path, self._jobs)
+            return len(expired)
+
+
+class SQLiteFlashcardStore(FlashcardStore):
+    """
+    Moteur SQLite en mode WAL : chaque écriture ne touche que les lignes du
+    jeu ou de la carte modifiés. Les cartes sont indexées par (set_id, card_id).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS flashcard_sets (
+            set_id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT '',
+            creation_date TEXT NOT NULL DEFAULT '',
+            extra TEXT NOT NULL DEFAULT '{}',
+            card_count INTEGER NOT NULL DEFAULT 0,
+            revision INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS flashcards (
+            set_id TEXT NOT NULL REFERENCES flashcard_sets(set_id) ON DELETE CASCADE,
+            card_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            due_at REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (set_id, card_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_flashcards_position ON flashcards(set_id, position);
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+        CREATE TABLE IF NOT EXISTS store_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO store_meta (key, value) VALUES ('revision', 0);
+    """
+
+    # Index de recherche FTS5 (BM25) tenu à jour par des triggers sur la table des cartes
+    SEARCH_SCHEMA = (
+        """CREATE VIRTUAL TABLE card_search USING fts5(
+            question, answer, tokenize = 'unicode61 remove_diacritics 2'
+        )""",
+        """CREATE TRIGGER card_search_insert AFTER INSERT ON flashcards BEGIN
+            INSERT INTO card_search (rowid, question, answer) VALUES (
+                new.rowid, json_extract(new.data, '$.question'), json_extract(new.data, '$.answer')
+            );
+        END""",
+        """CREATE TRIGGER card_search_delete AFTER DELETE ON flashcards BEGIN
+            DELETE FROM card_search WHERE rowid = old.rowid;
+        END""",
+        """CREATE TRIGGER card_search_update AFTER UPDATE OF data ON flashcards BEGIN
+            DELETE FROM card_search WHERE rowid = old.rowid;
+            INSERT INTO card_search (rowid, question, answer) VALUES (
+                new.rowid, json_extract(new.data, '$.question'), json_extract(new.data, '$.answer')
+            );
+        END""",
+        # Indexation des cartes existantes
+        """INSERT INTO card_search (rowid, question, answer)
+            SELECT rowid, json_extract(data, '$.question'), json_extract(data, '$.answer') FROM flashcards""",
+    )
+
+    def __init__(self, path, mmap_size=0):
+        self.path = path
+        # Lecture des pages de la base par projection mémoire (0 = désactivée)
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._fts = True
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        self._upgrade_schema(conn)
+
+    def _upgrade_schema(self, conn):
+        """Ajoute les colonnes des index (résumés, échéances) aux bases créées avant leur introduction"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(flashcard_sets)")}
+        card_columns = {row[1] for row in conn.execute("PRAGMA table_info(flashcards)")}
+        with self._transaction() as conn:
+            if "card_count" not in columns:
+                conn.execute("ALTER TABLE flashcard_sets ADD COLUMN card_count INTEGER NOT NULL DEFAULT 0")
+                conn.execute(
+                    "UPDATE flashcard_sets SET card_count = "
+                    "(SELECT COUNT(*) FROM flashcards f WHERE f.set_id = flashcard_sets.set_id)"
+                )
+            if "revision" not in columns:
+                conn.execute("ALTER TABLE flashcard_sets ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sets_creation_date ON flashcard_sets(creation_date, set_id)"
+            )
+            if "due_at" not in card_columns:
+                conn.execute("ALTER TABLE flashcards ADD COLUMN due_at REAL NOT NULL DEFAULT 0")
+                rows = conn.execute("SELECT set_id, card_id, data FROM flashcards").fetchall()
+                conn.executemany(
+                    "UPDATE flashcards SET due_at = ? WHERE set_id = ? AND card_id = ?",
+                    [(due_timestamp(json.loads(data)), set_id, card_id) for set_id, card_id, data in rows]
+                )
+            self._create_search_index(conn)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_flashcards_due ON flashcards(due_at, set_id, card_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_flashcards_set_due ON flashcards(set_id, due_at, card_id)")
+
+    def _create_search_index(self, conn):
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'card_search'"
+        ).fetchone()
+        if exists:
+            return
+        try:
+            conn.execute(self.SEARCH_SCHEMA[0])
+        except sqlite3.OperationalError as e:
+            # SQLite compilé sans FTS5: recherche par simple filtrage
+            print(f"Index de recherche FTS5 indisponible ({e})")
+            self._fts = False
+            return
+        # Triggers et indexation des cartes existantes dans la même transaction
+        for statement in self.SEARCH_SCHEMA[1:]:
+            conn.execute(statement)
+
+    def _conn(self):
+        # Une connexion par thread : sqlite3 interdit le partage entre threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            # INSERT OR REPLACE déclenche aussi les triggers de suppression (index de recherche)
+            conn.execute("PRAGMA recursive_triggers=ON")
+            if self.mmap_size:
+                conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._conn())
+
+    @staticmethod
+    def _split_set(card_set):
+        extra = {k: v for k, v in card_set.items() if k not in SET_COLUMNS and k != "flashcards"}
+        return (
+            card_set.get("title", ""),
+            card_set.get("source", ""),
+            card_set.get("creation_date", ""),
+            json.dumps(extra, ensure_ascii=False)
+        )
+
+    @staticmethod
+    def _insert_cards(conn, set_id, flashcards):
+        # Vérifié avant l'insertion: la transaction est annulée, aucune carte n'est remplacée
+        check_card_ids(flashcards)
+        conn.executemany(
+            "INSERT INTO flashcards (set_id, card_id, position, data, due_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (set_id, card["id"], i, json.dumps(card, ensure_ascii=False), due_timestamp(card))
+                for i, card in enumerate(flashcards)
+            ]
+        )
+        # Index des résumés: le nombre de cartes est tenu à jour à l'écriture
+        conn.execute(
+            "UPDATE flashcard_sets SET card_count = (SELECT COUNT(*) FROM flashcards WHERE set_id = ?) WHERE set_id = ?",
+            (set_id, set_id)
+        )
+
+    @staticmethod
+    def _bump_revision(conn, set_id=None, all_sets=False):
+        """
+        Incrémente le compteur global; la révision d'un jeu modifié prend sa
+        valeur, qui ne repart jamais de zéro (même si le jeu est supprimé puis
+        recréé avec le même identifiant).
+        """
+        conn.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'revision'")
+        current = "(SELECT value FROM store_meta WHERE key = 'revision')"
+        if all_sets:
+            conn.execute(f"UPDATE flashcard_sets SET revision = {current}")
+        elif set_id is not None:
+            conn.execute(f"UPDATE flashcard_sets SET revision = {current} WHERE set_id = ?", (set_id,))
+
+    def list_sets(self, limit=None, cursor=None, descending=False):
+        query = "SELECT set_id, title, source, creation_date, card_count FROM flashcard_sets"
+        params = []
+        if cursor is not None:
+            query += " WHERE (creation_date, set_id) < (?, ?)" if descending else " WHERE (creation_date, set_id) > (?, ?)"
+            params.extend(decode_cursor(cursor))
+        query += " ORDER BY creation_date DESC, set_id DESC" if descending else " ORDER BY creation_date, set_id"
+        if limit is not None:
+            # Une ligne de plus pour savoir s'il existe une page suivante
+            query += " LIMIT ?"
+            params.append(limit + 1)
+        rows = self._conn().execute(query, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][3], rows[-1][0])
+        return [
+            {"id": row[0], "title": row[1], "source": row[2], "creation_date": row[3], "count": row[4]}
+            for row in rows
+        ], next_cursor
+
+    def get_set(self, set_id, offset=0, limit=None):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT title, source, creation_date, extra, card_count FROM flashcard_sets WHERE set_id = ?",
+            (set_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        card_set = {"title": row[0], "source": row[1], "creation_date": row[2]}
+        card_set.update(json.loads(row[3]))
+        if limit is None:
+            cards = conn.execute(
+                "SELECT data FROM flashcards WHERE set_id = ? ORDER BY position", (set_id,)
+            )
+        else:
+            cards = conn.execute(
+                "SELECT data FROM flashcards WHERE set_id = ? ORDER BY position LIMIT ? OFFSET ?",
+                (set_id, limit, offset)
+            )
+            card_set["count"] = row[4]
+        card_set["flashcards"] = [json.loads(data) for (data,) in cards]
+        return card_set
+
+    def revision(self):
+        return self._conn().execute("SELECT value FROM store_meta WHERE key = 'revision'").fetchone()[0]
+
+    def set_revision(self, set_id):
+        row = self._conn().execute("SELECT revision FROM flashcard_sets WHERE set_id = ?", (set_id,)).fetchone()
+        return row[0] if row else None
+
+    def has_set(self, set_id):
+        row = self._conn().execute(
+            "SELECT 1 FROM flashcard_sets WHERE set_id = ?", (set_id,)
+        ).fetchone()
+        return row is not None
+
+    def create_set(self, set_id, card_set):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO flashcard_sets (set_id, title, source, creation_date, extra) VALUES (?, ?, ?, ?, ?)",
+                (set_id,) + self._split_set(card_set)
+            )
+            conn.execute("DELETE FROM flashcards WHERE set_id = ?", (set_id,))
+            self._insert_cards(conn, set_id, card_set.get("flashcards", []))
+            self._bump_revision(conn, set_id)
+
+    def update_set(self, set_id, title=None, flashcards=None):
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM flashcard_sets WHERE set_id = ?", (set_id,)).fetchone() is None:
+                return False
+            if title is not None:
+                conn.execute("UPDATE flashcard_sets SET title = ? WHERE set_id = ?", (title, set_id))
+            if flashcards is not None:
+                conn.execute("DELETE FROM flashcards WHERE set_id = ?", (set_id,))
+                self._insert_cards(conn, set_id, flashcards)
+            self._bump_revision(conn, set_id)
+            return True
+
+    def delete_set(self, set_id):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM flashcards WHERE set_id = ?", (set_id,))
+            cursor = conn.execute("DELETE FROM flashcard_sets WHERE set_id = ?", (set_id,))
+            if cursor.rowcount == 0:
+                # Rien de supprimé: les ETags des listes restent valables
+                return False
+            self._bump_revision(conn)
+            return True
+
+    def get_card(self, set_id, card_id):
+        row = self._conn().execute(
+            "SELECT data FROM flashcards WHERE set_id = ? AND card_id = ?", (set_id, card_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _merge_card(conn, set_id, card_id, fields):
+        row = conn.execute(
+            "SELECT data FROM flashcards WHERE set_id = ? AND card_id = ?", (set_id, card_id)
+        ).fetchone()
+        if row is None:
+            return None
+        card = json.loads(row[0])
+        card.update(fields(dict(card)) if callable(fields) else fields)
+        # L'identifiant de la carte est la clé primaire : il ne change pas
+        card["id"] = card_id
+        conn.execute(
+            "UPDATE flashcards SET data = ?, due_at = ? WHERE set_id = ? AND card_id = ?",
+            (json.dumps(card, ensure_ascii=False), due_timestamp(card), set_id, card_id)
+        )
+        return card
+
+    def update_card(self, set_id, card_id, fields):
+        with self._transaction() as conn:
+            card = self._merge_card(conn, set_id, card_id, fields)
+            if card is not None:
+                self._bump_revision(conn, set_id)
+            return card
+
+    def update_cards(self, set_id, updates):
+        with self._transaction() as conn:
+            updated = []
+            missing = []
+            for card_id, fields in updates.items():
+                card = self._merge_card(conn, set_id, card_id, fields)
+                if card is None:
+                    missing.append(card_id)
+                else:
+                    updated.append(card)
+            if missing:
+                # Annule toute la transaction
+                raise KeyError(missing)
+            self._bump_revision(conn, set_id)
+            return updated
+
+    def due_cards(self, now, limit=20, set_id=None):
+        # Parcours de l'index des échéances: seules les `limit` premières lignes sont lues
+        if set_id is None:
+            rows = self._conn().execute(
+                "SELECT set_id, data FROM flashcards WHERE due_at <= ? ORDER BY due_at, set_id, card_id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+        else:
+            rows = self._conn().execute(
+                "SELECT set_id, data FROM flashcards WHERE set_id = ? AND due_at <= ? ORDER BY due_at, card_id LIMIT ?",
+                (set_id, now, limit)
+            ).fetchall()
+        return [{"set_id": row_set_id, "card": json.loads(data)} for row_set_id, data in rows]
+
+    def search_cards(self, query, limit=20, set_id=None, match_all=True):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        if not self._fts:
+            return self._search_without_index(terms, limit, set_id, match_all)
+        match = (" " if match_all else " OR ").join(f'"{term}"' for term in terms)
+        sql = (
+            "SELECT f.set_id, f.data, bm25(card_search, 2.0, 1.0) AS rank FROM card_search "
+            "JOIN flashcards f ON f.rowid = card_search.rowid WHERE card_search MATCH ?"
+        )
+        params = [match]
+        if set_id is not None:
+            sql += " AND f.set_id = ?"
+            params.append(set_id)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        rows = self._conn().execute(sql, params).fetchall()
+        return [
+            {"set_id": row_set_id, "card": json.loads(data), "score": round(-rank, 4)}
+            for row_set_id, data, rank in rows
+        ]
+
+    def _search_without_index(self, terms, limit, set_id, match_all):
+        results = []
+        sql = "SELECT set_id, data FROM flashcards" + (" WHERE set_id = ?" if set_id is not None else "")
+        for row_set_id, data in self._conn().execute(sql, (set_id,) if set_id is not None else ()):
+            card = json.loads(data)
+            words = set(tokenize(_card_text(card)))
+            found = sum(term in words for term in terms)
+            if found == len(terms) or (found and not match_all):
+                results.append({"set_id": row_set_id, "card": card, "score": float(found)})
+                if len(results) >= limit:
+                    break
+        return results
+
+    def export_all(self):
+        set_ids = [row[0] for row in self._conn().execute("SELECT set_id FROM flashcard_sets ORDER BY rowid")]
+        return {set_id: self.get_set(set_id) for set_id in set_ids}
+
+    def replace_all(self, db):
+        with self._transaction() as conn:
+            self._replace_all(conn, db)
+
+    def _replace_all(self, conn, db):
+        conn.execute("DELETE FROM flashcards")
+        conn.execute("DELETE FROM flashcard_sets")
+        for set_id, card_set in db.items():
+            conn.execute(
+                "INSERT INTO flashcard_sets (set_id, title, source, creation_date, extra) VALUES (?, ?, ?, ?, ?)",
+                (set_id,) + self._split_set(card_set)
+            )
+            self._insert_cards(conn, set_id, card_set.get("flashcards", []))
+        self._bump_revision(conn, all_sets=True)
+
+    def create_job(self, job):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+                (job["id"], job["status"], json.dumps(job, ensure_ascii=False), job["updated_at"])
+            )
+
+    def get_job(self, job_id):
+        row = self._conn().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _update_job(self, conn, job_id, fields, expected_statuses=None):
+        row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = json.loads(row[0])
+        if expected_statuses is not None and job["status"] not in expected_statuses:
+            return None
+        job.update(fields)
+        job["updated_at"] = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = ?, data = ?, updated_at = ? WHERE job_id = ?",
+            (job["status"], json.dumps(job, ensure_ascii=False), job["updated_at"], job_id)
+        )
+        return job
+
+    def update_job(self, job_id, fields):
+        with self._transaction() as conn:
+            return self._update_job(conn, job_id, fields)
+
+    def list_jobs(self, statuses=None):
+        if statuses is None:
+            rows = self._conn().execute("SELECT data FROM jobs").fetchall()
+        else:
+            placeholders = ",".join("?" * len(statuses))
+            rows = self._conn().execute(
+                f"SELECT data FROM jobs WHERE status IN ({placeholders})", tuple(statuses)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def claim_job(self, job_id):
+        with self._transaction() as conn:
+            return self._update_job(conn, job_id, {"status": "running"}, expected_statuses=("queued",))
+
+    def touch_job(self, job_id):
+        with self._transaction() as conn:
+            return self._update_job(conn, job_id, {}, expected_statuses=("queued", "running"))
+
+    def requeue_stale_job(self, job_id, stale_before):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT updated_at FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row[0] >= stale_before:
+                return None
+            return self._update_job(conn, job_id, {"status": "queued"}, expected_statuses=("queued", "running"))
+
+    def delete_finished_jobs(self, finished_before):
+        with self._transaction() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (finished_before,)
+            ).rowcount
+
+    def is_empty(self):
+        return self._conn().execute("SELECT 1 FROM flashcard_sets LIMIT 1").fetchone() is None
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _Transaction:
+    """Gestionnaire de contexte BEGIN IMMEDIATE / COMMIT / ROLLBACK"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+def migrate_json_to_sqlite(json_path, store):
+    """
+    Importe l'ancien fichier flashcards.json dans une base SQLite vide,
+    puis le renomme en .migrated pour ne pas l'importer une seconde fois.
+    """
+    if not os.path.exists(json_path):
+        return 0
+    # Chaque worker gunicorn fait cette vérification à l'import: la transaction
+    # exclusive garantit qu'un seul processus importe et renomme le fichier
+    with store._transaction() as conn:
+        if not store.is_empty():
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                db = json.load(f)
+        except FileNotFoundError:
+            # Déjà migré par un autre processus
+            return 0
+        store._replace_all(conn, db)
+        os.replace(json_path, json_path + ".migrated")
+    print(f"Migration de {len(db)} jeux de flashcards depuis {json_path}")
+    return len(db)
+
+
+def open_store(backend, data_folder, mmap_size=0):
+    """
+    Ouvre le moteur de stockage configuré ("sqlite" par défaut, ou "json"
+    pour conserver l'ancien fichier unique). `mmap_size` (octets) active la
+    projection mémoire de la base SQLite.
+    """
+    json_path = os.path.join(data_folder, 'flashcards.json')
+    if backend == "json":
+        return JsonFlashcardStore(json_path)
+    if backend == "sqlite":
+        store = SQLiteFlashcardStore(os.path.join(data_folder, 'flashcards.db'), mmap_size=mmap_size)
+        migrate_json_to_sqlite(json_path, store)
+        return store
+    raise ValueError(f"Moteur de stockage inconnu: {backend}")
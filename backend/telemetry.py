@@ -0,0 +1,297 @@
+import os
+import sys
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Bornes (secondes) des histogrammes de durée, de la milliseconde à l'appel Gemini le plus long
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Compteur monotone, une série par combinaison de valeurs d'étiquettes"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, "") for name in self.labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in items]
+
+
+class Histogram:
+    """Histogramme cumulatif (format Prometheus): compte par borne, somme et nombre d'observations"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, [("le", _format_value(bound))])
+                lines.append((f"{self.name}_bucket", labels, cumulative))
+            lines.append((f"{self.name}_sum", _format_labels(self.labels, key), round(total, 6)))
+            lines.append((f"{self.name}_count", _format_labels(self.labels, key), count))
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Métriques du processus, exposées au format texte de Prometheus.
+
+    Les `collectors` sont appelés au moment de l'export et retournent des
+    métriques calculées à la demande [(nom, type, aide, [(étiquettes, valeur)])],
+    par exemple les compteurs déjà tenus par les caches ou le client Gemini.
+    Chaque processus (worker gunicorn) a son propre registre.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in metric.samples())
+        for collector in self._collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                print(f"Collecte de métriques en échec: {e}")
+                continue
+            for name, kind, help, series in collected:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in series:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "brainboost_stage_duration_seconds",
+    "Durée des étapes du traitement (enregistrement, extraction, appels Gemini, analyse, persistance)",
+    ("stage", "outcome")
+)
+
+_tracer = None
+
+
+def configure_tracing(service_name="brainboost-backend", endpoint=None):
+    """
+    Export OpenTelemetry (OTLP/HTTP) des étapes vers un collecteur local. Sans
+    effet si les paquets opentelemetry ne sont pas installés.
+    """
+    global _tracer
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        print("⚠️ OpenTelemetry non installé (opentelemetry-sdk, opentelemetry-exporter-otlp-proto-http): traces désactivées")
+        return False
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    exporter = OTLPSpanExporter(endpoint=f"{endpoint.rstrip('/')}/v1/traces") if endpoint else OTLPSpanExporter()
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("brainboost")
+    return True
+
+
+def record_stage(stage, seconds, outcome="ok"):
+    """Enregistre la durée d'une étape mesurée ailleurs (par exemple dans un processus du pool)"""
+    STAGE_SECONDS.observe(seconds, stage=stage, outcome=outcome)
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Mesure une étape: durée dans l'histogramme des étapes (issue "ok" ou
+    "error") et, si le traçage est configuré, span OpenTelemetry du même nom.
+    """
+    otel = _tracer.start_as_current_span(stage, attributes=attributes) if _tracer is not None else None
+    if otel is not None:
+        otel.__enter__()
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - started, outcome)
+        if otel is not None:
+            otel.__exit__(*sys.exc_info())
+
+
+def start_request_span(name, **attributes):
+    """Span OpenTelemetry d'une requête HTTP (None sans traçage), à terminer avec end_request_span"""
+    if _tracer is None:
+        return None
+    from opentelemetry import context, trace
+    otel_span = _tracer.start_span(name, attributes=attributes)
+    return otel_span, context.attach(trace.set_span_in_context(otel_span))
+
+
+def end_request_span(handle, status_code=None):
+    if handle is None:
+        return
+    from opentelemetry import context
+    otel_span, token = handle
+    if status_code is not None:
+        otel_span.set_attribute("http.status_code", status_code)
+    otel_span.end()
+    context.detach(token)
+
+
+class SlowRequestProfiler:
+    """
+    Profileur par échantillonnage, activé à la demande pour les requêtes
+    lentes: un thread relève toutes les `interval` secondes la pile des
+    threads qui traitent une requête. Les requêtes de plus de `threshold`
+    secondes sont enregistrées au format « folded » (flamegraph.pl,
+    speedscope) dans `directory`, en gardant les `max_profiles` plus récents.
+    """
+
+    def __init__(self, threshold, directory, interval=0.005, max_profiles=100):
+        self.threshold = threshold
+        self.directory = directory
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self._active = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_sampler(self):
+        # Un thread d'échantillonnage par processus (recréé après un fork)
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._active = {}
+        threading.Thread(target=self._sample_forever, name="request-profiler", daemon=True).start()
+
+    def _sample_forever(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    key = ";".join(reversed(stack))
+                    stacks[key] = stacks.get(key, 0) + 1
+
+    def start(self):
+        self._ensure_sampler()
+        with self._lock:
+            self._active[threading.get_ident()] = {}
+
+    def finish(self, name, seconds):
+        """Retourne le chemin du profil enregistré si la requête a dépassé le seuil, sinon None"""
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if not stacks or seconds < self.threshold:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        safe_name = "".join(c if c.isalnum() else "_" for c in name).strip("_") or "request"
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(seconds * 1000)}ms-{safe_name}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        self._prune()
+        return path
+
+    def _prune(self):
+        profiles = sorted(
+            (entry.path for entry in os.scandir(self.directory) if entry.name.endswith(".folded")),
+            key=os.path.getmtime
+        )
+        for path in profiles[:-self.max_profiles]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
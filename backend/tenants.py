@@ -0,0 +1,188 @@
+import os
+import re
+import time
+import sqlite3
+import datetime
+import threading
+from collections import OrderedDict
+from storage import open_store
+
+DEFAULT_TENANT = "default"
+# Identifiant de locataire: utilisé tel quel comme nom de dossier
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+def valid_tenant_id(tenant_id):
+    return isinstance(tenant_id, str) and TENANT_ID_PATTERN.match(tenant_id) is not None
+
+
+class TenantStores:
+    """
+    Un magasin de flashcards par locataire (utilisateur ou organisation),
+    chacun dans son propre dossier data/tenants/<id> avec ses fichiers et
+    ses index (recherche, révisions): les listes et les écritures d'un
+    locataire ne touchent que sa partition.
+
+    Le locataire par défaut garde le dossier de données principal (bases
+    existantes, tâches). Les magasins sont ouverts à la demande; au plus
+    `max_open` restent en mémoire, les moins récemment utilisés sont oubliés
+    (leurs connexions sont fermées avec eux).
+    """
+
+    def __init__(self, backend, data_folder, default_store, max_open=64, mmap_size=0):
+        self.backend = backend
+        self.root = os.path.join(data_folder, "tenants")
+        self.default_store = default_store
+        self.max_open = max_open
+        self.mmap_size = mmap_size
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def folder(self, tenant_id):
+        return os.path.join(self.root, tenant_id)
+
+    def get(self, tenant_id):
+        """Magasin du locataire, créé au premier accès"""
+        if tenant_id == DEFAULT_TENANT:
+            return self.default_store
+        if not valid_tenant_id(tenant_id):
+            raise ValueError(f"Identifiant de locataire invalide: {tenant_id!r}")
+        with self._lock:
+            store = self._stores.get(tenant_id)
+            if store is not None:
+                self._stores.move_to_end(tenant_id)
+                return store
+            folder = self.folder(tenant_id)
+            os.makedirs(folder, exist_ok=True)
+            store = self._stores[tenant_id] = open_store(self.backend, folder, mmap_size=self.mmap_size)
+            while len(self._stores) > self.max_open:
+                self._stores.popitem(last=False)
+            return store
+
+    def open_count(self):
+        return len(self._stores)
+
+    def tenant_ids(self):
+        """Locataires ayant une partition sur le disque (hors locataire par défaut), triés"""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            name for name in names
+            if valid_tenant_id(name) and name != DEFAULT_TENANT and os.path.isdir(os.path.join(self.root, name))
+        )
+
+
+class RateLimiter:
+    """
+    Seau à jetons par clé (locataire): `per_minute` requêtes par minute en
+    moyenne, rafales de `burst` requêtes. Les seaux sont propres au processus
+    (avec gunicorn, la limite effective est multipliée par le nombre de
+    processus). `per_minute` à 0 désactive la limite.
+    """
+
+    def __init__(self, per_minute, burst=None, max_keys=10000):
+        self.rate = per_minute / 60
+        self.burst = burst or max(1, per_minute)
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Consomme un jeton: retourne 0 si la requête est acceptée, sinon le délai d'attente (secondes)"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return 0
+
+    def _prune(self, now):
+        # Les seaux pleins n'ont plus d'effet: ils sont oubliés
+        full = [
+            key for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * self.rate >= self.burst
+        ]
+        for key in full:
+            del self._buckets[key]
+
+
+class QuotaLedger:
+    """
+    Consommation journalière (UTC) des locataires par type (générations,
+    fichiers...), dans une base SQLite partagée par tous les processus: le
+    quota reste exact avec plusieurs workers et après un redémarrage.
+    """
+
+    def __init__(self, path, keep_days=31):
+        self.path = path
+        self.keep_days = keep_days
+        self._local = threading.local()
+        self._conn().execute(
+            """CREATE TABLE IF NOT EXISTS quota_usage (
+                tenant TEXT NOT NULL,
+                day TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                used INTEGER NOT NULL,
+                PRIMARY KEY (tenant, day, kind)
+            )"""
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def today():
+        return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+    def consume(self, tenant_id, kind, limit, amount=1):
+        """
+        Ajoute `amount` à la consommation du jour si elle reste dans `limit`
+        (0 = illimité). Retourne (accepté, consommation après l'opération).
+        """
+        day = self.today()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT used FROM quota_usage WHERE tenant = ? AND day = ? AND kind = ?", (tenant_id, day, kind)
+            ).fetchone()
+            used = row[0] if row else 0
+            if limit and used + amount > limit:
+                conn.execute("ROLLBACK")
+                return False, used
+            conn.execute(
+                "INSERT INTO quota_usage (tenant, day, kind, used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (tenant, day, kind) DO UPDATE SET used = used + excluded.used",
+                (tenant_id, day, kind, amount)
+            )
+            if row is None:
+                # Premier passage du jour pour ce compteur: purge des jours anciens
+                oldest = (datetime.date.fromisoformat(day) - datetime.timedelta(days=self.keep_days)).isoformat()
+                conn.execute("DELETE FROM quota_usage WHERE day < ?", (oldest,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return True, used + amount
+
+    def usage(self, tenant_id):
+        """Consommation du jour par type"""
+        rows = self._conn().execute(
+            "SELECT kind, used FROM quota_usage WHERE tenant = ? AND day = ?", (tenant_id, self.today())
+        ).fetchall()
+        return dict(rows)
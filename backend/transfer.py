@@ -0,0 +1,258 @@
+import io
+import csv
+import json
+import uuid
+import itertools
+from card_parser import validate_card
+
+# Format: (type MIME, extension du fichier exporté)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "anki": ("text/plain", "txt")
+}
+CSV_COLUMNS = (
+    "set_id", "set_title", "set_source", "set_creation_date",
+    "card_id", "question", "answer", "difficulty", "tags",
+    "lastReviewed", "nextReview", "reviewCount"
+)
+# Champs de révision conservés tels quels à l'import (types attendus)
+REVIEW_FIELDS = {
+    "lastReviewed": (str, type(None)),
+    "nextReview": (str, type(None)),
+    "reviewCount": (int,),
+    "easeFactor": (int, float),
+    "interval": (int, float),
+    "repetitions": (int,)
+}
+ANKI_DECK_PREFIX = "BrainBoost::"
+
+
+def iter_sets(store, set_ids=None, page_size=200):
+    """
+    Jeux complets (set_id, jeu) lus un par un, page de résumés après page
+    de résumés: la base n'est jamais chargée entièrement en mémoire.
+    """
+    if set_ids:
+        for set_id in set_ids:
+            card_set = store.get_set(set_id)
+            if card_set is not None:
+                yield set_id, card_set
+        return
+    cursor = None
+    while True:
+        summaries, cursor = store.list_sets(limit=page_size, cursor=cursor)
+        for summary in summaries:
+            # Un jeu supprimé entre-temps est simplement ignoré
+            card_set = store.get_set(summary["id"])
+            if card_set is not None:
+                yield summary["id"], card_set
+        if cursor is None:
+            return
+
+
+def _csv_line(writer_buffer, writer, row):
+    writer.writerow(row)
+    line = writer_buffer.getvalue()
+    writer_buffer.seek(0)
+    writer_buffer.truncate()
+    return line
+
+
+def export_ndjson(sets):
+    """Un jeu complet (avec ses cartes) par ligne JSON"""
+    for set_id, card_set in sets:
+        yield json.dumps({"id": set_id, **card_set}, ensure_ascii=False) + "\n"
+
+
+def export_csv(sets):
+    """Une ligne par carte, précédée des informations de son jeu"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield _csv_line(buffer, writer, CSV_COLUMNS)
+    for set_id, card_set in sets:
+        for card in card_set.get("flashcards", []):
+            yield _csv_line(buffer, writer, [
+                set_id, card_set.get("title", ""), card_set.get("source", ""), card_set.get("creation_date", ""),
+                card.get("id", ""), card.get("question", ""), card.get("answer", ""),
+                card.get("difficulty", ""), ";".join(card.get("tags") or []),
+                card.get("lastReviewed") or "", card.get("nextReview") or "", card.get("reviewCount", 0)
+            ])
+
+
+def _anki_tag(text):
+    return "_".join(str(text).split())
+
+
+def export_anki(sets):
+    """
+    Fichier texte importable dans Anki (Fichier > Importer, type Basique):
+    recto, verso, paquet (un sous-paquet BrainBoost par jeu) et tags, dont
+    la difficulté.
+    """
+    yield "#separator:tab\n#html:false\n#notetype:Basic\n#deck column:3\n#tags column:4\n"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter="\t", lineterminator="\n")
+    for _, card_set in sets:
+        deck = ANKI_DECK_PREFIX + (card_set.get("title") or "Sans titre").replace("\t", " ")
+        for card in card_set.get("flashcards", []):
+            tags = [_anki_tag(tag) for tag in card.get("tags") or []]
+            if card.get("difficulty"):
+                tags.append(f"difficulte::{card['difficulty']}")
+            yield _csv_line(buffer, writer, [card.get("question", ""), card.get("answer", ""), deck, " ".join(tags)])
+
+
+EXPORTERS = {"ndjson": export_ndjson, "csv": export_csv, "anki": export_anki}
+
+
+def normalize_card(value):
+    """
+    Carte importée: question et réponse obligatoires, difficulté, tags et
+    historique de révision conservés s'ils sont valides. Retourne None pour
+    une carte inexploitable.
+    """
+    card = validate_card(value)
+    if card is None:
+        return None
+    card_id = value.get("id")
+    card["id"] = card_id if isinstance(card_id, str) and card_id else str(uuid.uuid4())
+    tags = value.get("tags")
+    if isinstance(tags, list) and all(isinstance(tag, str) for tag in tags):
+        card["tags"] = tags
+    for field, types in REVIEW_FIELDS.items():
+        if field in value and isinstance(value[field], types) and not isinstance(value[field], bool):
+            card[field] = value[field]
+    card.setdefault("lastReviewed", None)
+    card.setdefault("nextReview", None)
+    card.setdefault("reviewCount", 0)
+    return card
+
+
+def _new_set(title, source, creation_date=None):
+    return {"title": title, "source": source, "creation_date": creation_date, "flashcards": []}
+
+
+def _record(line, set_id=None, card_set=None, error=None):
+    if error is not None:
+        return {"line": line, "error": error}
+    return {"line": line, "id": set_id, "set": card_set}
+
+
+def import_ndjson(lines):
+    """Jeux d'un export NDJSON, une ligne après l'autre"""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield _record(line_number, error=f"JSON invalide: {e}")
+            continue
+        if not isinstance(data, dict) or not isinstance(data.get("flashcards"), list):
+            yield _record(line_number, error="Un jeu doit être un objet avec une liste \"flashcards\"")
+            continue
+        card_set = _new_set(
+            str(data.get("title") or "Jeu importé"), str(data.get("source") or "Import"), data.get("creation_date")
+        )
+        card_set["flashcards"] = [card for card in map(normalize_card, data["flashcards"]) if card is not None]
+        set_id = data.get("id") if isinstance(data.get("id"), str) else None
+        yield _record(line_number, set_id, card_set)
+
+
+def _grouped(rows, key, start_set):
+    """
+    Regroupe les lignes consécutives d'un même jeu (les exports sont
+    ordonnés par jeu): chaque jeu est produit dès que le suivant commence.
+    """
+    current_key = None
+    current = None
+    first_line = None
+    for line_number, row in rows:
+        row_key = key(row)
+        if current is not None and row_key != current_key:
+            yield _record(first_line, *current)
+            current = None
+        if current is None:
+            current_key, first_line = row_key, line_number
+            current = start_set(row)
+        card = normalize_card(row)
+        if card is None:
+            yield _record(line_number, error="Carte sans question ou sans réponse")
+            continue
+        current[1]["flashcards"].append(card)
+    if current is not None:
+        yield _record(first_line, *current)
+
+
+def import_csv(lines):
+    """Cartes d'un export CSV (colonnes CSV_COLUMNS; question et answer suffisent)"""
+    reader = csv.DictReader(lines)
+
+    def rows():
+        for row in reader:
+            card = {key: value for key, value in row.items() if key and value not in (None, "")}
+            if "difficulty" in card:
+                card["difficulty"] = int(card["difficulty"]) if card["difficulty"].isdigit() else None
+            if "reviewCount" in card:
+                card["reviewCount"] = int(card["reviewCount"]) if card["reviewCount"].isdigit() else 0
+            if "tags" in card:
+                card["tags"] = [tag for tag in card["tags"].split(";") if tag]
+            card["id"] = card.pop("card_id", None)
+            yield reader.line_num, card
+
+    def start_set(row):
+        set_id = row.get("set_id")
+        return set_id, _new_set(
+            row.get("set_title") or "Jeu importé", row.get("set_source") or "Import CSV", row.get("set_creation_date")
+        )
+
+    return _grouped(rows(), lambda row: (row.get("set_id"), row.get("set_title")), start_set)
+
+
+def import_anki(lines):
+    """
+    Notes d'un export texte d'Anki (recto, verso, et les colonnes paquet et
+    tags si les en-têtes #deck column / #tags column les indiquent).
+    """
+    lines = iter(lines)
+    separator, deck_column, tags_column = "\t", None, None
+    first = None
+    for line in lines:
+        if not line.startswith("#"):
+            first = line
+            break
+        name, _, value = line[1:].strip().partition(":")
+        if name == "separator":
+            separator = {"tab": "\t", "comma": ",", "semicolon": ";", "space": " ", "pipe": "|"}.get(value.lower(), value[:1] or "\t")
+        elif name == "deck column" and value.isdigit():
+            deck_column = int(value) - 1
+        elif name == "tags column" and value.isdigit():
+            tags_column = int(value) - 1
+    if first is None:
+        return iter(())
+    reader = csv.reader(itertools.chain([first], lines), delimiter=separator)
+
+    def rows():
+        for fields in reader:
+            if len(fields) < 2:
+                continue
+            card = {"question": fields[0], "answer": fields[1]}
+            deck = fields[deck_column] if deck_column is not None and deck_column < len(fields) else ""
+            tags = fields[tags_column].split() if tags_column is not None and tags_column < len(fields) else []
+            for tag in tags:
+                level = tag.rpartition("difficulte::")[2]
+                if tag.startswith("difficulte::") and level.isdigit():
+                    card["difficulty"] = int(level)
+            card["tags"] = [tag for tag in tags if not tag.startswith("difficulte::")]
+            card["deck"] = deck
+            yield reader.line_num, card
+
+    def start_set(row):
+        deck = row["deck"]
+        title = deck[len(ANKI_DECK_PREFIX):] if deck.startswith(ANKI_DECK_PREFIX) else deck
+        return None, _new_set(title or "Import Anki", "Import Anki")
+
+    return _grouped(rows(), lambda row: row["deck"], start_set)
+
+
+IMPORTERS = {"ndjson": import_ndjson, "csv": import_csv, "anki": import_anki}
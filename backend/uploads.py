@@ -0,0 +1,86 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+
+
+def spool_stream(stream, directory, max_memory=4 * 1024 * 1024, block_size=1024 * 1024):
+    """
+    Copie un flux binaire dans un SpooledTemporaryFile en calculant son SHA-256
+    au passage. Le contenu reste en mémoire jusqu'à `max_memory` octets, puis
+    bascule dans un fichier temporaire anonyme de `directory`, supprimé par le
+    système dès sa fermeture (y compris en cas d'arrêt brutal du processus).
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory, dir=directory)
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(block_size), b''):
+        digest.update(block)
+        spooled.write(block)
+    spooled.seek(0)
+    return spooled, digest.hexdigest()
+
+
+def spool_upload(file_storage, directory, max_memory=4 * 1024 * 1024, block_size=1024 * 1024):
+    """Tampon d'un fichier reçu (FileStorage de Flask) et son SHA-256, voir spool_stream"""
+    return spool_stream(file_storage.stream, directory, max_memory, block_size)
+
+
+def write_temp_copy(stream, directory, suffix=""):
+    """Écrit le flux dans un fichier temporaire unique de `directory` et retourne son chemin"""
+    stream.seek(0)
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(stream, f)
+    except Exception:
+        os.remove(path)
+        raise
+    stream.seek(0)
+    return path
+
+
+class BlobStore:
+    """
+    Répertoire de fichiers adressés par contenu: data/blobs/ab/abcdef...
+    Un même fichier envoyé plusieurs fois n'est stocké qu'une seule fois.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path_for(self, file_hash):
+        return os.path.join(self.directory, file_hash[:2], file_hash)
+
+    def put(self, stream, file_hash):
+        """Enregistre le flux s'il n'existe pas encore et retourne son chemin"""
+        path = self.path_for(file_hash)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = write_temp_copy(stream, os.path.dirname(path))
+        # Renommage atomique: deux envois simultanés du même fichier ne se gênent pas
+        os.replace(tmp_path, path)
+        return path
+
+
+def sweep_orphan_uploads(directory, keep_paths, min_age=3600):
+    """
+    Supprime les fichiers temporaires de `directory` qui ne sont plus
+    référencés par une tâche (laissés par un processus arrêté brutalement).
+    Les fichiers récents sont conservés: leur tâche est peut-être en cours de création.
+    """
+    keep = {os.path.abspath(path) for path in keep_paths}
+    removed = 0
+    now = time.time()
+    for entry in os.scandir(directory):
+        if not entry.is_file() or os.path.abspath(entry.path) in keep:
+            continue
+        if now - entry.stat().st_mtime < min_age:
+            continue
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
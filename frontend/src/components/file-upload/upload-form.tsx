@@ -21,6 +21,14 @@ type Flashcard = {
   nextReview: string | null;
 };
 
+type GenerationJob = {
+  id: string;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  progress: { done: number; total: number };
+  result: { flashcards: Flashcard[] } | null;
+  error: string | null;
+};
+
 type UploadError = {
   response?: {
     data?: {
@@ -30,6 +38,22 @@ type UploadError = {
   message: string;
 };
 
+// Give up on a generation job that has not finished after this delay
+const JOB_TIMEOUT_MS = 15 * 60 * 1000;
+
+// Poll a background generation job until it finishes (or the deadline passes)
+const waitForJob = async (jobId: string, timeoutMs = JOB_TIMEOUT_MS): Promise<GenerationJob> => {
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const response = await axios.get<GenerationJob>(`${API_URL}/jobs/${jobId}`);
+    if (response.data.status === 'done' || response.data.status === 'failed') {
+      return response.data;
+    }
+    await new Promise(resolve => setTimeout(resolve, 1000));
+  }
+  throw new Error('Generation is taking too long, please try again later.');
+};
+
 export function FileUploadForm() {
   const [file, setFile] = useState<File | null>(null);
   const [isUploading, setIsUploading] = useState(false);
@@ -64,7 +88,17 @@ export function FileUploadForm() {
         },
       });
 
-      setFlashcards(response.data.flashcards.map((fc: Flashcard) => ({
+      // The backend answers 202 with a job id and generates the cards in the background
+      let result = response.data;
+      if (response.status === 202) {
+        const job = await waitForJob(response.data.job_id);
+        if (job.status === 'failed' || !job.result) {
+          throw new Error(job.error || 'Generation failed.');
+        }
+        result = job.result;
+      }
+
+      setFlashcards(result.flashcards.map((fc: Flashcard) => ({
         ...fc,
         tags: fc.tags ?? [],
       })));
@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from storage import open_store
+
+
+def make_set(title, questions):
+    """Jeu de test: une carte c<i> par question"""
+    return {
+        "title": title,
+        "source": "test",
+        "creation_date": "2024-01-01T00:00:00",
+        "flashcards": [{"id": f"c{i}", "question": q, "answer": "r"} for i, q in enumerate(questions)]
+    }
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+    """Magasin vide de chaque moteur: les tests de comportement tournent sur les deux"""
+    store = open_store(request.param, str(tmp_path))
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """
+    Module app.py importé une fois pour la session, sans clé Gemini et avec
+    des données et des fichiers reçus dans un dossier temporaire.
+    """
+    work_dir = tmp_path_factory.mktemp("backend")
+    os.environ["FLASHCARDS_DATA_DIR"] = str(work_dir / "data")
+    os.environ["GEMINI_API_KEY"] = ""
+    os.environ.pop("GEMINI_API_ENDPOINT", None)
+    previous = os.getcwd()
+    # UPLOAD_FOLDER est relatif au dossier courant
+    os.chdir(work_dir)
+    import app
+    yield app
+    os.chdir(previous)
+
+
+@pytest.fixture
+def fake_gemini(app_module, monkeypatch):
+    """
+    Gemini disponible, remplacé par un générateur local: un morceau qui
+    contient "ÉCHEC" lève une erreur, les autres produisent des cartes.
+    """
+    from gemini_health import GeminiHealthMonitor
+    monitor = GeminiHealthMonitor(lambda: "ok")
+    monitor.start = lambda: None
+    monkeypatch.setattr(app_module, "GEMINI_HEALTH", monitor)
+    monkeypatch.setattr(app_module, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(app_module, "GENERATION_CHUNK_SIZE", 300)
+
+    def fake_chunk(chunk, num_cards):
+        if "ÉCHEC" in chunk:
+            raise RuntimeError("réponse invalide")
+        topic = chunk.split()[0]
+        return [{"question": f"Que sait-on de {topic} {i} ?", "answer": chunk[:40]} for i in range(num_cards)]
+
+    monkeypatch.setattr(app_module, "generate_cards_for_chunk", fake_chunk)
+    return app_module
+
+
+def chunked_text(topics):
+    """Un paragraphe par sujet, assez long pour former un morceau par sujet"""
+    return "\n\n".join(f"{topic} " + "phrase de contenu assez longue. " * 8 for topic in topics)
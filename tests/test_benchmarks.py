@@ -0,0 +1,48 @@
+import pytest
+
+from benchmarks.harness import percentile, summarize, measure, compare
+from benchmarks.synthetic import make_pdf, make_text, make_sets
+from storage import check_card_ids
+
+
+def test_percentiles_and_summary():
+    samples = [i / 1000 for i in range(1, 101)]
+    assert percentile(sorted(samples), 0.5) == 0.05
+    assert percentile(sorted(samples), 0.99) == 0.099
+    assert percentile([], 0.5) is None
+    summary = summarize(samples, items=2)
+    assert summary["runs"] == 100
+    assert summary["p95_ms"] == 95.0
+    assert summary["throughput_per_s"] == pytest.approx(2 * 100 / sum(samples), rel=0.01)
+
+
+def test_measure_runs_warmup_then_repeats():
+    calls = []
+    result = measure(lambda: calls.append(1), repeat=3, warmup=2)
+    assert len(calls) == 5
+    assert result["runs"] == 3
+
+
+def test_compare_flags_regressions():
+    baseline = {"benchmarks": {"a": {"p50_ms": 10.0}, "b": {"p50_ms": 10.0}}}
+    current = {"benchmarks": {"a": {"p50_ms": 10.5}, "b": {"p50_ms": 12.0}, "c": {"p50_ms": 1.0}}}
+    lines, regressions = compare(baseline, current, tolerance=0.10)
+    assert regressions == ["b"]
+    assert any(line.startswith("c: nouveau") for line in lines)
+
+
+def test_synthetic_data_is_deterministic():
+    assert make_text(20, seed=3) == make_text(20, seed=3)
+    db = make_sets(3, cards_per_set=4)
+    assert db == make_sets(3, cards_per_set=4)
+    for card_set in db.values():
+        check_card_ids(card_set["flashcards"])
+
+
+def test_synthetic_pdf_is_readable(tmp_path):
+    pypdf = pytest.importorskip("pypdf")
+    path = tmp_path / "synthetique.pdf"
+    path.write_bytes(make_pdf(3, lines=2))
+    reader = pypdf.PdfReader(str(path))
+    assert len(reader.pages) == 3
+    assert "page 2 ligne 1" in reader.pages[2].extract_text()
@@ -0,0 +1,82 @@
+import sqlite3
+
+from cache import DiskCache
+from chunking import TextStream
+from pdf_extraction import FAILED_PAGE
+from conftest import chunked_text
+
+
+def test_total_size_follows_writes(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.db"), "test_cache")
+    cache.set("a", "x" * 10)
+    cache.set("b", "y" * 20)
+    cache.set("a", "z" * 30)
+    cache._conn().execute("DELETE FROM test_cache WHERE key = 'b'")
+    assert cache.total_size() == len('"' + "z" * 30 + '"')
+    assert cache.stats()["bytes"] == cache.total_size()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.db"), "test_cache", max_bytes=250)
+    for key in "abc":
+        cache.set(key, "x" * 100)
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert cache.total_size() <= 250
+
+
+def test_total_is_initialized_from_an_existing_table(tmp_path):
+    path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE test_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+        "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO test_cache VALUES ('a', '\"x\"', 3, strftime('%s','now'), strftime('%s','now'))")
+    conn.commit()
+    conn.close()
+    assert DiskCache(path, "test_cache").total_size() == 3
+
+
+def test_failed_or_empty_extraction_is_not_cacheable(app_module):
+    stream = TextStream(["Page lisible", FAILED_PAGE])
+    assert not app_module.is_complete_extraction(stream, stream.text())
+    empty = TextStream([""])
+    assert not app_module.is_complete_extraction(empty, empty.text())
+    complete = TextStream(["Page lisible"])
+    assert app_module.is_complete_extraction(complete, complete.text())
+
+
+def test_text_cache_key_depends_on_ocr(app_module, monkeypatch):
+    without_ocr = app_module.text_cache_key("abc")
+    monkeypatch.setattr(app_module, "ocr_available", lambda: True)
+    assert app_module.text_cache_key("abc") != without_ocr
+
+
+def test_partial_generation_is_not_cached(fake_gemini):
+    app_module = fake_gemini
+    text = chunked_text(["cache-partiel-a", "ÉCHEC", "cache-partiel-b"])
+    cards, complete = app_module.generate_flashcards_with_status(text, 6)
+    assert cards and not complete
+    app_module.generate_flashcards_cached(text, 6, "default")
+    assert app_module.get_cached_flashcards(text, 6, "default") is None
+
+
+def test_complete_generation_is_cached(fake_gemini):
+    app_module = fake_gemini
+    text = chunked_text(["cache-complet-a", "cache-complet-b"])
+    cards = app_module.generate_flashcards_cached(text, 4, "default")
+    assert [card["question"] for card in app_module.get_cached_flashcards(text, 4, "default")] == \
+        [card["question"] for card in cards]
+
+
+def test_cards_cache_is_per_tenant_with_library_dedup(fake_gemini, monkeypatch):
+    """Cartes filtrées par la bibliothèque d'un locataire: jamais servies à un autre"""
+    app_module = fake_gemini
+    monkeypatch.setattr(app_module, "DEDUP_AGAINST_LIBRARY", True)
+    text = chunked_text(["bibliotheque-a", "bibliotheque-b"])
+    app_module.generate_flashcards_cached(text, 4, "acme", library=app_module.TENANTS.get("acme"))
+    assert app_module.get_cached_flashcards(text, 4, "acme") is not None
+    assert app_module.get_cached_flashcards(text, 4, "globex") is None
+    monkeypatch.setattr(app_module, "DEDUP_AGAINST_LIBRARY", False)
+    assert app_module.flashcards_cache_key(text, 4, "acme") == app_module.flashcards_cache_key(text, 4, "globex")
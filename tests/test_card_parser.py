@@ -0,0 +1,51 @@
+import json
+
+from card_parser import CardStreamParser, parse_flashcards, validate_card
+
+
+def test_validate_card_cleans_or_rejects():
+    assert validate_card({"question": " Q ? ", "answer": " R ", "difficulty": 3, "extra": 1}) == \
+        {"question": "Q ?", "answer": "R", "difficulty": 3}
+    # Difficulté invalide retirée, la carte est gardée
+    assert validate_card({"question": "Q", "answer": "R", "difficulty": 9}) == {"question": "Q", "answer": "R"}
+    assert validate_card({"question": "Q", "answer": "R", "difficulty": True}) == {"question": "Q", "answer": "R"}
+    for value in ({"question": "Q"}, {"question": " ", "answer": "R"}, {"question": 1, "answer": "R"}, ["Q", "R"]):
+        assert validate_card(value) is None
+
+
+def test_text_around_the_array_is_ignored():
+    text = 'Voici les cartes [en JSON] :\n```json\n[{"question": "Q1", "answer": "R1"}]\n```\nBonne révision !'
+    assert parse_flashcards(text) == [{"question": "Q1", "answer": "R1"}]
+
+
+def test_no_array_gives_none():
+    assert parse_flashcards("Je ne peux pas répondre.") is None
+    assert parse_flashcards("[]") == []
+
+
+def test_invalid_objects_are_dropped_without_losing_the_others():
+    text = '[{"question": "Q1", "answer": "R1"}, {"question": "Q2"}, [1, 2], {"question": "Q3", "answer": "R3"}]'
+    parser = CardStreamParser()
+    assert [card["question"] for card in parser.feed(text)] == ["Q1", "Q3"]
+    assert parser.dropped == 2
+    assert parser.finished
+
+
+def test_truncated_response_keeps_complete_cards():
+    text = '[{"question": "Q1", "answer": "R1"}, {"question": "Q2", "ans'
+    assert parse_flashcards(text) == [{"question": "Q1", "answer": "R1"}]
+
+
+def test_strings_with_brackets_and_escapes():
+    cards = [{"question": 'Que vaut "}]" en JSON ?', "answer": "Un texte {avec} [crochets] \\ et é"}]
+    assert parse_flashcards(json.dumps(cards)) == cards
+
+
+def test_chunks_give_the_same_cards_as_the_whole_text():
+    text = json.dumps([{"question": f"Q{i}", "answer": f"R{i} \"citée\""} for i in range(5)])
+    parser = CardStreamParser()
+    cards = []
+    for i in range(0, len(text), 7):
+        cards.extend(parser.feed(text[i:i + 7]))
+    assert cards == parse_flashcards(text)
+    assert len(cards) == 5
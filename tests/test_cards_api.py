@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import make_set
+
+HEADERS = {"X-Tenant-ID": "cartes"}
+
+
+@pytest.fixture
+def client(app_module):
+    store = app_module.TENANTS.get("cartes")
+    store.create_set("jeu", make_set("Jeu", ["q0", "q1"]))
+    store.update_card("jeu", "c0", {"difficulty": 2, "tags": ["bio"]})
+    return app_module.app.test_client()
+
+
+def card(client, card_id):
+    cards = client.get("/api/flashcards/jeu", headers=HEADERS).get_json()["flashcards"]
+    return next(c for c in cards if c["id"] == card_id)
+
+
+def test_patch_only_changes_given_fields(client):
+    response = client.patch("/api/flashcards/jeu/cards/c0", json={"answer": "nouvelle"}, headers=HEADERS)
+    assert response.status_code == 200
+    assert card(client, "c0")["answer"] == "nouvelle"
+    assert card(client, "c0")["tags"] == ["bio"]
+
+
+def test_patch_rejects_invalid_fields(client):
+    for body in ({"inconnu": 1}, {"difficulty": 9}, {"difficulty": True}, {"question": " "}, {"id": "autre"}):
+        assert client.patch("/api/flashcards/jeu/cards/c0", json=body, headers=HEADERS).status_code == 400
+    assert card(client, "c0")["difficulty"] == 2
+
+
+def test_put_ignores_unknown_fields(client):
+    response = client.put("/api/flashcards/jeu/cards/c1", json={
+        "id": "c1", "question": "q1", "answer": "complète", "affichage": "éditeur"
+    }, headers=HEADERS)
+    assert response.status_code == 200
+    assert "affichage" not in card(client, "c1")
+
+
+def test_missing_card_or_set(client):
+    assert client.patch("/api/flashcards/jeu/cards/absente", json={"answer": "x"}, headers=HEADERS).status_code == 404
+    assert client.patch("/api/flashcards/absent/cards/c0", json={"answer": "x"}, headers=HEADERS).status_code == 404
+
+
+def test_batch_update_is_all_or_nothing(client):
+    response = client.post("/api/flashcards/jeu/cards/batch", json={"updates": [
+        {"id": "c0", "reviewCount": 1},
+        {"id": "absente", "reviewCount": 1}
+    ]}, headers=HEADERS)
+    assert response.status_code == 404
+    assert response.get_json()["missing"] == ["absente"]
+    assert card(client, "c0").get("reviewCount", 0) == 0
+
+    response = client.post("/api/flashcards/jeu/cards/batch", json={"updates": [
+        {"id": "c0", "reviewCount": 1},
+        {"id": "c1", "reviewCount": 2},
+        {"id": "c0", "lastReviewed": "2024-01-01T00:00:00"}
+    ]}, headers=HEADERS)
+    assert response.status_code == 200
+    assert card(client, "c0")["reviewCount"] == 1
+    assert card(client, "c0")["lastReviewed"] == "2024-01-01T00:00:00"
+    assert card(client, "c1")["reviewCount"] == 2
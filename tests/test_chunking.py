@@ -0,0 +1,55 @@
+from chunking import (
+    PAGE_BREAK, TextStream, split_text_into_chunks, iter_text_chunks, plan_streamed_chunks,
+    select_chunks, cards_per_chunk, merge_chunk_results
+)
+
+
+def test_long_text_is_fully_covered():
+    """Plus de troncature à 4000 caractères: tout le texte se retrouve dans les morceaux"""
+    paragraphs = [f"Paragraphe {i}. " + "contenu " * 60 for i in range(40)]
+    chunks = split_text_into_chunks("\n\n".join(paragraphs), max_chars=1000)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 1000 for chunk in chunks)
+    assert "\n\n".join(chunks) == "\n\n".join(p.strip() for p in paragraphs)
+
+
+def test_oversized_paragraph_is_split_on_sentences():
+    sentence = "Une phrase assez longue pour le test. "
+    chunks = split_text_into_chunks(sentence * 50, max_chars=200)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_pages_are_chunk_boundaries():
+    chunks = list(iter_text_chunks([("a" * 60) + PAGE_BREAK + ("b" * 60)], max_chars=100))
+    assert chunks == ["a" * 60, "b" * 60]
+
+
+def test_text_stream_keeps_pages():
+    stream = TextStream(["page 1", "", "page 2"], page_count=3)
+    assert list(stream) == ["page 1", "", "page 2"]
+    assert stream.text() == "page 1\n" + PAGE_BREAK + "page 2\n" + PAGE_BREAK
+
+
+def test_streamed_plan_covers_the_document():
+    pages = ["contenu de la page. " * 40 for _ in range(10)]
+    planned = list(plan_streamed_chunks(TextStream(pages, 10), num_cards=10, max_chars=1000, max_chunks=0))
+    assert sum(len(chunk) for chunk, _ in planned) >= sum(len(page.strip()) for page in pages)
+    assert all(n >= 1 for _, n in planned)
+
+
+def test_select_and_share_cards_between_chunks():
+    chunks = [str(i) * (100 if i % 2 else 300) for i in range(10)]
+    assert select_chunks(chunks, 5) == [chunks[0], chunks[2], chunks[4], chunks[6], chunks[8]]
+    shares = cards_per_chunk(chunks[:2], num_cards=8)
+    assert shares[0] > shares[1]
+
+
+def test_merge_deduplicates_and_alternates_between_chunks():
+    results = [
+        [{"question": "Qu'est-ce que l'ADN ?", "answer": "a"}, {"question": "Rôle du ribosome ?", "answer": "b"}],
+        None,
+        [{"question": "qu'est ce que l'adn", "answer": "doublon"}, {"question": "Rôle de la mitochondrie ?", "answer": "c"}]
+    ]
+    merged = merge_chunk_results(results, 3)
+    assert [card["answer"] for card in merged] == ["a", "c", "b"]
@@ -0,0 +1,39 @@
+from difficulty import (
+    LexicalDifficultyModel, estimate_difficulties, estimate_difficulty, load_model, score_cards,
+    synthetic_corpus, _legacy_estimate
+)
+
+
+def test_batch_matches_the_previous_implementation():
+    pairs = synthetic_corpus(2000, seed=1)
+    assert estimate_difficulties(pairs) == [_legacy_estimate(q, a) for q, a in pairs]
+
+
+def test_scale_of_the_heuristic():
+    assert estimate_difficulty("Capitale de la France ?", "Paris") == 1
+    # Réponse longue, nombre et acronyme: plafonnée à 5
+    assert estimate_difficulty("Que fait l'ADN ?", "mot " * 20 + "depuis 1953") == 5
+    # Pas de correspondance à cheval sur la question et la réponse
+    assert estimate_difficulty("Sigle A", "B") == 1
+
+
+def test_lexical_model_round_trip(tmp_path):
+    pairs = synthetic_corpus(300, seed=2)
+    labels = estimate_difficulties(pairs)
+    model = LexicalDifficultyModel.fit(pairs, labels)
+    predictions = model.predict(pairs)
+    assert all(1 <= score <= 5 for score in predictions)
+    assert sum(p == l for p, l in zip(predictions, labels)) / len(labels) > 0.5
+
+    path = str(tmp_path / "modele.json")
+    model.save(path)
+    assert score_cards(pairs, load_model(path)) == predictions
+
+
+def test_unusable_model_falls_back_to_the_heuristic(tmp_path):
+    path = tmp_path / "modele.json"
+    path.write_text("{}", encoding="utf-8")
+    assert load_model(str(path)) is None
+    assert load_model("") is None
+    pairs = [("Q ?", "R")]
+    assert score_cards(pairs, None) == estimate_difficulties(pairs)
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import difficulty
+from storage import open_store
+from tenants import TenantStores
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("FLASHCARDS_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("FLASHCARDS_STORAGE", "sqlite")
+    default = open_store("sqlite", str(tmp_path))
+    tenants = TenantStores("sqlite", str(tmp_path), default)
+    for store in (default, tenants.get("acme"), tenants.get("globex")):
+        store.create_set("s1", {
+            "title": "Jeu",
+            "source": "test",
+            "creation_date": "2024-01-01T00:00:00",
+            "flashcards": [{"id": "c1", "question": "Quelle est la capitale ?", "answer": "Paris", "difficulty": 5}]
+        })
+        store.close()
+    return tmp_path
+
+
+def difficulty_of(data_dir, tenant=None):
+    folder = str(data_dir) if tenant is None else os.path.join(str(data_dir), "tenants", tenant)
+    store = open_store("sqlite", folder)
+    try:
+        return store.get_card("s1", "c1")["difficulty"]
+    finally:
+        store.close()
+
+
+def test_rescore_defaults_to_the_default_tenant(data_dir):
+    assert difficulty.main(["rescore"]) == 0
+    assert difficulty_of(data_dir) != 5
+    assert difficulty_of(data_dir, "acme") == 5
+
+
+def test_rescore_selected_tenant(data_dir):
+    assert difficulty.main(["rescore", "--tenant", "acme"]) == 0
+    assert difficulty_of(data_dir, "acme") != 5
+    assert difficulty_of(data_dir) == 5
+    assert difficulty_of(data_dir, "globex") == 5
+
+
+def test_rescore_all_tenants(data_dir, capsys):
+    assert difficulty.main(["rescore", "--all-tenants", "--dry-run"]) == 0
+    assert "3 carte(s) à modifier" in capsys.readouterr().out
+    assert difficulty.main(["rescore", "--all-tenants"]) == 0
+    assert all(difficulty_of(data_dir, tenant) != 5 for tenant in (None, "acme", "globex"))
+
+
+def test_unknown_tenant_is_rejected(data_dir):
+    with pytest.raises(SystemExit):
+        difficulty.main(["rescore", "--tenant", "inconnu"])
+    assert not os.path.exists(os.path.join(str(data_dir), "tenants", "inconnu"))
+
+
+def test_fit_on_a_tenant(data_dir, tmp_path):
+    output = str(tmp_path / "modele.json")
+    assert difficulty.main(["fit", "--tenant", "acme", "--output", output]) == 0
+    assert os.path.exists(output)
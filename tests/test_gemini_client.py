@@ -0,0 +1,101 @@
+import time
+import types
+import asyncio
+import threading
+
+import pytest
+
+from gemini_client import GeminiClient, TokenBucket, is_retryable
+
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def fake_sdk(respond):
+    """Module google.generativeai réduit à GenerativeModel, qui répond avec `respond(prompt)`"""
+    class Model:
+        def __init__(self, model_name, generation_config=None):
+            self.model_name = model_name
+
+        async def generate_content_async(self, prompt, request_options=None):
+            return types.SimpleNamespace(text=await respond(prompt))
+
+    return lambda: types.SimpleNamespace(GenerativeModel=Model)
+
+
+def test_retryable_errors():
+    assert is_retryable(ApiError(429))
+    assert is_retryable(ApiError(503))
+    assert is_retryable(asyncio.TimeoutError())
+    assert not is_retryable(ApiError(400))
+    assert not is_retryable(ValueError("réponse invalide"))
+
+
+def test_token_bucket_limits_the_rate():
+    async def acquire_all():
+        bucket = TokenBucket(rate=20, burst=2)
+        start = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # Deux jetons disponibles d'emblée, puis un jeton toutes les 50 ms
+    assert asyncio.run(acquire_all()) >= 0.09
+
+
+def test_transient_errors_are_retried():
+    failures = [ApiError(429), ApiError(503)]
+
+    async def respond(prompt):
+        if failures:
+            raise failures.pop(0)
+        return f"réponse à {prompt}"
+
+    client = GeminiClient("modele", backoff_base=0.01, sdk=fake_sdk(respond))
+    assert client.generate("bonjour") == "réponse à bonjour"
+    assert client.stats()["calls"] == 3
+    assert client.stats()["retries"] == 2
+
+
+def test_permanent_errors_are_not_retried():
+    async def respond(prompt):
+        raise ApiError(400)
+
+    client = GeminiClient("modele", backoff_base=0.01, sdk=fake_sdk(respond))
+    with pytest.raises(ApiError):
+        client.generate("bonjour")
+    assert client.stats()["calls"] == 1
+
+
+def test_identical_prompts_in_flight_share_one_call():
+    async def respond(prompt):
+        await asyncio.sleep(0.2)
+        return prompt.upper()
+
+    client = GeminiClient("modele", sdk=fake_sdk(respond))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.generate("même prompt"))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["MÊME PROMPT"] * 3
+    assert client.stats()["calls"] == 1
+    assert client.stats()["coalesced"] == 2
+
+
+def test_sdk_is_loaded_on_first_call():
+    loaded = []
+
+    async def respond(prompt):
+        return "ok"
+
+    sdk = fake_sdk(respond)
+    client = GeminiClient("modele", sdk=lambda: loaded.append(True) or sdk())
+    assert loaded == []
+    client.generate("bonjour")
+    client.generate("encore")
+    assert loaded == [True]
@@ -0,0 +1,70 @@
+import threading
+
+from gemini_health import GeminiHealthMonitor
+
+
+def make_monitor(**options):
+    monitor = GeminiHealthMonitor(lambda: "ok", failure_threshold=1, cooldown=0, **options)
+    # Pas de thread de vérification: les tests pilotent eux-mêmes le disjoncteur
+    monitor.start = lambda: None
+    return monitor
+
+
+def test_half_open_allows_a_single_trial():
+    monitor = make_monitor()
+    monitor.record_failure(0.1, "erreur")
+    assert monitor.is_available()
+    assert monitor.state == GeminiHealthMonitor.HALF_OPEN
+    assert not monitor.is_available()
+
+
+def test_trial_success_closes_the_circuit():
+    monitor = make_monitor()
+    monitor.record_failure(0.1, "erreur")
+    assert monitor.is_available()
+    monitor.record_success(0.1)
+    assert monitor.state == GeminiHealthMonitor.CLOSED
+    assert monitor.is_available()
+
+
+def test_released_trial_lets_the_next_request_try():
+    monitor = make_monitor()
+    monitor.record_failure(0.1, "erreur")
+    assert monitor.is_available()
+    # La requête n'a finalement pas appelé Gemini (texte vide, cache...)
+    monitor.release_trial()
+    assert monitor.is_available()
+
+
+def test_trial_can_only_be_released_by_its_owner():
+    monitor = make_monitor()
+    monitor.record_failure(0.1, "erreur")
+    assert monitor.is_available()
+    other = threading.Thread(target=monitor.release_trial)
+    other.start()
+    other.join()
+    assert not monitor.is_available()
+
+
+def test_abandoned_trial_expires():
+    monitor = make_monitor(trial_timeout=0)
+    monitor.record_failure(0.1, "erreur")
+    assert monitor.is_available()
+    assert monitor.is_available()
+
+
+def test_status_is_pending_before_the_first_check():
+    monitor = make_monitor()
+    assert monitor.snapshot()["pending"]
+    monitor.record_success(0.1)
+    assert not monitor.snapshot()["pending"]
+
+
+def test_generation_without_gemini_call_releases_the_trial(app_module, monkeypatch):
+    monitor = make_monitor()
+    monitor.record_failure(0.1, "erreur")
+    monkeypatch.setattr(app_module, "GEMINI_HEALTH", monitor)
+    monkeypatch.setattr(app_module, "GEMINI_API_KEY", "test")
+    # Texte vide: aucun morceau, donc aucun appel à Gemini
+    app_module.generate_flashcards_from_text("", 3)
+    assert monitor.is_available()
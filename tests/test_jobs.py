@@ -0,0 +1,154 @@
+import time
+
+from jobs import JobRunner, new_job, DONE, FAILED, QUEUED, RUNNING
+from conftest import chunked_text
+
+
+def wait_finished(store, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get_job(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Tâche {job_id} non terminée")
+
+
+def make_runner(store, handler=None, **options):
+    handler = handler or (lambda job, report: {"ok": True})
+    # Maintenance périodique désactivée: les tests appellent resume_pending eux-mêmes
+    return JobRunner(store, {"test": handler}, heartbeat_interval=3600, **options)
+
+
+def create_job(store, status, age):
+    job = new_job("test", {"text": "texte"})
+    job.update(status=status, updated_at=time.time() - age)
+    store.create_job(job)
+    # create_job conserve l'horodatage: la tâche paraît inactive depuis `age` secondes
+    return job["id"]
+
+
+def test_report_ignores_failed_chunks(store):
+    def handler(job, report):
+        report(1, 3, [{"question": "q1"}])
+        report(2, 3, None)
+        report(3, 3, [{"question": "q3"}])
+        return {"ok": True}
+
+    job = make_runner(store, handler).run_inline("test", {})
+    assert job["status"] == DONE
+    assert [card["question"] for card in job["cards"]] == ["q1", "q3"]
+
+
+def test_interrupted_running_job_is_resumed(store):
+    job_id = create_job(store, RUNNING, age=600)
+    runner = make_runner(store, stale_after=60)
+    assert runner.resume_pending() == 1
+    job = wait_finished(store, job_id)
+    assert job["status"] == DONE
+    assert job["attempts"] == 1
+    # Le texte source n'est pas conservé avec la tâche terminée
+    assert "text" not in job["params"]
+
+
+def test_active_job_is_not_resumed(store):
+    create_job(store, RUNNING, age=5)
+    assert make_runner(store, stale_after=60).resume_pending() == 0
+
+
+def test_stale_job_is_requeued_by_a_single_runner(store):
+    job_id = create_job(store, RUNNING, age=600)
+    stale_before = time.time() - 60
+    assert store.requeue_stale_job(job_id, stale_before)["status"] == QUEUED
+    assert store.requeue_stale_job(job_id, stale_before) is None
+
+
+def test_heartbeat_keeps_a_running_job_fresh(store):
+    job_id = create_job(store, RUNNING, age=600)
+    store.touch_job(job_id)
+    assert store.requeue_stale_job(job_id, time.time() - 60) is None
+
+
+def test_job_interrupted_too_many_times_fails(store):
+    job_id = create_job(store, RUNNING, age=600)
+    store.update_job(job_id, {"attempts": 3})
+    # update_job a rafraîchi l'horodatage: seuil de péremption dans le futur
+    runner = make_runner(store, stale_after=-60, max_attempts=3)
+    assert runner.resume_pending() == 1
+    job = wait_finished(store, job_id)
+    assert job["status"] == FAILED
+
+
+def test_finished_jobs_are_pruned(store):
+    old = create_job(store, DONE, age=3600)
+    recent = create_job(store, DONE, age=10)
+    running = create_job(store, RUNNING, age=3600)
+    assert store.delete_finished_jobs(time.time() - 600) == 1
+    assert store.get_job(old) is None
+    assert store.get_job(recent) is not None
+    assert store.get_job(running) is not None
+
+
+def test_failed_chunk_keeps_the_other_chunks(fake_gemini):
+    """Un morceau en échec est ignoré: la tâche garde les cartes des autres morceaux"""
+    app_module = fake_gemini
+    errors_before = app_module.FALLBACK_GENERATIONS.value(reason="error")
+    text = chunked_text(["photosynthese", "ÉCHEC", "mitochondrie"])
+
+    job = app_module.JOBS.run_inline("text", {
+        "text": text, "num_cards": 6, "title": "Essai", "gemini_status": {}, "tenant": "default"
+    })
+
+    assert job["status"] == DONE
+    assert job["progress"] == {"done": 3, "total": 3}
+    questions = [card["question"] for card in job["result"]["flashcards"]]
+    assert questions and not app_module.is_default_flashcards(job["result"]["flashcards"])
+    assert not any("ÉCHEC" in question for question in questions)
+    assert app_module.FALLBACK_GENERATIONS.value(reason="error") == errors_before
+
+
+def test_maintenance_thread_sends_heartbeats(store):
+    started = time.time()
+
+    def slow_handler(job, report):
+        time.sleep(0.5)
+        return {"ok": True}
+
+    runner = JobRunner(store, {"test": slow_handler}, heartbeat_interval=0.1)
+    job_id = runner.submit("test", {})["id"]
+    time.sleep(0.3)
+    job = store.get_job(job_id)
+    assert job["status"] == RUNNING
+    assert job["updated_at"] > started + 0.1
+    assert wait_finished(store, job_id)["status"] == DONE
+
+
+def test_resumed_job_does_not_duplicate_cards(store):
+    """Une tâche interrompue à mi-parcours repart de zéro: pas de cartes en double"""
+    def handler(job, report):
+        report(1, 2, [{"question": "q1"}])
+        report(2, 2, [{"question": "q2"}])
+        return {"ok": True}
+
+    job_id = create_job(store, RUNNING, age=600)
+    store.update_job(job_id, {"cards": [{"question": "q1"}], "progress": {"done": 1, "total": 2}})
+    runner = make_runner(store, handler, stale_after=-60)
+    assert runner.resume_pending() == 1
+    job = wait_finished(store, job_id)
+    assert [card["question"] for card in job["cards"]] == ["q1", "q2"]
+    assert job["progress"] == {"done": 2, "total": 2}
+
+
+def test_event_stream_ends_when_the_job_is_deleted(app_module, monkeypatch):
+    job = new_job("text", {"tenant": "default"})
+    job["status"] = RUNNING
+    app_module.STORE.create_job(job)
+    monkeypatch.setattr(app_module, "JOB_EVENTS_POLL_INTERVAL", 0.01)
+    response = app_module.app.test_client().get(f"/api/jobs/{job['id']}/events", buffered=False)
+    chunks = iter(response.response)
+    assert b"event: progress" in next(chunks)
+    # Suppression par la rétention des tâches terminées pendant la diffusion
+    app_module.STORE.update_job(job["id"], {"status": DONE})
+    app_module.STORE.delete_finished_jobs(time.time() + 1)
+    rest = b"".join(chunks)
+    assert b"event: error" in rest
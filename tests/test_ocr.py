@@ -0,0 +1,26 @@
+import sys
+import time
+import threading
+import types
+
+from ocr import OcrEngine
+
+
+def test_availability_is_probed_once_across_threads(monkeypatch):
+    calls = []
+
+    def slow_version():
+        calls.append(threading.current_thread().name)
+        time.sleep(0.1)
+        raise OSError("tesseract absent")
+
+    monkeypatch.setitem(sys.modules, "pytesseract", types.SimpleNamespace(get_tesseract_version=slow_version))
+    engine = OcrEngine(workers=1)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(engine.available())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [False] * 8
+    assert len(calls) == 1
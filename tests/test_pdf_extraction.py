@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+from pdf_extraction import PdfExtractor, FailedPage
+
+pypdf = pytest.importorskip("pypdf")
+
+
+@pytest.fixture
+def small_pdf(tmp_path):
+    writer = pypdf.PdfWriter()
+    for _ in range(3):
+        writer.add_blank_page(width=200, height=200)
+    path = tmp_path / "petit.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def run_in_thread(target):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=target()))
+    thread.start()
+    thread.join(timeout=120)
+    return result["value"]
+
+
+def test_small_pdf_is_extracted_in_process_on_the_main_thread(small_pdf, monkeypatch):
+    extractor = PdfExtractor(workers=2)
+    monkeypatch.setattr(extractor, "_iter_pages_in_pool", pytest.fail)
+    assert list(extractor.iter_pages(small_pdf)) == ["", "", ""]
+
+
+def test_small_pdf_goes_through_the_pool_off_the_main_thread(small_pdf, monkeypatch):
+    extractor = PdfExtractor(workers=1)
+    calls = []
+
+    def in_pool(file_path, page_count):
+        calls.append(page_count)
+        yield from [""] * page_count
+
+    monkeypatch.setattr(extractor, "_iter_pages_in_pool", in_pool)
+    assert run_in_thread(lambda: list(extractor.iter_pages(small_pdf))) == ["", "", ""]
+    assert calls == [3]
+
+
+def test_pool_extraction_off_the_main_thread(small_pdf):
+    """Extraction réelle dans le pool depuis un thread de tâche (budget appliqué dans le worker)"""
+    extractor = PdfExtractor(workers=1, page_timeout=5)
+    try:
+        pages = run_in_thread(lambda: list(extractor.iter_pages(small_pdf)))
+    finally:
+        extractor._pool.shutdown()
+    assert pages == ["", "", ""]
+    assert not any(isinstance(page, FailedPage) for page in pages)
@@ -0,0 +1,80 @@
+import datetime
+
+from scheduler import review_card, due_timestamp, initial_ease, ease_to_difficulty, MIN_EASE
+
+NOW = datetime.datetime(2024, 1, 1, 9, 0)
+
+
+def test_successful_reviews_grow_the_interval():
+    card = {"difficulty": 3}
+    intervals = []
+    for _ in range(4):
+        card.update(review_card(card, 4, NOW))
+        intervals.append(card["interval"])
+    assert intervals[:2] == [1, 6]
+    assert intervals[3] > intervals[2] > 6
+    assert card["reviewCount"] == 4
+    assert card["nextReview"] == (NOW + datetime.timedelta(days=card["interval"])).isoformat()
+
+
+def test_failed_review_restarts_the_card():
+    card = {"interval": 30, "repetitions": 5, "easeFactor": 2.5}
+    changes = review_card(card, 1, NOW)
+    assert changes["interval"] == 1
+    assert changes["repetitions"] == 0
+    assert changes["easeFactor"] < 2.5
+
+
+def test_ease_is_bounded_and_matches_difficulty():
+    card = {"easeFactor": MIN_EASE}
+    assert review_card(card, 0, NOW)["easeFactor"] == MIN_EASE
+    assert initial_ease(1) > initial_ease(5)
+    assert all(ease_to_difficulty(initial_ease(d)) == d for d in range(1, 6))
+
+
+def test_never_reviewed_card_is_due_immediately():
+    assert due_timestamp({}) == 0.0
+    assert due_timestamp({"nextReview": "invalide"}) == 0.0
+    assert due_timestamp({"nextReview": NOW.isoformat()}) == NOW.timestamp()
+
+
+def test_repeated_reviews_are_scheduled_from_the_latest_state(app_module):
+    client = app_module.app.test_client()
+    store = app_module.STORE
+    store.create_set("revision-test", {
+        "title": "Révision",
+        "source": "test",
+        "creation_date": "2024-01-01T00:00:00",
+        "flashcards": [{"id": "c1", "question": "q", "answer": "r"}]
+    })
+    response = client.post("/api/flashcards/revision-test/review", json={
+        "reviews": [{"id": "c1", "grade": 5}, {"id": "c1", "grade": 5}]
+    })
+    assert response.status_code == 200
+    card = store.get_card("revision-test", "c1")
+    assert card["reviewCount"] == 2
+    assert card["repetitions"] == 2
+
+    response = client.post("/api/flashcards/revision-test/review", json={
+        "reviews": [{"id": "c1", "grade": 4}, {"id": "inconnue", "grade": 4}]
+    })
+    assert response.status_code == 404
+    assert response.get_json()["missing"] == ["inconnue"]
+    assert store.get_card("revision-test", "c1")["reviewCount"] == 2
+
+
+def test_due_cards_route_lists_overdue_cards_first(app_module):
+    client = app_module.app.test_client()
+    store = app_module.TENANTS.get("echeances")
+    store.create_set("jeu", {
+        "title": "Jeu", "source": "test", "creation_date": "2024-01-01T00:00:00",
+        "flashcards": [
+            {"id": "futur", "question": "q", "answer": "r", "nextReview": "2999-01-01T00:00:00"},
+            {"id": "retard", "question": "q", "answer": "r", "nextReview": "2024-01-02T00:00:00"},
+            {"id": "ancien", "question": "q", "answer": "r", "nextReview": "2023-01-01T00:00:00"}
+        ]
+    })
+    response = client.get("/api/review/due?limit=5", headers={"X-Tenant-ID": "echeances"})
+    assert response.status_code == 200
+    assert [item["card"]["id"] for item in response.get_json()["cards"]] == ["ancien", "retard"]
+    assert client.get("/api/review/due?limit=0").status_code == 400
@@ -0,0 +1,58 @@
+from conftest import make_set
+from search_index import Bm25Index, NearDuplicateFilter, content_words, jaccard, tokenize
+
+
+def test_tokenize_ignores_case_and_accents():
+    assert tokenize("Qu'est-ce que l'Énergie ?") == ["qu", "est", "ce", "que", "l", "energie"]
+    assert content_words("Qu'est-ce que la mitochondrie ?") == {"mitochondrie"}
+    assert jaccard({"a", "b"}, {"b", "c"}) == 1 / 3
+
+
+def test_bm25_ranks_and_follows_updates():
+    index = Bm25Index()
+    index.add("a", "la mitochondrie produit l'énergie de la cellule")
+    index.add("b", "le ribosome fabrique les protéines de la cellule")
+    index.add("c", "cellule cellule mitochondrie")
+    assert [doc for _, doc in index.search("mitochondrie cellule")] == ["c", "a"]
+    assert {doc for _, doc in index.search("mitochondrie ribosome", match_all=False)} == {"a", "b", "c"}
+    assert index.search("mitochondrie ribosome") == []
+
+    index.add("c", "le noyau contient l'ADN")
+    index.remove("a")
+    assert index.search("mitochondrie") == []
+    assert [doc for _, doc in index.search("adn")] == ["c"]
+    assert len(index) == 2
+
+
+def test_near_duplicates_are_rejected():
+    seen = NearDuplicateFilter(threshold=0.7)
+    assert seen.add("Quel est le rôle de la mitochondrie dans la cellule ?")
+    assert not seen.add("Quel est le rôle de la mitochondrie dans une cellule ?")
+    assert seen.is_duplicate("Rôle de la mitochondrie dans la cellule")
+    assert seen.add("Quel est le rôle du ribosome ?")
+
+
+def test_store_search(store):
+    store.create_set("s1", make_set("Biologie", ["Rôle de la mitochondrie ?", "Rôle du ribosome ?"]))
+    store.create_set("s2", make_set("Chimie", ["Qu'est-ce qu'une molécule ?"]))
+    results = store.search_cards("mitochondrie")
+    assert [(item["set_id"], item["card"]["id"]) for item in results] == [("s1", "c0")]
+    assert len(store.search_cards("role", match_all=False)) == 2
+    assert store.search_cards("role", set_id="s2") == []
+
+    store.update_set("s1", flashcards=[{"id": "c0", "question": "Fonction du noyau ?", "answer": "r"}])
+    assert store.search_cards("mitochondrie") == []
+    store.delete_set("s2")
+    assert store.search_cards("molecule") == []
+
+
+def test_search_route(app_module):
+    app_module.TENANTS.get("recherche").create_set("s1", make_set("Biologie", ["Rôle de la mitochondrie ?"]))
+    client = app_module.app.test_client()
+    headers = {"X-Tenant-ID": "recherche"}
+    response = client.get("/api/search?q=mitochondrie", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["count"] == 1
+    assert client.get("/api/search", headers=headers).status_code == 400
+    etag = response.headers["ETag"]
+    assert client.get("/api/search?q=mitochondrie", headers={**headers, "If-None-Match": etag}).status_code == 304
@@ -0,0 +1,60 @@
+from conftest import make_set
+
+
+def test_put_with_duplicate_card_ids_is_rejected(app_module):
+    client = app_module.app.test_client()
+    app_module.STORE.create_set("put-doublons", make_set("Jeu", ["q1", "q2"]))
+    response = client.put("/api/flashcards/put-doublons", json={"flashcards": [
+        {"id": "c0", "question": "q1", "answer": "r"},
+        {"id": "c0", "question": "q2", "answer": "r"}
+    ]})
+    assert response.status_code == 400
+    assert len(app_module.STORE.get_set("put-doublons")["flashcards"]) == 2
+
+
+def test_put_assigns_ids_to_new_cards(app_module):
+    client = app_module.app.test_client()
+    app_module.STORE.create_set("put-nouvelles", make_set("Jeu", ["q1"]))
+    response = client.put("/api/flashcards/put-nouvelles", json={"flashcards": [
+        {"id": "c0", "question": "q1", "answer": "r"},
+        {"question": "nouvelle", "answer": "r"},
+        {"question": "autre nouvelle", "answer": "r"}
+    ]})
+    assert response.status_code == 200
+    cards = app_module.STORE.get_set("put-nouvelles")["flashcards"]
+    assert len(cards) == 3
+    assert len({card["id"] for card in cards}) == 3
+
+
+def test_listing_is_projected_and_revalidated(app_module):
+    client = app_module.app.test_client()
+    headers = {"X-Tenant-ID": "liste"}
+    store = app_module.TENANTS.get("liste")
+    for i in range(3):
+        store.create_set(f"s{i}", {**make_set(f"Jeu {i}", ["q"]), "creation_date": f"2024-01-0{i + 1}T00:00:00"})
+
+    response = client.get("/api/flashcards?limit=2&sort=-creation_date&fields=id,title", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json() == [{"id": "s2", "title": "Jeu 2"}, {"id": "s1", "title": "Jeu 1"}]
+    next_page = client.get(
+        f"/api/flashcards?limit=2&sort=-creation_date&fields=id,title&cursor={response.headers['X-Next-Cursor']}",
+        headers=headers
+    )
+    assert [item["id"] for item in next_page.get_json()] == ["s0"]
+    assert "X-Next-Cursor" not in next_page.headers
+
+    etag = response.headers["ETag"]
+    revalidated = client.get("/api/flashcards?limit=2&sort=-creation_date&fields=id,title",
+                             headers={**headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    store.update_set("s1", title="Renommé")
+    changed = client.get("/api/flashcards?limit=2&sort=-creation_date&fields=id,title",
+                         headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+
+
+def test_invalid_listing_parameters(app_module):
+    client = app_module.app.test_client()
+    assert client.get("/api/flashcards?sort=title").status_code == 400
+    assert client.get("/api/flashcards?limit=0").status_code == 400
+    assert client.get("/api/flashcards?cursor=invalide").status_code == 400
@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from benchmarks.startup import DEFERRED_MODULES, measure_startup, seed_store
+from conftest import make_set
+from storage import open_store
+
+
+def test_json_store_reads_the_file_on_first_set_operation(tmp_path):
+    (tmp_path / "flashcards.json").write_text("{ illisible", encoding="utf-8")
+    store = open_store("json", str(tmp_path))
+    # Les tâches ne chargent jamais la base des jeux
+    store.create_job({"id": "t1", "status": "queued", "params": {}})
+    assert store.get_job("t1")["status"] == "queued"
+    with pytest.raises(ValueError):
+        store.list_sets()
+
+    (tmp_path / "flashcards.json").write_text(json.dumps({"s1": make_set("Jeu", ["q1"])}), encoding="utf-8")
+    assert store.get_set("s1")["title"] == "Jeu"
+
+
+@pytest.mark.parametrize("engine", ["sqlite", "json"])
+def test_app_import_defers_heavy_modules(engine, tmp_path):
+    data_dir = str(tmp_path / "data")
+    seed_store(engine, data_dir, 50)
+    _, loaded = measure_startup(engine, data_dir, runs=1)
+    assert not set(loaded) & set(DEFERRED_MODULES)
@@ -0,0 +1,178 @@
+import sys
+import json
+import time
+import subprocess
+
+import pytest
+
+from conftest import BACKEND_DIR, make_set
+from storage import open_store
+
+
+def test_recreated_set_gets_a_new_revision(store):
+    store.create_set("s1", make_set("Premier", ["q1"]))
+    seen = {store.set_revision("s1")}
+    store.update_set("s1", title="Renommé")
+    seen.add(store.set_revision("s1"))
+    store.delete_set("s1")
+    store.create_set("s1", make_set("Autre contenu", ["q2"]))
+    assert store.set_revision("s1") not in seen
+
+
+def test_replace_all_changes_every_set_revision(store):
+    store.create_set("s1", make_set("Premier", ["q1"]))
+    before = store.set_revision("s1")
+    store.replace_all({"s1": make_set("Importé", ["q2"])})
+    assert store.set_revision("s1") != before
+
+
+def test_update_cards_applies_functions_inside_the_transaction(store):
+    store.create_set("s1", make_set("Jeu", ["q1", "q2"]))
+    store.update_card("s1", "c0", {"reviewCount": 2})
+    cards = store.update_cards("s1", {"c0": lambda card: {"reviewCount": card["reviewCount"] + 1}})
+    assert cards[0]["reviewCount"] == 3
+    assert store.get_card("s1", "c0")["reviewCount"] == 3
+
+
+def test_update_cards_with_an_unknown_card_changes_nothing(store):
+    store.create_set("s1", make_set("Jeu", ["q1"]))
+    with pytest.raises(KeyError):
+        store.update_cards("s1", {"c0": lambda card: {"reviewCount": 1}, "inconnue": {"reviewCount": 1}})
+    assert "reviewCount" not in store.get_card("s1", "c0")
+
+
+def test_due_cards_stops_at_limit(store):
+    store.create_set("s1", make_set("Jeu", [f"q{i}" for i in range(5)]))
+    for i in range(5):
+        store.update_card("s1", f"c{i}", {"nextReview": f"2024-01-0{i + 1}T00:00:00"})
+    due = store.due_cards(time.time(), limit=2)
+    assert [item["card"]["id"] for item in due] == ["c0", "c1"]
+
+
+def rename_in_another_process(backend, folder, set_id, title):
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1]); from storage import open_store; "
+        "store = open_store(sys.argv[2], sys.argv[3]); store.update_set(sys.argv[4], title=sys.argv[5]); store.close()"
+    )
+    subprocess.run([sys.executable, "-c", script, BACKEND_DIR, backend, folder, set_id, title], check=True)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "json"])
+def test_revision_follows_writes_from_another_process(backend, tmp_path):
+    store = open_store(backend, str(tmp_path))
+    store.create_set("s1", make_set("Premier", ["q1"]))
+    revision, set_revision = store.revision(), store.set_revision("s1")
+    rename_in_another_process(backend, str(tmp_path), "s1", "Renommé ailleurs")
+    assert store.revision() != revision
+    assert store.set_revision("s1") != set_revision
+    assert store.get_set("s1")["title"] == "Renommé ailleurs"
+    store.close()
+
+
+def test_json_workers_agree_on_revisions(tmp_path):
+    """Deux processus (magasins distincts) donnent le même ETag pour le même contenu"""
+    first = open_store("json", str(tmp_path))
+    second = open_store("json", str(tmp_path))
+    first.create_set("s1", make_set("Premier", ["q1"]))
+    assert second.revision() == first.revision()
+    assert second.set_revision("s1") == first.set_revision("s1")
+    before = first.revision()
+    second.update_set("s1", title="Renommé")
+    assert first.revision() != before
+    assert first.revision() == second.revision()
+    assert first.set_revision("s1") == second.set_revision("s1")
+    first.close()
+    second.close()
+
+
+def test_set_round_trip(store):
+    store.create_set("s1", make_set("Premier", ["q1", "q2"]))
+    store.create_set("s2", make_set("Second", ["q3"]))
+    assert [s["id"] for s in store.list_sets()[0]] == ["s1", "s2"]
+    assert [c["question"] for c in store.get_set("s1")["flashcards"]] == ["q1", "q2"]
+    assert store.update_card("s1", "c1", {"answer": "modifiée"})["answer"] == "modifiée"
+    assert store.get_set("s1")["flashcards"][1]["answer"] == "modifiée"
+    assert store.delete_set("s2") is True
+    assert store.get_set("s2") is None
+    assert store.delete_set("s2") is False
+
+
+@pytest.mark.parametrize("flashcards", [
+    [{"id": "c1", "question": "q1", "answer": "r"}, {"id": "c1", "question": "q2", "answer": "r"}],
+    [{"id": "c1", "question": "q1", "answer": "r"}, {"question": "sans identifiant", "answer": "r"}]
+])
+def test_cards_without_unique_ids_are_rejected(store, flashcards):
+    """Les deux moteurs refusent le jeu au lieu de perdre une carte"""
+    store.create_set("s1", make_set("Premier", ["q1", "q2"]))
+    with pytest.raises(ValueError):
+        store.update_set("s1", flashcards=flashcards)
+    with pytest.raises(ValueError):
+        store.create_set("s2", {**make_set("Second", []), "flashcards": flashcards})
+    assert len(store.get_set("s1")["flashcards"]) == 2
+    assert store.get_set("s2") is None
+
+
+def test_json_file_is_migrated_once(tmp_path):
+    json_path = tmp_path / "flashcards.json"
+    json_path.write_text(json.dumps({"s1": make_set("Ancien", ["q1"])}), encoding="utf-8")
+    workers = [open_store("sqlite", str(tmp_path)) for _ in range(3)]
+    assert [s["id"] for s in workers[0].list_sets()[0]] == ["s1"]
+    assert not json_path.exists()
+    assert (tmp_path / "flashcards.json.migrated").exists()
+    for worker in workers:
+        worker.close()
+
+
+def test_concurrent_migrations_import_once(tmp_path):
+    """Plusieurs workers démarrent en même temps: un seul importe, aucun n'échoue"""
+    json_path = tmp_path / "flashcards.json"
+    json_path.write_text(json.dumps({"s1": make_set("Ancien", ["q1"])}), encoding="utf-8")
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1]); from storage import open_store; "
+        "open_store('sqlite', sys.argv[2]).close()"
+    )
+    workers = [
+        subprocess.Popen([sys.executable, "-c", script, BACKEND_DIR, str(tmp_path)], stderr=subprocess.PIPE)
+        for _ in range(4)
+    ]
+    for worker in workers:
+        _, errors = worker.communicate(timeout=60)
+        assert worker.returncode == 0, errors.decode()
+    store = open_store("sqlite", str(tmp_path))
+    assert store.get_set("s1")["title"] == "Ancien"
+    store.close()
+
+
+def test_missing_set_has_no_revision(store):
+    assert store.set_revision("absent") is None
+    store.create_set("s1", make_set("Premier", ["q1"]))
+    store.delete_set("s1")
+    assert store.set_revision("s1") is None
+
+
+def test_deleting_a_missing_set_keeps_the_revision(store):
+    store.create_set("s1", make_set("Premier", ["q1"]))
+    revision = store.revision()
+    assert store.delete_set("absent") is False
+    assert store.revision() == revision
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_listing_pages_with_a_cursor(store, descending):
+    for i in range(5):
+        store.create_set(f"s{i}", {**make_set(f"Jeu {i}", ["q"]), "creation_date": f"2024-01-0{i + 1}T00:00:00"})
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.list_sets(limit=2, cursor=cursor, descending=descending)
+        seen.extend(item["id"] for item in page)
+        if cursor is None:
+            break
+    expected = [f"s{i}" for i in range(5)]
+    assert seen == (expected[::-1] if descending else expected)
+
+
+def test_partial_fetch_of_a_set(store):
+    store.create_set("s1", make_set("Jeu", [f"q{i}" for i in range(5)]))
+    card_set = store.get_set("s1", offset=1, limit=2)
+    assert [card["id"] for card in card_set["flashcards"]] == ["c1", "c2"]
+    assert card_set["count"] == 5
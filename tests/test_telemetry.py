@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+
+from telemetry import MetricsRegistry, SlowRequestProfiler, STAGE_SECONDS, span
+
+
+def test_counters_and_histograms_render_in_prometheus_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requetes_total", "Requêtes", ("route",))
+    durations = registry.histogram("duree_seconds", "Durée", buckets=(0.1, 1))
+    requests.inc(route='/api/"x"')
+    requests.inc(2, route='/api/"x"')
+    durations.observe(0.05)
+    durations.observe(5)
+    text = registry.render()
+    assert "# TYPE requetes_total counter" in text
+    assert 'requetes_total{route="/api/\\"x\\""} 3' in text
+    assert 'duree_seconds_bucket{le="0.1"} 1' in text
+    assert 'duree_seconds_bucket{le="+Inf"} 2' in text
+    assert "duree_seconds_count 2" in text
+
+
+def test_failing_collector_does_not_break_the_export():
+    registry = MetricsRegistry()
+
+    def broken():
+        raise RuntimeError("indisponible")
+
+    registry.add_collector(broken)
+    registry.add_collector(lambda: [("jauge", "gauge", "Jauge", [({"nom": "a"}, 1), ({"nom": "b"}, None)])])
+    text = registry.render()
+    assert 'jauge{nom="a"} 1' in text
+    assert 'nom="b"' not in text
+
+
+def test_span_records_the_outcome():
+    with span("etape_test"):
+        pass
+    with pytest.raises(ValueError):
+        with span("etape_test"):
+            raise ValueError("échec")
+    text = "\n".join(f"{name}{labels} {value}" for name, labels, value in STAGE_SECONDS.samples())
+    assert 'brainboost_stage_duration_seconds_count{stage="etape_test",outcome="ok"} 1' in text
+    assert 'brainboost_stage_duration_seconds_count{stage="etape_test",outcome="error"} 1' in text
+
+
+def test_only_slow_requests_are_profiled(tmp_path):
+    profiler = SlowRequestProfiler(0.05, str(tmp_path), interval=0.001, max_profiles=1)
+    profiler.start()
+    assert profiler.finish("GET /rapide", 0.001) is None
+    for name in ("GET /lente", "GET /plus-lente"):
+        profiler.start()
+        time.sleep(0.06)
+        path = profiler.finish(name, 0.06)
+        assert path is not None and os.path.exists(path)
+    # Seul le profil le plus récent est gardé
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+def test_metrics_route(app_module):
+    client = app_module.app.test_client()
+    client.get("/api/flashcards")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert 'brainboost_http_requests_total{method="GET",route="/api/flashcards",status="200"}' in text
+    assert "brainboost_gemini_calls_total" in text
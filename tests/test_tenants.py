@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import make_set
+from tenants import DEFAULT_TENANT, QuotaLedger, RateLimiter, TenantStores, valid_tenant_id
+
+
+def test_tenant_ids_are_folder_safe():
+    assert valid_tenant_id("acme-01_b")
+    for tenant_id in ("", "../acme", "a/b", "-acme", "x" * 65, None):
+        assert not valid_tenant_id(tenant_id)
+
+
+def test_each_tenant_has_its_own_partition(tmp_path):
+    default = object()
+    tenants = TenantStores("sqlite", str(tmp_path), default, max_open=1)
+    assert tenants.get(DEFAULT_TENANT) is default
+    tenants.get("acme").create_set("s1", make_set("Jeu", ["q1"]))
+    assert tenants.get("globex").get_set("s1") is None
+    # Le magasin oublié est rouvert depuis son dossier
+    assert tenants.open_count() == 1
+    assert tenants.get("acme").get_set("s1")["title"] == "Jeu"
+    assert tenants.tenant_ids() == ["acme", "globex"]
+    with pytest.raises(ValueError):
+        tenants.get("../acme")
+
+
+def test_rate_limiter_is_per_key():
+    limiter = RateLimiter(per_minute=60, burst=2)
+    assert limiter.acquire("acme") == 0
+    assert limiter.acquire("acme") == 0
+    assert 0 < limiter.acquire("acme") <= 1
+    assert limiter.acquire("globex") == 0
+    assert RateLimiter(per_minute=0).acquire("acme") == 0
+
+
+def test_quota_is_shared_by_ledgers_on_the_same_file(tmp_path):
+    path = str(tmp_path / "quotas.db")
+    first, second = QuotaLedger(path), QuotaLedger(path)
+    assert first.consume("acme", "generations", 3, 2) == (True, 2)
+    assert second.consume("acme", "generations", 3, 2) == (False, 2)
+    assert second.consume("acme", "generations", 3) == (True, 3)
+    assert first.consume("globex", "generations", 3) == (True, 1)
+    assert first.usage("acme") == {"generations": 3}
+    assert first.consume("acme", "generations", 0, 100) == (True, 103)
+
+
+def test_generation_routes_are_limited(fake_gemini, monkeypatch, tmp_path):
+    app_module = fake_gemini
+    client = app_module.app.test_client()
+    monkeypatch.setattr(app_module, "RATE_LIMITER", RateLimiter(per_minute=60, burst=1))
+    monkeypatch.setattr(app_module, "QUOTAS", QuotaLedger(str(tmp_path / "quotas.db")))
+    monkeypatch.setattr(app_module, "TENANT_DAILY_GENERATIONS", 1)
+
+    app_module.RATE_LIMITER.acquire("limite")
+    response = client.post("/api/generate", json={"text": "texte"}, headers={"X-Tenant-ID": "limite"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    app_module.QUOTAS.consume("epuise", "generations", 1)
+    response = client.post("/api/generate", json={"text": "texte"}, headers={"X-Tenant-ID": "epuise"})
+    assert response.status_code == 429
+    assert response.get_json()["used"] == 1
+    quota = client.get("/api/quota", headers={"X-Tenant-ID": "epuise"}).get_json()
+    assert quota["usage"] == {"generations": 1}
+
+
+def test_sets_are_isolated_between_tenants(app_module):
+    client = app_module.app.test_client()
+    app_module.TENANTS.get("isole-a").create_set("s1", make_set("Privé", ["q1"]))
+    assert client.get("/api/flashcards/s1", headers={"X-Tenant-ID": "isole-a"}).status_code == 200
+    assert client.get("/api/flashcards/s1", headers={"X-Tenant-ID": "isole-b"}).status_code == 404
+    assert client.get("/api/flashcards", headers={"X-Tenant-ID": "../a"}).status_code == 400
@@ -0,0 +1,76 @@
+import io
+import zipfile
+
+import pytest
+
+
+def sample_set(title):
+    return {
+        "title": title,
+        "source": "test",
+        "creation_date": "2024-01-01T00:00:00",
+        "flashcards": [
+            {"id": "c1", "question": "Capitale de la France ?", "answer": "Paris", "difficulty": 1,
+             "nextReview": "2024-02-01T00:00:00", "reviewCount": 2},
+            {"id": "c2", "question": "Formule de l'eau ?", "answer": "H2O, deux atomes d'hydrogène", "difficulty": 2}
+        ]
+    }
+
+
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+def test_import_export_round_trip(app_module, export_format):
+    client = app_module.app.test_client()
+    source = app_module.TENANTS.get(f"export-{export_format}")
+    source.create_set("jeu-1", sample_set("Géographie, chimie"))
+    source.create_set("jeu-2", sample_set("Deuxième jeu"))
+
+    exported = client.get(f"/api/export?format={export_format}", headers={"X-Tenant-ID": f"export-{export_format}"})
+    assert exported.status_code == 200
+    imported = client.post(
+        f"/api/import?format={export_format}", data=exported.data, headers={"X-Tenant-ID": f"import-{export_format}"}
+    )
+    assert imported.status_code == 200
+    assert imported.get_json()["imported_sets"] == 2
+    assert imported.get_json()["error_count"] == 0
+
+    target = app_module.TENANTS.get(f"import-{export_format}")
+    for set_id in ("jeu-1", "jeu-2"):
+        original, copy = source.get_set(set_id), target.get_set(set_id)
+        assert copy["title"] == original["title"]
+        assert [(c["id"], c["question"], c["answer"], c["difficulty"]) for c in copy["flashcards"]] == \
+            [(c["id"], c["question"], c["answer"], c["difficulty"]) for c in original["flashcards"]]
+        assert copy["flashcards"][0]["nextReview"] == "2024-02-01T00:00:00"
+        assert copy["flashcards"][0]["reviewCount"] == 2
+
+
+def corrupted_zip():
+    """Archive de deux PDF dont le second a un CRC invalide"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("bon.pdf", b"%PDF-1.4 contenu du premier fichier")
+        archive.writestr("abime.pdf", b"%PDF-1.4 contenu du second fichier")
+    data = bytearray(buffer.getvalue())
+    member = zipfile.ZipFile(io.BytesIO(bytes(data))).getinfo("abime.pdf")
+    # En-tête local de 30 octets, puis le nom: premier octet des données
+    data[member.header_offset + 30 + len(member.filename)] ^= 0xFF
+    return bytes(data)
+
+
+def test_corrupted_zip_member_is_skipped(app_module, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(app_module.JOBS, "submit", lambda kind, params: submitted.append(params) or {"id": "job"})
+    client = app_module.app.test_client()
+    response = client.post("/api/upload/batch", data={"files": (io.BytesIO(corrupted_zip()), "lot.zip")})
+    assert response.status_code == 202
+    body = response.get_json()
+    assert [entry["filename"] for entry in body["files"]] == ["bon.pdf"]
+    assert body["skipped"][0]["filename"] == "abime.pdf"
+    assert "BadZipFile" in body["skipped"][0]["reason"]
+    assert [params["filename"] for params in submitted] == ["bon.pdf"]
+
+
+def test_unreadable_archive_is_rejected(app_module):
+    client = app_module.app.test_client()
+    response = client.post("/api/upload/batch", data={"files": (io.BytesIO(b"PK\x03\x04 archive tronquee"), "lot.zip")})
+    assert response.status_code == 400
+    assert response.get_json()["skipped"][0]["reason"] == "Archive zip invalide"
@@ -0,0 +1,50 @@
+import io
+import os
+import time
+import hashlib
+
+from uploads import spool_stream, write_temp_copy, BlobStore, sweep_orphan_uploads
+
+
+def test_spool_stays_in_memory_below_the_threshold(tmp_path):
+    data = b"%PDF-1.4 petit fichier"
+    buffer, digest = spool_stream(io.BytesIO(data), str(tmp_path), max_memory=1024)
+    with buffer:
+        assert digest == hashlib.sha256(data).hexdigest()
+        assert buffer.read() == data
+        assert not buffer._rolled
+    # Aucun fichier nommé dans le dossier des envois
+    assert os.listdir(tmp_path) == []
+
+
+def test_spool_rolls_over_to_an_anonymous_file(tmp_path):
+    data = os.urandom(4096)
+    buffer, digest = spool_stream(io.BytesIO(data), str(tmp_path), max_memory=1024, block_size=512)
+    with buffer:
+        assert buffer._rolled
+        assert buffer.read() == data
+        assert digest == hashlib.sha256(data).hexdigest()
+    assert os.listdir(tmp_path) == []
+
+
+def test_blob_store_keeps_one_copy_per_content(tmp_path):
+    blobs = BlobStore(str(tmp_path / "blobs"))
+    data = b"contenu"
+    digest = hashlib.sha256(data).hexdigest()
+    first = blobs.put(io.BytesIO(data), digest)
+    second = blobs.put(io.BytesIO(data), digest)
+    assert first == second == blobs.path_for(digest)
+    with open(first, "rb") as f:
+        assert f.read() == data
+    assert os.listdir(os.path.dirname(first)) == [digest]
+
+
+def test_sweep_removes_only_old_orphans(tmp_path):
+    kept = write_temp_copy(io.BytesIO("tâche en cours".encode()), str(tmp_path))
+    orphan = write_temp_copy(io.BytesIO(b"orphelin"), str(tmp_path))
+    recent = write_temp_copy(io.BytesIO("récent".encode()), str(tmp_path))
+    old = time.time() - 7200
+    for path in (kept, orphan):
+        os.utime(path, (old, old))
+    assert sweep_orphan_uploads(str(tmp_path), [kept]) == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in (kept, recent))